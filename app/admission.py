@@ -0,0 +1,152 @@
+import asyncio
+import os
+from starlette.responses import JSONResponse
+from app.database.pool import read_pool, write_pool
+from app.metrics import register_metrics
+
+# Requests of each class handled at once per worker; 0 removes the limit
+ADMISSION_READ_LIMIT = int(os.getenv("ADMISSION_READ_LIMIT", "64"))
+ADMISSION_WRITE_LIMIT = int(os.getenv("ADMISSION_WRITE_LIMIT", "32"))
+ADMISSION_ADMIN_LIMIT = int(os.getenv("ADMISSION_ADMIN_LIMIT", "4"))
+# How long a request may wait for a slot of its class before being shed
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "250"))
+# Database pressure at which reads and writes are shed: callers queued for a
+# connection, or the recent average wait for one. Admin routes are shed at a quarter of it.
+ADMISSION_MAX_DB_WAITERS = int(os.getenv("ADMISSION_MAX_DB_WAITERS", "32"))
+ADMISSION_MAX_DB_WAIT_MS = float(os.getenv("ADMISSION_MAX_DB_WAIT_MS", "500"))
+# Seconds clients are told to wait before retrying a shed request
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+
+# Paths that never touch the database and are always admitted
+EXEMPT_PREFIXES = ("/static/",)
+# Admin paths that are public, cached reads rather than admin work
+PUBLIC_ADMIN_PATHS = ("/admin/leaderboard",)
+# Admin-only bulk writes outside /admin/, e.g. /puzzles/bulk
+ADMIN_PATH_SUFFIXES = ("/bulk",)
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+class RouteClass:
+    """
+    A class of requests with its own in-flight limit and the database pools
+    whose congestion it backs off from. A lower `pressure_share` sheds the
+    class earlier when the database falls behind.
+    """
+
+    def __init__(self, name: str, limit: int, pools: tuple, pressure_share: float = 1.0):
+        self.name = name
+        self.limit = limit
+        self.pools = pools
+        self.max_waiters = max(1, int(ADMISSION_MAX_DB_WAITERS * pressure_share))
+        self.max_wait = ADMISSION_MAX_DB_WAIT_MS * pressure_share / 1000
+        self._semaphore = asyncio.Semaphore(limit) if limit > 0 else None
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed_busy = 0
+        self.shed_database = 0
+
+    def database_congested(self) -> bool:
+        return any(pool.waiting >= self.max_waiters or pool.recent_wait() >= self.max_wait
+                   for pool in self.pools)
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting up to the queue timeout. False if none came free."""
+        if self._semaphore is None:
+            return True
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return True
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), ADMISSION_QUEUE_TIMEOUT_MS / 1000)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.queued -= 1
+
+    def release(self):
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "shed_busy": self.shed_busy,
+            "shed_database": self.shed_database,
+            "max_db_waiters": self.max_waiters,
+            "max_db_wait_ms": round(self.max_wait * 1000, 3),
+        }
+
+ROUTE_CLASSES = {
+    "read": RouteClass("read", ADMISSION_READ_LIMIT, (read_pool,)),
+    "write": RouteClass("write", ADMISSION_WRITE_LIMIT, (write_pool,)),
+    "admin": RouteClass("admin", ADMISSION_ADMIN_LIMIT, (read_pool, write_pool), pressure_share=0.25),
+}
+
+def classify(method: str, path: str):
+    """Route class of a request, or None if it is exempt"""
+    if path.startswith(EXEMPT_PREFIXES):
+        return None
+    if path.startswith("/admin/") and not path.startswith(PUBLIC_ADMIN_PATHS):
+        return ROUTE_CLASSES["admin"]
+    if path.rstrip("/").endswith(ADMIN_PATH_SUFFIXES):
+        return ROUTE_CLASSES["admin"]
+    if method in WRITE_METHODS:
+        return ROUTE_CLASSES["write"]
+    return ROUTE_CLASSES["read"]
+
+class AdmissionMiddleware:
+    """
+    Admission control in front of the app. Each request class has a cap on
+    requests in flight; requests over it queue briefly and are then shed, and
+    while the database pools a class depends on are congested its new requests
+    are shed right away. Shed requests get a 503 with Retry-After before any
+    work is done, rather than timing out after holding a connection.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route_class = classify(scope["method"], scope["path"])
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        if route_class.database_congested():
+            route_class.shed_database += 1
+            await _service_unavailable(scope, receive, send)
+            return
+        if not await route_class.acquire():
+            route_class.shed_busy += 1
+            await _service_unavailable(scope, receive, send)
+            return
+
+        route_class.admitted += 1
+        route_class.in_flight += 1
+        route_class.max_in_flight = max(route_class.max_in_flight, route_class.in_flight)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_class.in_flight -= 1
+            route_class.release()
+
+async def _service_unavailable(scope, receive, send):
+    response = JSONResponse(
+        {"detail": "Server is busy, try again later"},
+        status_code=503,
+        headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+    )
+    await response(scope, receive, send)
+
+register_metrics("admission", lambda: {name: route_class.stats()
+                                       for name, route_class in ROUTE_CLASSES.items()})
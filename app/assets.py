@@ -0,0 +1,181 @@
+"""
+Static asset pipeline.
+
+`build_assets` copies every stylesheet and script under app/static into
+app/static/dist with a content hash in the file name, next to gzip and brotli
+encoded copies. Templates link to assets through `asset_url`, and
+`AssetStaticFiles` serves the fingerprinted files with immutable cache headers.
+
+Run `python -m app.assets` to build ahead of time, e.g. in a container image.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import stat
+import anyio.to_thread
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = "app/static"
+BUILD_SUBDIR = "dist"
+BUILD_DIR = os.path.join(STATIC_DIR, BUILD_SUBDIR)
+MANIFEST_PATH = os.path.join(BUILD_DIR, "manifest.json")
+FINGERPRINTED_EXTENSIONS = (".css", ".js")
+# Precompressed variants written next to each built file, in order of preference
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+_manifest = {}
+
+def _write_atomic(path: str, data: bytes):
+    """Write via a temp file so concurrently booting workers never serve a partial file"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def build_assets(source_dir: str = STATIC_DIR, build_dir: str = BUILD_DIR) -> dict:
+    """Fingerprint and precompress static assets, returning the manifest"""
+    manifest = {}
+    for root, dirs, files in os.walk(source_dir):
+        if os.path.abspath(root) == os.path.abspath(source_dir):
+            dirs[:] = [d for d in dirs if d != BUILD_SUBDIR]
+        for name in sorted(files):
+            if not name.endswith(FINGERPRINTED_EXTENSIONS):
+                continue
+            source_path = os.path.join(root, name)
+            relative_path = os.path.relpath(source_path, source_dir).replace(os.sep, "/")
+            with open(source_path, "rb") as f:
+                content = f.read()
+
+            digest = hashlib.sha256(content).hexdigest()[:12]
+            stem, ext = os.path.splitext(relative_path)
+            built_path = f"{stem}.{digest}{ext}"
+            target = os.path.join(build_dir, built_path)
+            manifest[relative_path] = f"{BUILD_SUBDIR}/{built_path}"
+            if os.path.exists(target):
+                continue
+
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            _write_atomic(target, content)
+            _write_atomic(target + ".gz", gzip.compress(content, compresslevel=9, mtime=0))
+            if brotli is not None:
+                _write_atomic(target + ".br", brotli.compress(content))
+
+    os.makedirs(build_dir, exist_ok=True)
+    _write_atomic(os.path.join(build_dir, "manifest.json"),
+                  json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+    _remove_stale(build_dir, manifest)
+    load_manifest(os.path.join(build_dir, "manifest.json"))
+    return manifest
+
+def _remove_stale(build_dir: str, manifest: dict):
+    """Delete built files from earlier builds that the manifest no longer points to"""
+    keep = {"manifest.json"}
+    for built in manifest.values():
+        path = built[len(BUILD_SUBDIR) + 1:]
+        keep.update((path, path + ".gz", path + ".br"))
+    for root, dirs, files in os.walk(build_dir, topdown=False):
+        for name in files:
+            full_path = os.path.join(root, name)
+            relative_path = os.path.relpath(full_path, build_dir).replace(os.sep, "/")
+            # Temp files belong to a worker building at the same time
+            if relative_path in keep or name.endswith(".tmp"):
+                continue
+            try:
+                os.remove(full_path)
+            except FileNotFoundError:
+                pass
+        if root != build_dir and not os.listdir(root):
+            try:
+                os.rmdir(root)
+            except OSError:
+                pass
+
+def load_manifest(path: str = MANIFEST_PATH) -> dict:
+    """Load the asset manifest written by build_assets"""
+    global _manifest
+    try:
+        with open(path, encoding="utf-8") as f:
+            _manifest = json.load(f)
+    except FileNotFoundError:
+        _manifest = {}
+    return _manifest
+
+def asset_url(path: str) -> str:
+    """URL of a static asset, fingerprinted when a build is available"""
+    return "/static/" + _manifest.get(path, path)
+
+def accepted_encodings(accept_encoding: str) -> list:
+    """
+    Content codings an Accept-Encoding header allows, most preferred first.
+    Codings with q=0 are refused, and `*` stands for any coding not listed.
+    """
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, *params = [piece.strip() for piece in part.split(";")]
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.lower()] = weight
+    wildcard = weights.pop("*", 0.0)
+    candidates = {coding: weights.get(coding, wildcard) for coding in PRECOMPRESSED_SUFFIXES}
+    candidates.update(weights)
+    return sorted((coding for coding, weight in candidates.items() if weight > 0),
+                  key=lambda coding: -candidates[coding])
+
+class AssetStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves precompressed variants of fingerprinted assets and
+    sets cache headers: fingerprinted files never change, everything else is
+    revalidated with its ETag.
+    """
+
+    async def get_response(self, path: str, scope):
+        if not path.startswith(BUILD_SUBDIR + os.sep):
+            response = await super().get_response(path, scope)
+            response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+            return response
+
+        response = None
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        for encoding in accepted:
+            suffix = PRECOMPRESSED_SUFFIXES.get(encoding)
+            if suffix is None or scope["method"] not in ("GET", "HEAD"):
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+            if stat_result and stat.S_ISREG(stat_result.st_mode):
+                response = self.file_response(full_path, stat_result, scope)
+                if response.status_code == 200:
+                    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+                    response.headers["Content-Type"] = media_type
+                    response.headers["Content-Encoding"] = encoding
+                break
+        if response is None:
+            response = await super().get_response(path, scope)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+if __name__ == "__main__":
+    built = build_assets()
+    for source, target in sorted(built.items()):
+        print(f"{source} -> {target}")
+    if brotli is None:
+        print("brotli is not installed; only gzip variants were written")
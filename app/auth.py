@@ -1,15 +1,26 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional
-from passlib.context import CryptContext
-from jose import JWTError, jwt
 import os
 import hashlib
+from app.database.pool import read_pool
+from app.throttle import password_hashing
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_pwd_context = None
+
+def get_pwd_context():
+    """
+    Return the shared passlib context, creating it on first use.
+    passlib and bcrypt are imported lazily so they stay off the startup path.
+    """
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
 
 def _prepare_password(password: str) -> str:
     """
@@ -31,6 +42,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     security improvement.
     """
     # First try with SHA-256 pre-hashing (new method)
+    pwd_context = get_pwd_context()
     prepared_password = _prepare_password(plain_password)
     if pwd_context.verify(prepared_password, hashed_password):
         return True
@@ -50,10 +62,11 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     """Hash a password"""
     prepared_password = _prepare_password(password)
-    return pwd_context.hash(prepared_password)
+    return get_pwd_context().hash(prepared_password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
+    from jose import jwt
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
@@ -63,12 +76,20 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def authenticate_user(db, username: str, password: str):
-    """Authenticate a user"""
-    cursor = await db.execute("SELECT * FROM users WHERE username = ?", (username,))
-    user = await cursor.fetchone()
+async def hash_password(password: str) -> str:
+    """Hash a password off the event loop, within the hashing concurrency cap"""
+    return await password_hashing.run(get_password_hash, password)
+
+async def authenticate_user(username: str, password: str):
+    """
+    Authenticate a user. The database connection is released before the
+    password check so queued logins don't hold pooled connections.
+    """
+    async with read_pool.connection() as db:
+        cursor = await db.execute("SELECT * FROM users WHERE username = ?", (username,))
+        user = await cursor.fetchone()
     if not user:
         return False
-    if not verify_password(password, user["hashed_password"]):
+    if not await password_hashing.run(verify_password, password, user["hashed_password"]):
         return False
     return user
@@ -0,0 +1,676 @@
+"""
+Compact chess board with legal move generation.
+
+Squares are indexed 0..63 from a1 to h8. Pieces are small ints: the piece type
+(PAWN..KING) with BLACK_FLAG set for black pieces, stored in a 64-byte
+bytearray. Moves are ints packing from-square, to-square and promotion piece
+type (`from | to << 6 | promotion << 12`), so move lists stay cheap to store.
+"""
+import random
+
+WHITE, BLACK = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 1, 2, 3, 4, 5, 6
+BLACK_FLAG = 8
+
+PIECE_SYMBOLS = ".pnbrqk"
+SYMBOL_TO_PIECE = {
+    symbol: piece_type | (BLACK_FLAG if symbol.islower() else 0)
+    for piece_type, letter in enumerate(PIECE_SYMBOLS) if piece_type
+    for symbol in (letter, letter.upper())
+}
+PIECE_TO_SYMBOL = {piece: symbol for symbol, piece in SYMBOL_TO_PIECE.items()}
+
+FILE_NAMES = "abcdefgh"
+RANK_NAMES = "12345678"
+SQUARE_NAMES = [f + r for r in RANK_NAMES for f in FILE_NAMES]
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ = 1, 2, 4, 8
+CASTLING_SYMBOLS = ((CASTLE_WK, "K"), (CASTLE_WQ, "Q"), (CASTLE_BK, "k"), (CASTLE_BQ, "q"))
+
+def square(file: int, rank: int) -> int:
+    return rank * 8 + file
+
+def square_file(sq: int) -> int:
+    return sq & 7
+
+def square_rank(sq: int) -> int:
+    return sq >> 3
+
+def parse_square(name: str) -> int:
+    """Square index from a name like 'e4'"""
+    if len(name) != 2 or name[0] not in FILE_NAMES or name[1] not in RANK_NAMES:
+        raise ValueError(f"Invalid square: {name!r}")
+    return square(FILE_NAMES.index(name[0]), RANK_NAMES.index(name[1]))
+
+def encode_move(from_sq: int, to_sq: int, promotion: int = 0) -> int:
+    return from_sq | (to_sq << 6) | (promotion << 12)
+
+def move_from(move: int) -> int:
+    return move & 63
+
+def move_to(move: int) -> int:
+    return (move >> 6) & 63
+
+def move_promotion(move: int) -> int:
+    return move >> 12
+
+def move_to_uci(move: int) -> str:
+    uci = SQUARE_NAMES[move & 63] + SQUARE_NAMES[(move >> 6) & 63]
+    if move >> 12:
+        uci += PIECE_SYMBOLS[move >> 12]
+    return uci
+
+def _san_target(san: str) -> int:
+    """Destination square of a SAN move, or -1 for castling and unparseable text"""
+    if "=" in san:
+        san = san[:san.index("=")]
+    elif len(san) > 2 and san[-1] in "QRBNqrbn" and san[-2] in RANK_NAMES:
+        san = san[:-1]
+    if len(san) >= 2 and san[-2] in FILE_NAMES and san[-1] in RANK_NAMES:
+        return parse_square(san[-2:])
+    return -1
+
+def _targets(sq: int, offsets) -> tuple:
+    file, rank = square_file(sq), square_rank(sq)
+    result = []
+    for df, dr in offsets:
+        f, r = file + df, rank + dr
+        if 0 <= f < 8 and 0 <= r < 8:
+            result.append(square(f, r))
+    return tuple(result)
+
+def _ray(sq: int, df: int, dr: int) -> tuple:
+    file, rank = square_file(sq), square_rank(sq)
+    result = []
+    f, r = file + df, rank + dr
+    while 0 <= f < 8 and 0 <= r < 8:
+        result.append(square(f, r))
+        f, r = f + df, r + dr
+    return tuple(result)
+
+KNIGHT_TARGETS = [_targets(sq, ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)))
+                  for sq in range(64)]
+KING_TARGETS = [_targets(sq, ((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)))
+                for sq in range(64)]
+ORTHOGONAL_RAYS = [tuple(_ray(sq, df, dr) for df, dr in ((1, 0), (-1, 0), (0, 1), (0, -1)))
+                   for sq in range(64)]
+DIAGONAL_RAYS = [tuple(_ray(sq, df, dr) for df, dr in ((1, 1), (-1, 1), (1, -1), (-1, -1)))
+                 for sq in range(64)]
+# Squares from which a pawn of the given colour attacks the indexed square
+PAWN_ATTACKERS = [
+    [_targets(sq, ((-1, -1), (1, -1))) for sq in range(64)],
+    [_targets(sq, ((-1, 1), (1, 1))) for sq in range(64)],
+]
+
+# Castling rights lost when a piece moves from or to each square
+CASTLING_MASK = [15] * 64
+CASTLING_MASK[0] = 15 & ~CASTLE_WQ
+CASTLING_MASK[7] = 15 & ~CASTLE_WK
+CASTLING_MASK[4] = 15 & ~(CASTLE_WK | CASTLE_WQ)
+CASTLING_MASK[56] = 15 & ~CASTLE_BQ
+CASTLING_MASK[63] = 15 & ~CASTLE_BK
+CASTLING_MASK[60] = 15 & ~(CASTLE_BK | CASTLE_BQ)
+
+# Zobrist keys; a fixed seed keeps hashes stable across processes
+_rng = random.Random(0x5EED)
+ZOBRIST_PIECES = [[_rng.getrandbits(64) for _ in range(64)] for _ in range(16)]
+ZOBRIST_CASTLING = [_rng.getrandbits(64) for _ in range(16)]
+ZOBRIST_EP = [_rng.getrandbits(64) for _ in range(8)]
+ZOBRIST_BLACK = _rng.getrandbits(64)
+del _rng
+
+class Board:
+    """A chess position that can make and unmake moves"""
+
+    __slots__ = ("squares", "turn", "castling", "ep_square", "halfmove_clock",
+                 "fullmove_number", "kings", "key", "_stack")
+
+    def __init__(self, fen: str = STARTING_FEN):
+        self.set_fen(fen)
+
+    @classmethod
+    def from_fen(cls, fen: str) -> "Board":
+        return cls(fen)
+
+    def copy(self) -> "Board":
+        board = Board.__new__(Board)
+        board.squares = bytearray(self.squares)
+        board.turn = self.turn
+        board.castling = self.castling
+        board.ep_square = self.ep_square
+        board.halfmove_clock = self.halfmove_clock
+        board.fullmove_number = self.fullmove_number
+        board.kings = list(self.kings)
+        board.key = self.key
+        board._stack = []
+        return board
+
+    # ------------------------------------------------------------------ FEN
+
+    def set_fen(self, fen: str):
+        """Load a position, raising ValueError if the FEN is malformed or illegal"""
+        fields = fen.split()
+        if len(fields) == 4:
+            fields += ["0", "1"]
+        if len(fields) != 6:
+            raise ValueError("FEN must have 6 space-separated fields")
+        placement, turn, castling, ep, halfmove, fullmove = fields
+
+        squares = bytearray(64)
+        ranks = placement.split("/")
+        if len(ranks) != 8:
+            raise ValueError("FEN board must have 8 ranks")
+        for rank_index, rank_text in enumerate(ranks):
+            rank = 7 - rank_index
+            file = 0
+            for char in rank_text:
+                if char in "12345678":
+                    file += int(char)
+                elif char in SYMBOL_TO_PIECE:
+                    if file > 7:
+                        raise ValueError(f"Too many squares in rank {rank + 1}")
+                    squares[square(file, rank)] = SYMBOL_TO_PIECE[char]
+                    file += 1
+                else:
+                    raise ValueError(f"Invalid piece character {char!r}")
+            if file != 8:
+                raise ValueError(f"Rank {rank + 1} does not have 8 squares")
+
+        if turn not in ("w", "b"):
+            raise ValueError("Side to move must be 'w' or 'b'")
+
+        rights = 0
+        if castling != "-":
+            for char in castling:
+                flag = dict((symbol, flag) for flag, symbol in CASTLING_SYMBOLS).get(char)
+                if flag is None or rights & flag:
+                    raise ValueError(f"Invalid castling field {castling!r}")
+                rights |= flag
+
+        if ep == "-":
+            ep_square = -1
+        else:
+            ep_square = parse_square(ep)
+            if square_rank(ep_square) != (5 if turn == "w" else 2):
+                raise ValueError(f"Invalid en passant square {ep!r}")
+
+        try:
+            halfmove_clock, fullmove_number = int(halfmove), int(fullmove)
+        except ValueError:
+            raise ValueError("FEN move counters must be integers")
+        if halfmove_clock < 0 or fullmove_number < 1:
+            raise ValueError("FEN move counters out of range")
+
+        kings = [-1, -1]
+        for sq, piece in enumerate(squares):
+            if piece & 7 == KING:
+                color = piece >> 3
+                if kings[color] != -1:
+                    raise ValueError("Each side must have exactly one king")
+                kings[color] = sq
+            elif piece & 7 == PAWN and square_rank(sq) in (0, 7):
+                raise ValueError("Pawns cannot stand on the first or last rank")
+        if -1 in kings:
+            raise ValueError("Each side must have exactly one king")
+
+        self.squares = squares
+        self.turn = WHITE if turn == "w" else BLACK
+        self.kings = kings
+        # Drop rights that the piece placement makes impossible
+        for flag, king_sq, rook_sq, rook in ((CASTLE_WK, 4, 7, ROOK), (CASTLE_WQ, 4, 0, ROOK),
+                                             (CASTLE_BK, 60, 63, ROOK | BLACK_FLAG),
+                                             (CASTLE_BQ, 60, 56, ROOK | BLACK_FLAG)):
+            if rights & flag and (squares[king_sq] != (rook & BLACK_FLAG | KING) or squares[rook_sq] != rook):
+                rights &= ~flag
+        self.castling = rights
+        self.ep_square = ep_square
+        self.halfmove_clock = halfmove_clock
+        self.fullmove_number = fullmove_number
+        self._stack = []
+        self.key = self._compute_key()
+
+        if self.is_attacked(self.kings[self.turn ^ 1], self.turn):
+            raise ValueError("The side not to move is in check")
+
+    def board_fen(self) -> str:
+        rows = []
+        for rank in range(7, -1, -1):
+            row, empty = "", 0
+            for file in range(8):
+                piece = self.squares[square(file, rank)]
+                if piece:
+                    if empty:
+                        row += str(empty)
+                        empty = 0
+                    row += PIECE_TO_SYMBOL[piece]
+                else:
+                    empty += 1
+            if empty:
+                row += str(empty)
+            rows.append(row)
+        return "/".join(rows)
+
+    def castling_fen(self) -> str:
+        return "".join(symbol for flag, symbol in CASTLING_SYMBOLS if self.castling & flag) or "-"
+
+    def ep_fen(self) -> str:
+        # Only report an en passant square when a capture there is actually possible
+        if self.ep_square < 0:
+            return "-"
+        pawn = PAWN | (BLACK_FLAG if self.turn == BLACK else 0)
+        for attacker in PAWN_ATTACKERS[self.turn][self.ep_square]:
+            if self.squares[attacker] == pawn:
+                return SQUARE_NAMES[self.ep_square]
+        return "-"
+
+    def fen(self) -> str:
+        return " ".join((self.board_fen(), "wb"[self.turn], self.castling_fen(), self.ep_fen(),
+                         str(self.halfmove_clock), str(self.fullmove_number)))
+
+    def position_key(self) -> str:
+        """FEN without move counters, identifying a position for repetition"""
+        return " ".join((self.board_fen(), "wb"[self.turn], self.castling_fen(), self.ep_fen()))
+
+    def _compute_key(self) -> int:
+        key = 0
+        for sq, piece in enumerate(self.squares):
+            if piece:
+                key ^= ZOBRIST_PIECES[piece][sq]
+        key ^= ZOBRIST_CASTLING[self.castling]
+        if self.ep_square >= 0:
+            key ^= ZOBRIST_EP[self.ep_square & 7]
+        if self.turn == BLACK:
+            key ^= ZOBRIST_BLACK
+        return key
+
+    # -------------------------------------------------------------- attacks
+
+    def is_attacked(self, sq: int, by_color: int) -> bool:
+        """Whether any piece of by_color attacks sq"""
+        squares = self.squares
+        flag = BLACK_FLAG if by_color == BLACK else 0
+        pawn = PAWN | flag
+        for attacker in PAWN_ATTACKERS[by_color][sq]:
+            if squares[attacker] == pawn:
+                return True
+        knight = KNIGHT | flag
+        for attacker in KNIGHT_TARGETS[sq]:
+            if squares[attacker] == knight:
+                return True
+        king = KING | flag
+        for attacker in KING_TARGETS[sq]:
+            if squares[attacker] == king:
+                return True
+        rook, queen = ROOK | flag, QUEEN | flag
+        for ray in ORTHOGONAL_RAYS[sq]:
+            for target in ray:
+                piece = squares[target]
+                if piece:
+                    if piece == rook or piece == queen:
+                        return True
+                    break
+        bishop = BISHOP | flag
+        for ray in DIAGONAL_RAYS[sq]:
+            for target in ray:
+                piece = squares[target]
+                if piece:
+                    if piece == bishop or piece == queen:
+                        return True
+                    break
+        return False
+
+    def is_check(self) -> bool:
+        return self.is_attacked(self.kings[self.turn], self.turn ^ 1)
+
+    # ------------------------------------------------------- move generation
+
+    def pseudo_legal_moves(self) -> list:
+        """Moves that obey piece movement but may leave the king in check"""
+        moves = []
+        append = moves.append
+        squares = self.squares
+        us = self.turn
+        for from_sq in range(64):
+            piece = squares[from_sq]
+            if not piece or piece >> 3 != us:
+                continue
+            piece_type = piece & 7
+            if piece_type == PAWN:
+                self._pawn_moves(from_sq, moves)
+            elif piece_type == KNIGHT or piece_type == KING:
+                targets = KNIGHT_TARGETS[from_sq] if piece_type == KNIGHT else KING_TARGETS[from_sq]
+                for to_sq in targets:
+                    target = squares[to_sq]
+                    if not target or target >> 3 != us:
+                        append(from_sq | (to_sq << 6))
+            else:
+                rays = ()
+                if piece_type != BISHOP:
+                    rays = ORTHOGONAL_RAYS[from_sq]
+                if piece_type != ROOK:
+                    rays = rays + DIAGONAL_RAYS[from_sq]
+                for ray in rays:
+                    for to_sq in ray:
+                        target = squares[to_sq]
+                        if target:
+                            if target >> 3 != us:
+                                append(from_sq | (to_sq << 6))
+                            break
+                        append(from_sq | (to_sq << 6))
+        self._castling_moves(moves)
+        return moves
+
+    def _pawn_moves(self, from_sq: int, moves: list):
+        squares = self.squares
+        us = self.turn
+        forward = 8 if us == WHITE else -8
+        start_rank = 1 if us == WHITE else 6
+        last_rank = 7 if us == WHITE else 0
+        file = from_sq & 7
+
+        targets = []
+        one = from_sq + forward
+        if not squares[one]:
+            targets.append(one)
+            two = one + forward
+            if from_sq >> 3 == start_rank and not squares[two]:
+                moves.append(from_sq | (two << 6))
+        for df in (-1, 1):
+            if 0 <= file + df < 8:
+                to_sq = one + df
+                target = squares[to_sq]
+                if (target and target >> 3 != us) or to_sq == self.ep_square:
+                    targets.append(to_sq)
+        for to_sq in targets:
+            if to_sq >> 3 == last_rank:
+                for promotion in (QUEEN, KNIGHT, ROOK, BISHOP):
+                    moves.append(from_sq | (to_sq << 6) | (promotion << 12))
+            else:
+                moves.append(from_sq | (to_sq << 6))
+
+    def _castling_moves(self, moves: list):
+        if not self.castling:
+            return
+        squares = self.squares
+        us, them = self.turn, self.turn ^ 1
+        king_sq = 4 if us == WHITE else 60
+        kingside, queenside = (CASTLE_WK, CASTLE_WQ) if us == WHITE else (CASTLE_BK, CASTLE_BQ)
+        if self.castling & (kingside | queenside) and self.is_attacked(king_sq, them):
+            return
+        if (self.castling & kingside and not squares[king_sq + 1] and not squares[king_sq + 2]
+                and not self.is_attacked(king_sq + 1, them) and not self.is_attacked(king_sq + 2, them)):
+            moves.append(king_sq | ((king_sq + 2) << 6))
+        if (self.castling & queenside and not squares[king_sq - 1] and not squares[king_sq - 2]
+                and not squares[king_sq - 3]
+                and not self.is_attacked(king_sq - 1, them) and not self.is_attacked(king_sq - 2, them)):
+            moves.append(king_sq | ((king_sq - 2) << 6))
+
+    def legal_moves(self) -> list:
+        legal = []
+        us = self.turn
+        for move in self.pseudo_legal_moves():
+            self.push(move)
+            if not self.is_attacked(self.kings[us], us ^ 1):
+                legal.append(move)
+            self.pop()
+        return legal
+
+    def is_legal(self, move: int) -> bool:
+        """Whether a move is legal, without generating every legal move"""
+        if move not in self.pseudo_legal_moves():
+            return False
+        us = self.turn
+        self.push(move)
+        legal = not self.is_attacked(self.kings[us], us ^ 1)
+        self.pop()
+        return legal
+
+    def is_capture(self, move: int) -> bool:
+        to_sq = (move >> 6) & 63
+        return bool(self.squares[to_sq]) or (
+            to_sq == self.ep_square and self.squares[move & 63] & 7 == PAWN)
+
+    # ------------------------------------------------------- make / unmake
+
+    def push(self, move: int):
+        """Make a move; it must come from pseudo_legal_moves or legal_moves"""
+        squares = self.squares
+        from_sq, to_sq, promotion = move & 63, (move >> 6) & 63, move >> 12
+        piece = squares[from_sq]
+        captured = squares[to_sq]
+        piece_type = piece & 7
+        us = self.turn
+        key = self.key
+
+        capture_sq = to_sq
+        if piece_type == PAWN and to_sq == self.ep_square:
+            capture_sq = to_sq - 8 if us == WHITE else to_sq + 8
+            captured = squares[capture_sq]
+            squares[capture_sq] = 0
+
+        self._stack.append((move, captured, self.castling, self.ep_square,
+                            self.halfmove_clock, self.key))
+
+        if self.ep_square >= 0:
+            key ^= ZOBRIST_EP[self.ep_square & 7]
+        key ^= ZOBRIST_CASTLING[self.castling]
+        if captured:
+            key ^= ZOBRIST_PIECES[captured][capture_sq]
+
+        squares[from_sq] = 0
+        key ^= ZOBRIST_PIECES[piece][from_sq]
+        placed = (promotion | (piece & BLACK_FLAG)) if promotion else piece
+        squares[to_sq] = placed
+        key ^= ZOBRIST_PIECES[placed][to_sq]
+
+        if piece_type == KING:
+            self.kings[us] = to_sq
+            if to_sq - from_sq == 2 or from_sq - to_sq == 2:
+                rook_from, rook_to = (from_sq + 3, from_sq + 1) if to_sq > from_sq else (from_sq - 4, from_sq - 1)
+                rook = squares[rook_from]
+                squares[rook_from] = 0
+                squares[rook_to] = rook
+                key ^= ZOBRIST_PIECES[rook][rook_from] ^ ZOBRIST_PIECES[rook][rook_to]
+
+        self.castling &= CASTLING_MASK[from_sq] & CASTLING_MASK[to_sq]
+        key ^= ZOBRIST_CASTLING[self.castling]
+
+        if piece_type == PAWN and (to_sq - from_sq == 16 or from_sq - to_sq == 16):
+            self.ep_square = (from_sq + to_sq) >> 1
+            key ^= ZOBRIST_EP[self.ep_square & 7]
+        else:
+            self.ep_square = -1
+
+        if piece_type == PAWN or captured:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if us == BLACK:
+            self.fullmove_number += 1
+        self.turn = us ^ 1
+        self.key = key ^ ZOBRIST_BLACK
+
+    def pop(self) -> int:
+        """Unmake the last move and return it"""
+        move, captured, castling, ep_square, halfmove_clock, key = self._stack.pop()
+        squares = self.squares
+        from_sq, to_sq, promotion = move & 63, (move >> 6) & 63, move >> 12
+        self.turn ^= 1
+        us = self.turn
+        piece = squares[to_sq]
+        if promotion:
+            piece = PAWN | (piece & BLACK_FLAG)
+        squares[from_sq] = piece
+        squares[to_sq] = 0
+
+        piece_type = piece & 7
+        if piece_type == PAWN and to_sq == ep_square:
+            squares[to_sq - 8 if us == WHITE else to_sq + 8] = captured
+        else:
+            squares[to_sq] = captured
+        if piece_type == KING:
+            self.kings[us] = from_sq
+            if to_sq - from_sq == 2 or from_sq - to_sq == 2:
+                rook_from, rook_to = (from_sq + 3, from_sq + 1) if to_sq > from_sq else (from_sq - 4, from_sq - 1)
+                squares[rook_from] = squares[rook_to]
+                squares[rook_to] = 0
+
+        if us == BLACK:
+            self.fullmove_number -= 1
+        self.castling = castling
+        self.ep_square = ep_square
+        self.halfmove_clock = halfmove_clock
+        self.key = key
+        return move
+
+    def clear_history(self):
+        """Forget undo information for moves that will never be taken back"""
+        self._stack.clear()
+
+    def push_null(self):
+        """Pass the turn without moving (used by search pruning)"""
+        self._stack.append((-1, 0, self.castling, self.ep_square, self.halfmove_clock, self.key))
+        key = self.key
+        if self.ep_square >= 0:
+            key ^= ZOBRIST_EP[self.ep_square & 7]
+        self.ep_square = -1
+        self.turn ^= 1
+        self.key = key ^ ZOBRIST_BLACK
+
+    def pop_null(self):
+        _, _, castling, ep_square, halfmove_clock, key = self._stack.pop()
+        self.turn ^= 1
+        self.castling = castling
+        self.ep_square = ep_square
+        self.halfmove_clock = halfmove_clock
+        self.key = key
+
+    # ------------------------------------------------------------ notation
+
+    def parse_uci(self, text: str) -> int:
+        """Legal move from UCI notation such as 'e2e4' or 'e7e8q'"""
+        text = text.strip().lower()
+        if len(text) not in (4, 5):
+            raise ValueError(f"Invalid UCI move: {text!r}")
+        promotion = 0
+        if len(text) == 5:
+            if text[4] not in "nbrq":
+                raise ValueError(f"Invalid promotion piece in {text!r}")
+            promotion = PIECE_SYMBOLS.index(text[4])
+        move = encode_move(parse_square(text[:2]), parse_square(text[2:4]), promotion)
+        if not self.is_legal(move):
+            raise ValueError(f"Illegal move: {text}")
+        return move
+
+    def san(self, move: int) -> str:
+        """Standard algebraic notation for a legal move"""
+        return self._san(move, self.legal_moves())
+
+    def _san(self, move: int, legal: list) -> str:
+        squares = self.squares
+        from_sq, to_sq, promotion = move & 63, (move >> 6) & 63, move >> 12
+        piece_type = squares[from_sq] & 7
+
+        if piece_type == KING and abs(to_sq - from_sq) == 2:
+            san = "O-O" if to_sq > from_sq else "O-O-O"
+        else:
+            capture = self.is_capture(move)
+            if piece_type == PAWN:
+                san = FILE_NAMES[from_sq & 7] + "x" if capture else ""
+            else:
+                san = PIECE_SYMBOLS[piece_type].upper()
+                rivals = [other & 63 for other in legal
+                          if other != move and (other >> 6) & 63 == to_sq
+                          and squares[other & 63] & 7 == piece_type]
+                if rivals:
+                    same_file = any(r & 7 == from_sq & 7 for r in rivals)
+                    same_rank = any(r >> 3 == from_sq >> 3 for r in rivals)
+                    if not same_file:
+                        san += FILE_NAMES[from_sq & 7]
+                    elif not same_rank:
+                        san += RANK_NAMES[from_sq >> 3]
+                    else:
+                        san += SQUARE_NAMES[from_sq]
+                if capture:
+                    san += "x"
+            san += SQUARE_NAMES[to_sq]
+            if promotion:
+                san += "=" + PIECE_SYMBOLS[promotion].upper()
+
+        self.push(move)
+        if self.is_check():
+            san += "#" if not self.legal_moves() else "+"
+        self.pop()
+        return san
+
+    def parse_move(self, text: str) -> int:
+        """
+        Legal move from user input: SAN ('Nf3', 'exd5', 'O-O'), UCI ('g1f3')
+        or from-to with a dash ('g1-f3'). Raises ValueError otherwise.
+        """
+        text = text.strip()
+        cleaned = text.rstrip("+#!?").replace("0", "O")
+        if not cleaned:
+            raise ValueError("Empty move")
+        candidate = cleaned.replace("-", "") if cleaned[0] in FILE_NAMES and "-" in cleaned else cleaned
+        if len(candidate) in (4, 5) and candidate[0] in FILE_NAMES and candidate[1] in RANK_NAMES \
+                and candidate[2] in FILE_NAMES and candidate[3] in RANK_NAMES:
+            try:
+                promotion = PIECE_SYMBOLS.index(candidate[4].lower()) if len(candidate) == 5 else 0
+            except ValueError:
+                raise ValueError(f"Invalid move: {text}")
+            from_sq, to_sq = parse_square(candidate[:2]), parse_square(candidate[2:4])
+            if not promotion and self.squares[from_sq] & 7 == PAWN and to_sq >> 3 in (0, 7):
+                promotion = QUEEN
+            move = encode_move(from_sq, to_sq, promotion)
+            if self.is_legal(move):
+                return move
+            raise ValueError(f"Illegal move: {text}")
+        # Only moves to the SAN's destination square can match, and only they
+        # matter for disambiguation, so skip writing SAN for every legal move
+        target = _san_target(cleaned)
+        us = self.turn
+        legal = []
+        for move in self.pseudo_legal_moves():
+            if target >= 0 and (move >> 6) & 63 != target:
+                continue
+            self.push(move)
+            if not self.is_attacked(self.kings[us], us ^ 1):
+                legal.append(move)
+            self.pop()
+        for move in legal:
+            san = self._san(move, legal).rstrip("+#")
+            if san == cleaned or san.replace("=", "") == cleaned:
+                return move
+        raise ValueError(f"Illegal move: {text}")
+
+    # ------------------------------------------------------------- outcome
+
+    def is_insufficient_material(self) -> bool:
+        minors = []
+        for sq, piece in enumerate(self.squares):
+            piece_type = piece & 7
+            if piece_type in (PAWN, ROOK, QUEEN):
+                return False
+            if piece_type in (KNIGHT, BISHOP):
+                minors.append((piece_type, ((sq & 7) + (sq >> 3)) & 1))
+        if len(minors) <= 1:
+            return True
+        # Any number of bishops all on the same square colour cannot mate
+        return all(t == BISHOP for t, _ in minors) and len({c for _, c in minors}) == 1
+
+    def outcome(self):
+        """
+        Why the game is over ('checkmate', 'stalemate', 'fifty_moves',
+        'insufficient_material'), or None if it is still in progress.
+        Repetition needs the game history and is tracked by the caller.
+        """
+        if not self.legal_moves():
+            return "checkmate" if self.is_check() else "stalemate"
+        if self.halfmove_clock >= 100:
+            return "fifty_moves"
+        if self.is_insufficient_material():
+            return "insufficient_material"
+        return None
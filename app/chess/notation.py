@@ -0,0 +1,93 @@
+"""
+Validation and normalisation of stored chess notation.
+
+Positions are stored as the FEN `Board` writes back out (six fields, castling
+rights and en passant squares only where they are possible), and solutions as
+space-separated UCI moves, so equal positions and lines compare equal as
+strings. Parsed positions and solutions are memoised: bulk imports repeat the
+same positions and the same few openings over and over.
+"""
+import os
+import re
+from functools import lru_cache
+from app.chess.board import Board, move_to_uci
+from app.metrics import register_metrics
+
+# Distinct positions (and position/solution pairs) kept parsed per worker
+NOTATION_CACHE_SIZE = int(os.getenv("NOTATION_CACHE_SIZE", "65536"))
+
+# A SAN, UCI or from-to move, with optional check and annotation marks
+MOVE_PATTERN = re.compile(
+    r"(?:[KQRBN][a-h]?[1-8]?x?[a-h][1-8]|[a-h](?:x[a-h])?[1-8](?:=?[QRBNqrbn])?"
+    r"|[a-h][1-8]-?[a-h][1-8][qrbnQRBN]?|[O0]-[O0](?:-[O0])?)[+#]?[!?]{0,2}")
+# Move numbers such as "1." or "12..." that may precede moves in a solution
+MOVE_NUMBER = re.compile(r"\d+\.+")
+
+@lru_cache(maxsize=NOTATION_CACHE_SIZE)
+def _position(fen: str) -> Board:
+    # Shared cached instance: callers must copy before making moves
+    return Board(fen)
+
+@lru_cache(maxsize=NOTATION_CACHE_SIZE)
+def normalize_fen(fen: str) -> str:
+    """Canonical FEN of a position, raising ValueError if it is malformed or illegal"""
+    return _position(" ".join(fen.split())).fen()
+
+def solution_moves(solution: str) -> list:
+    """Move tokens of a solution, dropping move numbers; ValueError if any isn't a move"""
+    moves = []
+    for token in solution.replace(",", " ").split():
+        number = MOVE_NUMBER.match(token)
+        if number:
+            token = token[number.end():]
+            if not token:
+                continue
+        if not MOVE_PATTERN.fullmatch(token):
+            raise ValueError(f"Invalid move {token!r}")
+        moves.append(token)
+    if not moves:
+        raise ValueError("Solution must contain at least one move")
+    return moves
+
+@lru_cache(maxsize=NOTATION_CACHE_SIZE)
+def normalize_solution(fen: str, solution: str) -> str:
+    """
+    A solution (SAN, UCI or from-to moves) played out from `fen` and written
+    as space-separated UCI moves. Raises ValueError on an illegal move.
+    """
+    board = _position(" ".join(fen.split())).copy()
+    uci_moves = []
+    for text in solution_moves(solution):
+        try:
+            move = board.parse_move(text)
+        except ValueError:
+            raise ValueError(f"Illegal move {text!r} after {' '.join(uci_moves) or 'the puzzle position'}")
+        uci_moves.append(move_to_uci(move))
+        board.push(move)
+    return " ".join(uci_moves)
+
+def solution_matches(fen: str, solution: str, answer: str) -> bool:
+    """
+    Whether an answer plays the whole solution, in any notation. Only the full
+    line counts: its first move alone doesn't solve a multi-move puzzle.
+    Solutions that can't be played out from `fen` match on the raw text.
+    """
+    try:
+        expected = normalize_solution(fen, solution)
+    except ValueError:
+        return answer.strip().lower() == solution.strip().lower()
+    try:
+        return normalize_solution(fen, answer) == expected
+    except ValueError:
+        return False
+
+def check_moves(solution: str) -> str:
+    """A solution whose moves are all well formed; legality needs the position"""
+    solution_moves(solution)
+    return solution.strip()
+
+register_metrics("notation_cache", lambda: {
+    name: function.cache_info()._asdict()
+    for name, function in (("positions", _position), ("fens", normalize_fen),
+                           ("solutions", normalize_solution))
+})
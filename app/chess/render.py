@@ -0,0 +1,174 @@
+"""
+Board diagrams as SVG, and as PNG when cairosvg and the Cairo library are available.
+
+Rendered images are content addressed: the key hashes everything that affects
+the picture (piece placement, orientation, highlighted move, size, format), so
+an entry never goes stale. Images are kept in an in-memory LRU in front of an
+on-disk cache shared by all workers.
+"""
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from app.chess.board import Board, WHITE, BLACK_FLAG, parse_square, square_file, square_rank
+from app.metrics import register_metrics
+
+try:
+    import cairosvg
+except (ImportError, OSError):
+    # cairosvg also raises OSError when the cairo library itself is missing
+    cairosvg = None
+
+BOARD_CACHE_DIR = os.getenv("BOARD_CACHE_DIR", ".cache/boards")
+# Rendered images kept in memory per worker
+BOARD_CACHE_SIZE = int(os.getenv("BOARD_CACHE_SIZE", "512"))
+
+# Bump when the drawing changes so cached images are not reused
+RENDER_VERSION = 1
+DEFAULT_SIZE = 360
+MIN_SIZE, MAX_SIZE = 64, 1024
+MEDIA_TYPES = {"svg": "image/svg+xml", "png": "image/png"}
+PROMOTION_LETTERS = "qrbn"
+
+LIGHT_SQUARE = "#f0d9b5"
+DARK_SQUARE = "#b58863"
+HIGHLIGHT = "#cdd26a"
+# Solid glyphs for both sides; white pieces get a white fill with a dark outline
+PIECE_GLYPHS = {1: "♟", 2: "♞", 3: "♝", 4: "♜", 5: "♛", 6: "♚"}
+PIECE_FONT = "DejaVu Sans, Segoe UI Symbol, Noto Sans Symbols2, serif"
+
+def render_svg(board: Board, orientation: int = WHITE, last_move: tuple = None,
+               size: int = DEFAULT_SIZE) -> str:
+    """Draw a board as SVG, from white's side unless `orientation` is BLACK"""
+    cell = size / 8
+    highlighted = set(last_move or ())
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+             f'viewBox="0 0 {size} {size}">']
+    for sq in range(64):
+        file, rank = square_file(sq), square_rank(sq)
+        column, row = (file, 7 - rank) if orientation == WHITE else (7 - file, rank)
+        x, y = column * cell, row * cell
+        color = LIGHT_SQUARE if (file + rank) % 2 else DARK_SQUARE
+        parts.append(f'<rect x="{x:g}" y="{y:g}" width="{cell:g}" height="{cell:g}" fill="{color}"/>')
+        if sq in highlighted:
+            parts.append(f'<rect x="{x:g}" y="{y:g}" width="{cell:g}" height="{cell:g}" '
+                         f'fill="{HIGHLIGHT}" fill-opacity="0.75"/>')
+        piece = board.squares[sq]
+        if piece:
+            fill, stroke = ("#000", "none") if piece & BLACK_FLAG else ("#fff", "#000")
+            parts.append(
+                f'<text x="{x + cell / 2:g}" y="{y + cell / 2:g}" font-size="{cell * 0.8:g}" '
+                f'font-family="{PIECE_FONT}" text-anchor="middle" dominant-baseline="central" '
+                f'fill="{fill}" stroke="{stroke}" stroke-width="{cell / 45:g}">'
+                f'{PIECE_GLYPHS[piece & 7]}</text>')
+    parts.append("</svg>")
+    return "".join(parts)
+
+def parse_highlight(move: str) -> tuple:
+    """From and to squares of a UCI move like e2e4 or e7e8q, raising ValueError if malformed"""
+    if len(move) not in (4, 5) or (len(move) == 5 and move[4] not in PROMOTION_LETTERS):
+        raise ValueError("last_move must be a UCI move like e2e4 or e7e8q")
+    from_sq, to_sq = parse_square(move[:2]), parse_square(move[2:4])
+    if from_sq == to_sq:
+        raise ValueError("last_move must be a UCI move like e2e4 or e7e8q")
+    return from_sq, to_sq
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header lists `etag`, using the weak comparison it calls for"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque
+               for candidate in if_none_match.split(","))
+
+def image_key(board: Board, orientation: int, last_move: tuple, size: int, image_format: str) -> str:
+    """Content address of a rendered image"""
+    highlight = "-".join(str(sq) for sq in last_move) if last_move else "-"
+    text = f"{RENDER_VERSION}|{board.board_fen()}|{orientation}|{highlight}|{size}|{image_format}"
+    return hashlib.sha256(text.encode()).hexdigest()
+
+class BoardImageCache:
+    """LRU of rendered images in memory, backed by files under BOARD_CACHE_DIR"""
+
+    def __init__(self, directory: str = BOARD_CACHE_DIR, maxsize: int = BOARD_CACHE_SIZE):
+        self.directory = directory
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.renders = 0
+
+    def _path(self, key: str, image_format: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{image_format}")
+
+    def _read(self, path: str):
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write via a temp file so another worker never reads a partial image
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _remember(self, key: str, data: bytes):
+        self._entries[key] = data
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get_or_render(self, key: str, image_format: str, render) -> bytes:
+        """Return the image for `key`, calling `render()` (blocking) on a miss"""
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            return data
+        path = self._path(key, image_format)
+        data = await asyncio.to_thread(self._read, path)
+        if data is not None:
+            self.disk_hits += 1
+        else:
+            data = await asyncio.to_thread(render)
+            self.renders += 1
+            try:
+                await asyncio.to_thread(self._write, path, data)
+            except OSError as e:
+                print(f"Could not cache board image {key}: {e}")
+        self._remember(key, data)
+        return data
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "maxsize": self.maxsize,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "renders": self.renders,
+            "png_available": cairosvg is not None,
+        }
+
+board_images = BoardImageCache()
+register_metrics("board_images", board_images.stats)
+
+async def board_image(board: Board, orientation: int, last_move: tuple, size: int,
+                      image_format: str) -> bytes:
+    """Rendered image bytes, from cache when possible. PNG needs cairosvg."""
+    if image_format == "png" and cairosvg is None:
+        raise RuntimeError("PNG rendering needs the cairosvg package")
+    key = image_key(board, orientation, last_move, size, image_format)
+
+    def render() -> bytes:
+        svg = render_svg(board, orientation, last_move, size).encode()
+        if image_format == "png":
+            return cairosvg.svg2png(bytestring=svg, output_width=size, output_height=size)
+        return svg
+
+    return await board_images.get_or_render(key, image_format, render)
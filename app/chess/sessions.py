@@ -0,0 +1,276 @@
+import asyncio
+import os
+import random
+import secrets
+import time
+from array import array
+from collections import OrderedDict
+from app.chess.board import Board, WHITE
+from app.database.pool import read_pool, write_pool
+from app.engine.pool import DEFAULT_ENGINE_LEVEL
+
+BLIND_PLAY_IDLE_TIMEOUT = float(os.getenv("BLIND_PLAY_IDLE_TIMEOUT", "1800"))
+BLIND_PLAY_MAX_SESSIONS = int(os.getenv("BLIND_PLAY_MAX_SESSIONS", "10000"))
+BLIND_PLAY_MAX_SESSIONS_PER_USER = int(os.getenv("BLIND_PLAY_MAX_SESSIONS_PER_USER", "10"))
+
+def choose_reply(board: Board) -> int:
+    """Random reply, used when no engine move is available"""
+    return random.choice(board.legal_moves())
+
+class BlindPlaySession:
+    """
+    One server-held blind-play game. The user plays white.
+
+    Only what the rules need is kept: the current board (no undo stack), the
+    moves as 2-byte ints, and the position hashes since the last capture or
+    pawn move for repetition detection.
+    """
+
+    __slots__ = ("game_id", "user_id", "level", "board", "moves", "recent_keys",
+                 "started_at", "last_active", "result", "reason", "stored_ply")
+
+    def __init__(self, game_id: str, user_id: int, level: int = DEFAULT_ENGINE_LEVEL):
+        self.game_id = game_id
+        self.user_id = user_id
+        self.level = level
+        self.board = Board()
+        self.moves = array("H")
+        self.recent_keys = array("Q", [self.board.key])
+        self.started_at = time.time()
+        self.last_active = time.time()
+        self.result = None
+        self.reason = None
+        # Moves saved in blind_play_sessions; a save only succeeds if the row still has this many
+        self.stored_ply = 0
+
+    @classmethod
+    def restore(cls, row) -> "BlindPlaySession":
+        """Rebuild a session from its blind_play_sessions row by replaying the moves"""
+        session = cls(row["game_id"], row["user_id"], row["level"])
+        session.started_at = row["started_at"]
+        session.last_active = row["updated_at"]
+        moves = array("H")
+        moves.frombytes(row["moves"])
+        for move in moves:
+            session._push(move)
+        session.stored_ply = len(session.moves)
+        return session
+
+    @property
+    def finished(self) -> bool:
+        return self.result is not None
+
+    def _push(self, move: int) -> str:
+        board = self.board
+        san = board.san(move)
+        board.push(move)
+        board.clear_history()
+        self.moves.append(move)
+        if board.halfmove_clock == 0:
+            del self.recent_keys[:]
+        self.recent_keys.append(board.key)
+        self._check_outcome()
+        return san
+
+    def _check_outcome(self):
+        board = self.board
+        reason = board.outcome()
+        if reason is None and self.recent_keys.count(board.key) >= 3:
+            reason = "threefold_repetition"
+        if reason is None:
+            return
+        self.reason = reason
+        if reason == "checkmate":
+            self.result = "loss" if board.turn == WHITE else "win"
+        else:
+            self.result = "draw"
+
+    def play(self, text: str) -> str:
+        """Apply the user's move and return it in SAN. Raises ValueError for illegal input."""
+        if self.finished:
+            raise ValueError("Game is already over")
+        if self.board.turn != WHITE:
+            raise ValueError("Waiting for the opponent's move")
+        self.last_active = time.time()
+        return self._push(self.board.parse_move(text))
+
+    def reply(self, move=None) -> str:
+        """Play the opponent's move, choosing one if none is given"""
+        if move is None:
+            move = choose_reply(self.board)
+        return self._push(move)
+
+    def resign(self):
+        if not self.finished:
+            self.result = "loss"
+            self.reason = "resignation"
+
+    def san_moves(self) -> list:
+        """Replay the game to produce its moves in SAN"""
+        board = Board()
+        result = []
+        for move in self.moves:
+            result.append(board.san(move))
+            board.push(move)
+        return result
+
+    def movetext(self) -> str:
+        """PGN move text, e.g. '1. e4 e5 2. Nf3'"""
+        parts = []
+        for index, san in enumerate(self.san_moves()):
+            if index % 2 == 0:
+                parts.append(f"{index // 2 + 1}.")
+            parts.append(san)
+        return " ".join(parts)
+
+    def duration(self) -> int:
+        return int(time.time() - self.started_at)
+
+    def snapshot(self, include_moves: bool = True) -> dict:
+        state = {
+            "game_id": self.game_id,
+            "fen": self.board.fen(),
+            "status": "finished" if self.finished else "active",
+            "result": self.result,
+            "reason": self.reason,
+            "ply": len(self.moves),
+            "level": self.level,
+        }
+        if include_moves:
+            state["moves"] = self.san_moves()
+        return state
+
+class SessionStore:
+    """
+    Blind-play sessions. Every active game is stored in blind_play_sessions, so
+    a client can resume it on whichever worker its connection lands on. Each
+    worker keeps recently used sessions in memory, bounded in size, so the moves
+    aren't replayed on every message. Sessions without a move for longer than
+    `idle_timeout` are dropped by `run_eviction`.
+    """
+
+    def __init__(self, max_sessions: int = BLIND_PLAY_MAX_SESSIONS,
+                 idle_timeout: float = BLIND_PLAY_IDLE_TIMEOUT,
+                 max_per_user: int = BLIND_PLAY_MAX_SESSIONS_PER_USER):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_per_user = max_per_user
+        self._sessions = OrderedDict()
+        self.created = 0
+        self.restored = 0
+        self.conflicts = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _remember(self, session: BlindPlaySession):
+        self._sessions[session.game_id] = session
+        self._sessions.move_to_end(session.game_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def forget(self, game_id: str):
+        """Drop a session from this worker's memory; the stored game is untouched"""
+        return self._sessions.pop(game_id, None)
+
+    def _from_row(self, row) -> BlindPlaySession:
+        """The cached session for a row, rebuilt if another worker moved since"""
+        session = self._sessions.get(row["game_id"])
+        if session is None or session.stored_ply != row["ply"]:
+            session = BlindPlaySession.restore(row)
+            self.restored += 1
+        self._remember(session)
+        return session
+
+    async def create(self, user_id: int, level: int = DEFAULT_ENGINE_LEVEL) -> BlindPlaySession:
+        """Start a session, raising ValueError if the user already has too many"""
+        session = BlindPlaySession(secrets.token_urlsafe(9), user_id, level)
+        async with write_pool.connection() as db:
+            cursor = await db.execute(
+                """INSERT INTO blind_play_sessions (game_id, user_id, level, moves, ply, started_at, updated_at)
+                   SELECT ?, ?, ?, ?, 0, ?, ?
+                   WHERE (SELECT COUNT(*) FROM blind_play_sessions WHERE user_id = ?) < ?""",
+                (session.game_id, user_id, level, b"", session.started_at, session.last_active,
+                 user_id, self.max_per_user)
+            )
+            await db.commit()
+        if cursor.rowcount == 0:
+            raise ValueError(f"At most {self.max_per_user} games can be active at once")
+        self._remember(session)
+        self.created += 1
+        return session
+
+    async def get(self, game_id: str, user_id: int):
+        """Return the user's session, or None if it doesn't exist or isn't theirs"""
+        async with read_pool.connection() as db:
+            cursor = await db.execute("SELECT * FROM blind_play_sessions WHERE game_id = ?", (game_id,))
+            row = await cursor.fetchone()
+        if row is None or row["user_id"] != user_id:
+            self.forget(game_id)
+            return None
+        return self._from_row(row)
+
+    async def for_user(self, user_id: int) -> list:
+        async with read_pool.connection() as db:
+            cursor = await db.execute(
+                "SELECT * FROM blind_play_sessions WHERE user_id = ? ORDER BY started_at", (user_id,))
+            rows = await cursor.fetchall()
+        return [self._from_row(row) for row in rows]
+
+    async def save(self, session: BlindPlaySession):
+        """
+        Store the moves played since the last save. Raises ValueError if the game
+        was ended or moved on another connection in the meantime.
+        """
+        async with write_pool.connection() as db:
+            cursor = await db.execute(
+                """UPDATE blind_play_sessions SET moves = ?, ply = ?, updated_at = ?
+                   WHERE game_id = ? AND ply = ?""",
+                (session.moves.tobytes(), len(session.moves), session.last_active,
+                 session.game_id, session.stored_ply)
+            )
+            await db.commit()
+        if cursor.rowcount == 0:
+            self.forget(session.game_id)
+            self.conflicts += 1
+            raise ValueError("Game not found or moved on another connection; resume it to continue")
+        session.stored_ply = len(session.moves)
+
+    async def claim(self, db, session: BlindPlaySession) -> bool:
+        """
+        Delete a finished session inside the caller's transaction. Returns False
+        if another message already ended or moved it, so it's stored only once.
+        """
+        self.forget(session.game_id)
+        cursor = await db.execute(
+            "DELETE FROM blind_play_sessions WHERE game_id = ? AND ply = ?",
+            (session.game_id, session.stored_ply)
+        )
+        return cursor.rowcount == 1
+
+    async def evict_idle(self, now: float = None) -> int:
+        """Delete sessions that have gone without a move past the timeout"""
+        cutoff = (time.time() if now is None else now) - self.idle_timeout
+        for game_id in [game_id for game_id, session in self._sessions.items()
+                        if session.last_active < cutoff]:
+            self.forget(game_id)
+        async with write_pool.connection() as db:
+            cursor = await db.execute("DELETE FROM blind_play_sessions WHERE updated_at < ?", (cutoff,))
+            await db.commit()
+        self.evicted += cursor.rowcount
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        return {"cached": len(self._sessions), "created": self.created, "restored": self.restored,
+                "conflicts": self.conflicts, "evicted": self.evicted,
+                "max_sessions": self.max_sessions}
+
+async def run_eviction(store: SessionStore, interval: float = 60.0):
+    """Background task evicting idle sessions"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await store.evict_idle()
+        except Exception as e:
+            print(f"Blind-play session eviction failed: {e}")
@@ -0,0 +1,137 @@
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from app.database.database import DATABASE_URL
+from app.database.pool import read_pool
+
+# Where snapshots are written, and how many are kept
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+BACKUPS_KEPT = int(os.getenv("BACKUPS_KEPT", "7"))
+# Rows read per query when exporting
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+SNAPSHOT_PREFIX = "chess_service-"
+
+# Tables that can be exported, with the columns left out of the export
+EXPORT_TABLES = {
+    "users": {"hashed_password"},
+    "categories": set(),
+    "courses": set(),
+    "puzzles": set(),
+    "games": set(),
+    "puzzle_attempts": set(),
+    "purchases": set(),
+    "rating_history": set(),
+    "daily_stats": set(),
+    "leaderboard_snapshots": set(),
+}
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def _snapshot(path: str) -> dict:
+    """Copy the live database to `path` with the online backup API"""
+    started = time.perf_counter()
+    partial = path + ".partial"
+    source = sqlite3.connect(f"file:{DATABASE_URL}?mode=ro", uri=True)
+    target = sqlite3.connect(partial)
+    try:
+        try:
+            # One step: in WAL mode the copy reads a snapshot and never blocks
+            # writers, whereas a stepwise copy restarts whenever anything writes
+            source.backup(target, pages=-1)
+            check = target.execute("PRAGMA quick_check").fetchone()[0]
+            if check != "ok":
+                raise sqlite3.DatabaseError(f"Snapshot failed integrity check: {check}")
+        finally:
+            target.close()
+            source.close()
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(partial)
+        raise
+    # Only complete, checked snapshots get their final name
+    os.replace(partial, path)
+    return {
+        "file": os.path.basename(path),
+        "bytes": os.path.getsize(path),
+        "duration_ms": int((time.perf_counter() - started) * 1000),
+    }
+
+def list_snapshots() -> list:
+    """Completed snapshots, newest first"""
+    if not os.path.isdir(BACKUP_DIR):
+        return []
+    snapshots = []
+    for name in os.listdir(BACKUP_DIR):
+        if name.startswith(SNAPSHOT_PREFIX) and name.endswith(".db"):
+            stat = os.stat(os.path.join(BACKUP_DIR, name))
+            snapshots.append({
+                "file": name,
+                "bytes": stat.st_size,
+                "created_at": datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(),
+            })
+    return sorted(snapshots, key=lambda snapshot: snapshot["file"], reverse=True)
+
+def _prune_snapshots() -> int:
+    removed = 0
+    for snapshot in list_snapshots()[max(1, BACKUPS_KEPT):]:
+        os.remove(os.path.join(BACKUP_DIR, snapshot["file"]))
+        removed += 1
+    return removed
+
+async def create_snapshot() -> dict:
+    """Write a timestamped snapshot to BACKUP_DIR and prune the oldest ones"""
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = os.path.join(BACKUP_DIR, f"{SNAPSHOT_PREFIX}{stamp}.db")
+    # The copy is blocking sqlite3 work, so it runs off the event loop
+    result = await asyncio.to_thread(_snapshot, path)
+    result["pruned"] = await asyncio.to_thread(_prune_snapshots)
+    return result
+
+async def export_columns(table: str) -> list:
+    """Exportable columns of a whitelisted table"""
+    async with read_pool.connection() as db:
+        cursor = await db.execute(f"PRAGMA table_info({table})")
+        columns = [row["name"] for row in await cursor.fetchall()]
+    return [column for column in columns if column not in EXPORT_TABLES[table]]
+
+async def export_rows(table: str, columns: list, export_format: str):
+    """
+    Yield a table as NDJSON lines or CSV text, one chunk of rows at a time.
+    Rows are paged by rowid and a read connection is only held per chunk, so
+    memory stays constant and slow downloads don't tie up the pool.
+    """
+    column_list = ", ".join(columns)
+    if export_format == "csv":
+        yield _csv_line(columns)
+    last_rowid = 0
+    while True:
+        async with read_pool.connection() as db:
+            cursor = await db.execute(
+                f"SELECT rowid, {column_list} FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (last_rowid, EXPORT_CHUNK_SIZE)
+            )
+            rows = await cursor.fetchall()
+        if not rows:
+            return
+        last_rowid = rows[-1][0]
+        if export_format == "csv":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(tuple(row)[1:] for row in rows)
+            yield buffer.getvalue()
+        else:
+            yield "".join(json.dumps(dict(zip(columns, tuple(row)[1:]))) + "\n" for row in rows)
+        if len(rows) < EXPORT_CHUNK_SIZE:
+            return
+
+def _csv_line(values) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
@@ -0,0 +1,178 @@
+import json
+import os
+import sqlite3
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from app.database.pool import write_pool
+
+# Items applied per transaction before committing, so other writers get a turn
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+class BulkItemError(Exception):
+    """An item of a bulk request that can't be applied; reported and skipped"""
+
+async def read_items(request: Request):
+    """
+    Yield (item, error) pairs from a bulk request body: a JSON array, or
+    NDJSON (one object per line) which is consumed as it streams in.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in NDJSON_CONTENT_TYPES:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield _parse_line(line)
+        if buffer.strip():
+            yield _parse_line(buffer)
+        return
+
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    for item in items:
+        yield item, None
+
+def _parse_line(line: bytes):
+    try:
+        return json.loads(line), None
+    except ValueError:
+        return None, "Invalid JSON"
+
+def item_id(item: dict) -> int:
+    """The integer `id` of an update or delete item"""
+    value = item.get("id")
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise BulkItemError("id must be an integer")
+    return value
+
+def describe_error(error: Exception) -> str:
+    """One-line message for an item error, flattening pydantic validation errors"""
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(str(part) for part in e['loc']) or 'data'}: {e['msg']}"
+                         for e in error.errors())
+    return str(error)
+
+def table_handlers(table: str, model) -> dict:
+    """
+    create/update/upsert/delete handlers for a table whose columns match the
+    fields of `model`. Items look like {"op": "update", "id": 3, "data": {...}}.
+    """
+    columns = list(model.model_fields)
+    column_list = ", ".join(columns)
+    placeholders = ", ".join("?" for _ in columns)
+    assignments = ", ".join(f"{column} = ?" for column in columns)
+    upsert_assignments = ", ".join(f"{column} = excluded.{column}" for column in columns)
+
+    def values(item: dict) -> list:
+        data = model.model_validate(item.get("data"))
+        return [getattr(data, column) for column in columns]
+
+    async def create(db, item):
+        cursor = await db.execute(
+            f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})", values(item))
+        return cursor.lastrowid
+
+    async def update(db, item):
+        row_id = item_id(item)
+        cursor = await db.execute(
+            f"UPDATE {table} SET {assignments} WHERE id = ?", values(item) + [row_id])
+        if cursor.rowcount == 0:
+            raise BulkItemError("Not found")
+        return row_id
+
+    async def upsert(db, item):
+        row_id = item_id(item)
+        await db.execute(
+            f"""INSERT INTO {table} (id, {column_list}) VALUES (?, {placeholders})
+                ON CONFLICT(id) DO UPDATE SET {upsert_assignments}""",
+            [row_id] + values(item))
+        return row_id
+
+    async def delete(db, item):
+        row_id = item_id(item)
+        cursor = await db.execute(f"DELETE FROM {table} WHERE id = ?", (row_id,))
+        if cursor.rowcount == 0:
+            raise BulkItemError("Not found")
+        return row_id
+
+    return {"create": create, "update": update, "upsert": upsert, "delete": delete}
+
+async def _read_batch(items, size: int = None) -> list:
+    """Up to `size` (item, error) pairs from `items`, or all that are left when size is None"""
+    batch = []
+    async for entry in items:
+        batch.append(entry)
+        if size is not None and len(batch) >= size:
+            break
+    return batch
+
+async def apply_bulk(items, handlers: dict, batch_size: int = BULK_BATCH_SIZE,
+                     atomic: bool = False) -> dict:
+    """
+    Apply bulk items on the writer connection. Items are read from the request
+    a batch at a time and the write transaction only starts once the batch is
+    in memory, so a slow client never holds the database lock. Each item runs
+    in a savepoint so a failing item is rolled back and reported without
+    losing the rest, and each batch is committed on its own. With `atomic`,
+    the whole request is read first and applied as one transaction that the
+    first failure rolls back. Callers must not hold a pooled connection while
+    this runs, or a slow body would keep it busy for the whole upload.
+    """
+    batch_size = max(1, batch_size)
+    results = []
+    succeeded = failed = 0
+
+    while True:
+        batch = await _read_batch(items, None if atomic else batch_size)
+        if not batch:
+            break
+        async with write_pool.connection() as db:
+            await db.execute("BEGIN IMMEDIATE")
+            try:
+                for item, error in batch:
+                    op = item.get("op") if isinstance(item, dict) else None
+                    result = {"index": len(results), "op": op}
+                    if error is None:
+                        if not isinstance(item, dict):
+                            error = "Each item must be a JSON object"
+                        elif op not in handlers:
+                            error = f"op must be one of: {', '.join(handlers)}"
+                    if error is None:
+                        await db.execute("SAVEPOINT bulk_item")
+                        try:
+                            result["id"] = await handlers[op](db, item)
+                        except (BulkItemError, ValueError, sqlite3.Error) as e:
+                            await db.execute("ROLLBACK TO bulk_item")
+                            error = describe_error(e)
+                        await db.execute("RELEASE bulk_item")
+
+                    if error is None:
+                        result["status"] = "ok"
+                        succeeded += 1
+                    else:
+                        result["status"] = "error"
+                        result["error"] = error
+                        failed += 1
+                    results.append(result)
+
+                    if atomic and error is not None:
+                        await db.rollback()
+                        return {"succeeded": 0, "failed": failed, "rolled_back": True,
+                                "results": results}
+                await db.commit()
+            except BaseException:
+                await db.rollback()
+                raise
+        if atomic:
+            break
+
+    return {"succeeded": succeeded, "failed": failed, "rolled_back": False,
+            "results": results}
@@ -0,0 +1,169 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from app.database.database import connect
+from app.metrics import register_metrics
+
+# How often each worker checks whether another worker invalidated a namespace
+CACHE_SYNC_INTERVAL = float(os.getenv("CACHE_SYNC_INTERVAL", "1.0"))
+
+_caches = {}
+_MISSING = object()
+# Highest cache_versions.seq this worker has acted on
+_last_seq = 0
+# Separates a namespace from a key in per-key cache_versions rows
+KEY_SEPARATOR = ":"
+
+class SharedCache:
+    """
+    In-process LRU cache for one namespace.
+
+    Every worker process keeps its own copy. Writers call `invalidate`, which
+    bumps the namespace's row in `cache_versions`; `watch_invalidations` notices
+    the bump in the other workers and clears their copies. `invalidate_keys`
+    does the same for single entries; `key_type` turns the key back from text.
+    """
+
+    def __init__(self, namespace: str, maxsize: int = 256, ttl: float = None, key_type=str):
+        self.namespace = namespace
+        self.key_type = key_type
+        self.maxsize = maxsize
+        # Seconds an entry is served before being reloaded; None keeps it until invalidated
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._stored_at = {}
+        _caches[namespace] = self
+
+    def get(self, key, default=None):
+        """Return a cached value, or default when missing or expired"""
+        if key in self._entries:
+            if self.ttl is not None and time.monotonic() - self._stored_at[key] > self.ttl:
+                del self._entries[key]
+                del self._stored_at[key]
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        self.misses += 1
+        return default
+
+    def set(self, key, value, generation: int = None):
+        """
+        Store a value. If `generation` is given and the cache was cleared since
+        it was read, the value may be stale and is dropped.
+        """
+        if generation is not None and generation != self.generation:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        self._stored_at[key] = time.monotonic()
+        while len(self._entries) > self.maxsize:
+            evicted, _ = self._entries.popitem(last=False)
+            del self._stored_at[evicted]
+
+    async def get_or_load(self, key, loader):
+        """Return the cached value for key, calling `await loader()` on a miss"""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        generation = self.generation
+        value = await loader()
+        self.set(key, value, generation)
+        return value
+
+    def discard(self, key):
+        """Drop one entry in this worker"""
+        self._entries.pop(key, None)
+        self._stored_at.pop(key, None)
+        # Loads already in flight may have read the old value
+        self.generation += 1
+
+    def clear(self):
+        """Drop every entry in this worker"""
+        self._entries.clear()
+        self._stored_at.clear()
+        self.generation += 1
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "generation": self.generation}
+
+def get_cache(namespace: str) -> SharedCache:
+    """Look up a registered cache by namespace"""
+    return _caches[namespace]
+
+def cache_stats() -> dict:
+    """Hit/miss counters for every cache in this worker"""
+    return {namespace: cache.stats() for namespace, cache in _caches.items()}
+
+register_metrics("caches", cache_stats)
+
+async def _bump_versions(db, names: list):
+    await db.executemany(
+        """INSERT INTO cache_versions (namespace, version, seq)
+           VALUES (?, 1, (SELECT COALESCE(MAX(seq), 0) + 1 FROM cache_versions))
+           ON CONFLICT(namespace) DO UPDATE SET version = version + 1, seq = excluded.seq""",
+        [(name,) for name in names]
+    )
+    await db.commit()
+
+async def invalidate(db, *namespaces: str):
+    """
+    Invalidate namespaces in every worker. Call after the data change has been
+    committed so other workers can't reload the old rows.
+    """
+    await _bump_versions(db, namespaces)
+    for namespace in namespaces:
+        if namespace in _caches:
+            _caches[namespace].clear()
+
+async def invalidate_keys(db, namespace: str, *keys):
+    """Invalidate single entries of a namespace in every worker, leaving the rest cached"""
+    await _bump_versions(db, [f"{namespace}{KEY_SEPARATOR}{key}" for key in keys])
+    if namespace in _caches:
+        for key in keys:
+            _caches[namespace].discard(key)
+
+async def _sync_versions(db, initial: bool = False):
+    """Drop local entries whose shared version moved since we last looked"""
+    global _last_seq
+    cursor = await db.execute(
+        "SELECT namespace, seq FROM cache_versions WHERE seq > ? ORDER BY seq", (_last_seq,))
+    for name, seq in await cursor.fetchall():
+        _last_seq = seq
+        if initial:
+            continue
+        namespace, separator, key = name.partition(KEY_SEPARATOR)
+        cache = _caches.get(namespace)
+        if cache is None:
+            continue
+        if separator:
+            cache.discard(cache.key_type(key))
+        else:
+            cache.clear()
+
+async def watch_invalidations(interval: float = CACHE_SYNC_INTERVAL):
+    """
+    Background task keeping this worker's caches coherent with the others.
+
+    `PRAGMA data_version` only changes when another connection commits, so the
+    version table is read only after some worker has written something.
+    """
+    db = await connect()
+    try:
+        await _sync_versions(db, initial=True)
+        cursor = await db.execute("PRAGMA data_version")
+        last_seen = (await cursor.fetchone())[0]
+        while True:
+            await asyncio.sleep(interval)
+            cursor = await db.execute("PRAGMA data_version")
+            data_version = (await cursor.fetchone())[0]
+            if data_version != last_seen:
+                last_seen = data_version
+                await _sync_versions(db)
+    finally:
+        await db.close()
@@ -4,125 +4,378 @@ from datetime import datetime
 
 DATABASE_URL = os.getenv("DATABASE_URL", "chess_service.db").replace("sqlite+aiosqlite:///./", "")
 
-async def get_db():
-    """Get database connection"""
+# How long a connection waits on another process's lock before giving up
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+
+async def configure_connection(db):
+    """Apply per-connection settings needed when several workers share the file"""
+    await db.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    await db.execute("PRAGMA synchronous = NORMAL")
+
+async def connect():
+    """Open a configured connection to the application database"""
     db = await aiosqlite.connect(DATABASE_URL)
     db.row_factory = aiosqlite.Row
+    await configure_connection(db)
+    return db
+
+async def get_db():
+    """Get database connection"""
+    db = await connect()
     try:
         yield db
     finally:
         await db.close()
 
-async def init_db():
-    """Initialize database with tables"""
-    db = await aiosqlite.connect(DATABASE_URL)
-    
+# Bump SCHEMA_VERSION whenever the schema changes and add the new statements to
+# MIGRATIONS under that version. init_db compares it with PRAGMA user_version so
+# an up-to-date database skips DDL entirely on startup.
+SCHEMA_VERSION = 11
+
+SCHEMA = [
     # Users table
-    await db.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            hashed_password TEXT NOT NULL,
-            is_admin BOOLEAN DEFAULT 0,
-            rating INTEGER DEFAULT 1200,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        hashed_password TEXT NOT NULL,
+        is_admin BOOLEAN DEFAULT 0,
+        rating INTEGER DEFAULT 1200,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+
     # Categories table
-    await db.execute("""
-        CREATE TABLE IF NOT EXISTS categories (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
+    """
+    CREATE TABLE IF NOT EXISTS categories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        description TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+
     # Courses table
-    await db.execute("""
-        CREATE TABLE IF NOT EXISTS courses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            price REAL DEFAULT 0.0,
-            category_id INTEGER,
-            difficulty TEXT DEFAULT 'beginner',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (category_id) REFERENCES categories(id)
-        )
-    """)
-    
+    """
+    CREATE TABLE IF NOT EXISTS courses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        description TEXT,
+        price REAL DEFAULT 0.0,
+        category_id INTEGER,
+        difficulty TEXT DEFAULT 'beginner',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (category_id) REFERENCES categories(id)
+    )
+    """,
+
     # Puzzles table
-    await db.execute("""
-        CREATE TABLE IF NOT EXISTS puzzles (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            fen TEXT NOT NULL,
-            solution TEXT NOT NULL,
-            difficulty TEXT DEFAULT 'easy',
-            category_id INTEGER,
-            rating INTEGER DEFAULT 1200,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (category_id) REFERENCES categories(id)
-        )
-    """)
-    
+    """
+    CREATE TABLE IF NOT EXISTS puzzles (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        fen TEXT NOT NULL,
+        solution TEXT NOT NULL,
+        difficulty TEXT DEFAULT 'easy',
+        category_id INTEGER,
+        rating INTEGER DEFAULT 1200,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (category_id) REFERENCES categories(id)
+    )
+    """,
+
     # Games table (for tracking user plays)
-    await db.execute("""
-        CREATE TABLE IF NOT EXISTS games (
+    """
+    CREATE TABLE IF NOT EXISTS games (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        game_type TEXT NOT NULL,
+        result TEXT,
+        moves TEXT,
+        duration INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+    """,
+
+    # Puzzle attempts table
+    """
+    CREATE TABLE IF NOT EXISTS puzzle_attempts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        puzzle_id INTEGER NOT NULL,
+        success BOOLEAN,
+        time_taken INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id),
+        FOREIGN KEY (puzzle_id) REFERENCES puzzles(id)
+    )
+    """,
+
+    # Purchases table
+    """
+    CREATE TABLE IF NOT EXISTS purchases (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        course_id INTEGER NOT NULL,
+        amount REAL NOT NULL,
+        purchased_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id),
+        FOREIGN KEY (course_id) REFERENCES courses(id)
+    )
+    """,
+
+    # User ratings history
+    """
+    CREATE TABLE IF NOT EXISTS rating_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        rating INTEGER NOT NULL,
+        change INTEGER DEFAULT 0,
+        reason TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+    """,
+]
+
+# Statements applied on top of SCHEMA, keyed by the schema version introducing them
+MIGRATIONS = {
+    # Per-namespace counters used to invalidate in-process caches across workers
+    2: [
+        """
+        CREATE TABLE IF NOT EXISTS cache_versions (
+            namespace TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+    ],
+    # One purchase per user and course; drop earlier duplicates before enforcing it
+    3: [
+        """
+        DELETE FROM purchases
+        WHERE id NOT IN (SELECT MIN(id) FROM purchases GROUP BY user_id, course_id)
+        """,
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_purchases_user_course
+        ON purchases (user_id, course_id)
+        """,
+    ],
+    # Background job scheduler state, run history and the tables its jobs maintain
+    4: [
+        """
+        CREATE TABLE IF NOT EXISTS job_schedule (
+            name TEXT PRIMARY KEY,
+            next_run_at REAL NOT NULL,
+            lease_owner TEXT,
+            lease_expires_at REAL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS job_runs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            game_type TEXT NOT NULL,
+            name TEXT NOT NULL,
+            trigger TEXT NOT NULL,
+            owner TEXT,
+            status TEXT NOT NULL,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP,
+            duration_ms INTEGER,
             result TEXT,
-            moves TEXT,
-            duration INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id)
+            error TEXT
         )
-    """)
-    
-    # Puzzle attempts table
-    await db.execute("""
-        CREATE TABLE IF NOT EXISTS puzzle_attempts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_job_runs_name ON job_runs (name, id)",
+        """
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            day TEXT PRIMARY KEY,
+            new_users INTEGER NOT NULL DEFAULT 0,
+            games INTEGER NOT NULL DEFAULT 0,
+            puzzle_attempts INTEGER NOT NULL DEFAULT 0,
+            puzzles_solved INTEGER NOT NULL DEFAULT 0,
+            purchases INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS leaderboard_snapshots (
+            snapshot_date TEXT NOT NULL,
+            rank INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            rating INTEGER NOT NULL,
+            PRIMARY KEY (snapshot_date, rank)
+        )
+        """,
+        # Range scans for the daily rollup and rating_history pruning
+        "CREATE INDEX IF NOT EXISTS idx_users_created_at ON users (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_games_created_at ON games (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_puzzle_attempts_created_at ON puzzle_attempts (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_purchases_purchased_at ON purchases (purchased_at)",
+        "CREATE INDEX IF NOT EXISTS idx_rating_history_created_at ON rating_history (created_at)",
+    ],
+    # Puzzle calibration from attempt statistics. prior_rating keeps the rating an
+    # admin entered, which the calibration shrinks toward; the triggers track admin
+    # edits and leave the calibration's own rating updates (which set calibrated_at) alone.
+    5: [
+        "ALTER TABLE puzzles ADD COLUMN prior_rating INTEGER",
+        "ALTER TABLE puzzles ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE puzzles ADD COLUMN solve_rate REAL",
+        "ALTER TABLE puzzles ADD COLUMN time_p50 INTEGER",
+        "ALTER TABLE puzzles ADD COLUMN time_p90 INTEGER",
+        "ALTER TABLE puzzles ADD COLUMN calibrated_at TIMESTAMP",
+        "UPDATE puzzles SET prior_rating = rating",
+        "ALTER TABLE puzzle_attempts ADD COLUMN user_rating INTEGER",
+        """
+        CREATE TRIGGER IF NOT EXISTS puzzles_prior_rating_insert
+        AFTER INSERT ON puzzles WHEN NEW.prior_rating IS NULL
+        BEGIN
+            UPDATE puzzles SET prior_rating = NEW.rating WHERE id = NEW.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS puzzles_prior_rating_update
+        AFTER UPDATE OF rating ON puzzles
+        WHEN NEW.rating IS NOT OLD.rating AND NEW.calibrated_at IS OLD.calibrated_at
+        BEGIN
+            UPDATE puzzles SET prior_rating = NEW.rating WHERE id = NEW.id;
+        END
+        """,
+    ],
+    # Spaced-repetition cards for failed puzzles, read by (user_id, due_at)
+    6: [
+        """
+        CREATE TABLE IF NOT EXISTS review_queue (
             user_id INTEGER NOT NULL,
             puzzle_id INTEGER NOT NULL,
-            success BOOLEAN,
-            time_taken INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            repetitions INTEGER NOT NULL DEFAULT 0,
+            interval_days REAL NOT NULL DEFAULT 0,
+            ease REAL NOT NULL DEFAULT 2.5,
+            lapses INTEGER NOT NULL DEFAULT 0,
+            due_at TIMESTAMP NOT NULL,
+            last_reviewed_at TIMESTAMP,
+            PRIMARY KEY (user_id, puzzle_id),
             FOREIGN KEY (user_id) REFERENCES users(id),
             FOREIGN KEY (puzzle_id) REFERENCES puzzles(id)
         )
-    """)
-    
-    # Purchases table
-    await db.execute("""
-        CREATE TABLE IF NOT EXISTS purchases (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_review_queue_due ON review_queue (user_id, due_at)",
+    ],
+    # Rating change per user and day/week/month window for the windowed leaderboards.
+    # Finished windows move to the archive table; recent history seeds the current ones.
+    7: [
+        """
+        CREATE TABLE IF NOT EXISTS rating_deltas (
+            period TEXT NOT NULL,
+            bucket TEXT NOT NULL,
             user_id INTEGER NOT NULL,
-            course_id INTEGER NOT NULL,
-            amount REAL NOT NULL,
-            purchased_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id),
-            FOREIGN KEY (course_id) REFERENCES courses(id)
+            delta INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, bucket, user_id)
         )
-    """)
-    
-    # User ratings history
-    await db.execute("""
-        CREATE TABLE IF NOT EXISTS rating_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_rating_deltas_rank ON rating_deltas (period, bucket, delta)",
+        """
+        CREATE TABLE IF NOT EXISTS rating_deltas_archive (
+            period TEXT NOT NULL,
+            bucket TEXT NOT NULL,
             user_id INTEGER NOT NULL,
-            rating INTEGER NOT NULL,
-            change INTEGER DEFAULT 0,
-            reason TEXT,
+            delta INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, bucket, user_id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_rating_deltas_archive_rank ON rating_deltas_archive (period, bucket, delta)",
+        """
+        INSERT INTO rating_deltas (period, bucket, user_id, delta)
+        SELECT 'day', date(created_at), user_id, SUM(change) FROM rating_history
+        WHERE created_at >= date('now', '-40 days') GROUP BY 2, 3
+        UNION ALL
+        SELECT 'week', date(created_at, 'weekday 0', '-6 days'), user_id, SUM(change) FROM rating_history
+        WHERE created_at >= date('now', '-40 days') GROUP BY 2, 3
+        UNION ALL
+        SELECT 'month', date(created_at, 'start of month'), user_id, SUM(change) FROM rating_history
+        WHERE created_at >= date('now', '-40 days') GROUP BY 2, 3
+        """,
+    ],
+    # Per-user history lookups used by the dashboard
+    8: [
+        "CREATE INDEX IF NOT EXISTS idx_games_user ON games (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_puzzle_attempts_user ON puzzle_attempts (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_rating_history_user ON rating_history (user_id, created_at)",
+    ],
+    # Idempotency keys of items applied through POST /sync, with the result returned for them
+    9: [
+        """
+        CREATE TABLE IF NOT EXISTS sync_receipts (
+            user_id INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            result TEXT NOT NULL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id)
+            PRIMARY KEY (user_id, key)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_sync_receipts_created_at ON sync_receipts (created_at)",
+    ],
+    # Change sequence on cache versions, so workers only read the rows bumped since
+    # their last look now that single keys (one user's entitlements) get their own row
+    10: [
+        "ALTER TABLE cache_versions ADD COLUMN seq INTEGER NOT NULL DEFAULT 0",
+        "CREATE INDEX IF NOT EXISTS idx_cache_versions_seq ON cache_versions (seq)",
+    ],
+    # Unfinished blind-play games, so a reconnect can resume them on any worker.
+    # `moves` holds the moves as 2-byte ints and `ply` guards against concurrent saves.
+    11: [
+        """
+        CREATE TABLE IF NOT EXISTS blind_play_sessions (
+            game_id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            level INTEGER NOT NULL,
+            moves BLOB NOT NULL,
+            ply INTEGER NOT NULL DEFAULT 0,
+            started_at REAL NOT NULL,
+            updated_at REAL NOT NULL
         )
-    """)
-    
-    await db.commit()
-    await db.close()
-    print("Database initialized successfully")
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_blind_play_sessions_user ON blind_play_sessions (user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_blind_play_sessions_updated_at ON blind_play_sessions (updated_at)",
+    ],
+}
+
+def _schema_statements(current_version: int) -> list:
+    """DDL statements needed to upgrade the schema from current_version"""
+    statements = list(SCHEMA)
+    for version in sorted(MIGRATIONS):
+        if version > current_version:
+            statements.extend(MIGRATIONS[version])
+    return statements
+
+async def _schema_version(db) -> int:
+    cursor = await db.execute("PRAGMA user_version")
+    return (await cursor.fetchone())[0]
+
+async def init_db():
+    """Initialize database with tables, skipping DDL when the schema is current"""
+    db = await aiosqlite.connect(DATABASE_URL)
+    try:
+        # WAL lets readers in other worker processes proceed while one writes.
+        # The journal mode is persistent, so this is a no-op after the first run.
+        await db.execute("PRAGMA journal_mode = WAL")
+        await configure_connection(db)
+        current_version = await _schema_version(db)
+        if current_version >= SCHEMA_VERSION:
+            print(f"Database schema is up to date (version {current_version})")
+            return False
+        
+        # Take the write lock before re-reading the version so that workers
+        # booting at the same time apply each migration exactly once
+        await db.execute("BEGIN IMMEDIATE")
+        current_version = await _schema_version(db)
+        if current_version < SCHEMA_VERSION:
+            for statement in _schema_statements(current_version):
+                await db.execute(statement)
+            await db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        await db.commit()
+    finally:
+        await db.close()
+    print(f"Database initialized successfully (schema version {SCHEMA_VERSION})")
+    return True
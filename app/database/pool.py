@@ -0,0 +1,162 @@
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+import aiosqlite
+from fastapi import HTTPException
+from app.database.database import DATABASE_URL, configure_connection
+from app.metrics import register_metrics
+
+READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "4"))
+# Seconds a caller waits for a free connection before the request fails with 503
+POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT", "10"))
+# Weight of each acquisition in the recent wait average, and how fast it fades when idle
+RECENT_WAIT_WEIGHT = 0.2
+RECENT_WAIT_DECAY_SECONDS = 1.0
+
+class ConnectionPool:
+    """
+    Fixed-size pool of long-lived connections of one class (read or write).
+
+    Tracks how many callers are queued for a connection and how long they wait,
+    so contention between readers and the writer shows up in /admin/metrics.
+    Hold at most one pooled connection at a time: a caller that keeps one while
+    waiting for another can deadlock against callers doing the same.
+    """
+
+    def __init__(self, name: str, size: int, read_only: bool = False,
+                 acquire_timeout: float = POOL_ACQUIRE_TIMEOUT):
+        self.name = name
+        self.size = size
+        self.read_only = read_only
+        self.acquire_timeout = acquire_timeout
+        self._idle = None
+        self._connections = []
+        self._opened = 0
+        self.waiting = 0
+        self.in_use = 0
+        self.max_waiting = 0
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+        self._recent_wait = 0.0
+        self._recent_wait_at = time.monotonic()
+
+    async def _open(self):
+        if self.read_only:
+            # Read-only connections can never take the write lock, and with WAL
+            # they read from a snapshot instead of blocking the writer
+            db = await aiosqlite.connect(f"file:{DATABASE_URL}?mode=ro", uri=True)
+        else:
+            db = await aiosqlite.connect(DATABASE_URL)
+        db.row_factory = aiosqlite.Row
+        await configure_connection(db)
+        self._connections.append(db)
+        return db
+
+    async def acquire(self):
+        """Take a connection, opening one lazily while the pool is below its size"""
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+        waited = 0.0
+        if not self._idle.empty():
+            db = self._idle.get_nowait()
+        elif self._opened < self.size:
+            self._opened += 1
+            try:
+                db = await self._open()
+            except BaseException:
+                # Also on cancellation (e.g. a timed-out dashboard section), or the slot leaks
+                self._opened -= 1
+                raise
+        else:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            started = time.perf_counter()
+            try:
+                db = await asyncio.wait_for(self._idle.get(), self.acquire_timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                print(f"Timed out waiting for a {self.name} connection")
+                raise HTTPException(status_code=503, detail="Database is busy, try again shortly",
+                                    headers={"Retry-After": "1"})
+            finally:
+                self.waiting -= 1
+            waited = time.perf_counter() - started
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        self._recent_wait = (self.recent_wait() * (1 - RECENT_WAIT_WEIGHT)
+                             + waited * RECENT_WAIT_WEIGHT)
+        self._recent_wait_at = time.monotonic()
+        self.in_use += 1
+        self.acquired += 1
+        return db
+
+    def recent_wait(self) -> float:
+        """
+        Moving average of recent acquisition waits in seconds. It fades while
+        no connections are taken, so a burst doesn't count against idle time.
+        """
+        idle = time.monotonic() - self._recent_wait_at
+        return self._recent_wait * math.exp(-idle / RECENT_WAIT_DECAY_SECONDS)
+
+    async def release(self, db):
+        """Return a connection, discarding any transaction left open by the caller"""
+        try:
+            if db.in_transaction:
+                await db.rollback()
+        finally:
+            self.in_use -= 1
+            self._idle.put_nowait(db)
+
+    @asynccontextmanager
+    async def connection(self):
+        db = await self.acquire()
+        try:
+            yield db
+        finally:
+            await self.release(db)
+
+    async def close(self):
+        for db in self._connections:
+            await db.close()
+        self._connections = []
+        self._opened = 0
+        self._idle = None
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "open": self._opened,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "acquired": self.acquired,
+            "avg_wait_ms": round(self.total_wait / self.acquired * 1000, 3) if self.acquired else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "recent_wait_ms": round(self.recent_wait() * 1000, 3),
+            "timeouts": self.timeouts,
+        }
+
+read_pool = ConnectionPool("read", READ_POOL_SIZE, read_only=True)
+# A single writer per worker: mutations queue here instead of fighting over the file lock
+write_pool = ConnectionPool("write", 1)
+
+register_metrics("db_pools", lambda: {pool.name: pool.stats() for pool in (read_pool, write_pool)})
+
+async def get_read_db():
+    """Get a pooled read-only connection for query-only routes"""
+    async with read_pool.connection() as db:
+        yield db
+
+async def get_write_db():
+    """Get the serialized writer connection for routes that mutate data"""
+    async with write_pool.connection() as db:
+        yield db
+
+async def close_pools():
+    """Close pooled connections on shutdown"""
+    await read_pool.close()
+    await write_pool.close()
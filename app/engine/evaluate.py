@@ -0,0 +1,92 @@
+from app.chess.board import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, BLACK_FLAG, WHITE
+
+PIECE_VALUES = [0, 100, 320, 330, 500, 900, 0]
+
+# Piece-square tables from White's point of view, printed with rank 8 first
+_PST_ROWS = {
+    PAWN: (
+        0, 0, 0, 0, 0, 0, 0, 0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ),
+    KNIGHT: (
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ),
+    BISHOP: (
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ),
+    ROOK: (
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0,
+    ),
+    QUEEN: (
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20,
+    ),
+    KING: (
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        20, 30, 10, 0, 0, 10, 30, 20,
+    ),
+}
+
+def _square_scores(piece_type: int, black: bool) -> tuple:
+    """Material plus placement bonus for a piece on each square, indexed a1..h8"""
+    rows = _PST_ROWS[piece_type]
+    scores = []
+    for sq in range(64):
+        file, rank = sq & 7, sq >> 3
+        # White reads the printed table upside down; Black reads it as printed
+        index = rank * 8 + file if black else (7 - rank) * 8 + file
+        scores.append(PIECE_VALUES[piece_type] + rows[index])
+    return tuple(scores)
+
+# PIECE_SQUARE[piece][sq] is the signed score from White's side
+PIECE_SQUARE = [(0,) * 64 for _ in range(16)]
+for _piece_type in _PST_ROWS:
+    PIECE_SQUARE[_piece_type] = _square_scores(_piece_type, False)
+    PIECE_SQUARE[_piece_type | BLACK_FLAG] = tuple(-score for score in _square_scores(_piece_type, True))
+
+def evaluate(board) -> int:
+    """Static score in centipawns from the side to move's point of view"""
+    score = 0
+    for sq, piece in enumerate(board.squares):
+        if piece:
+            score += PIECE_SQUARE[piece][sq]
+    return score if board.turn == WHITE else -score
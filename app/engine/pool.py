@@ -0,0 +1,92 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from app.chess.board import Board
+from app.engine.search import Searcher, SearchResult, MAX_PLY
+from app.metrics import register_metrics
+
+ENGINE_WORKERS = int(os.getenv("ENGINE_WORKERS", "2"))
+ENGINE_MOVE_TIME_MS = int(os.getenv("ENGINE_MOVE_TIME_MS", "300"))
+# 0 means searches are limited by time only
+ENGINE_MAX_NODES = int(os.getenv("ENGINE_MAX_NODES", "0"))
+
+# Engine strength levels: (time budget in ms, maximum depth)
+ENGINE_LEVELS = {
+    1: (50, 1),
+    2: (100, 2),
+    3: (ENGINE_MOVE_TIME_MS, 4),
+    4: (ENGINE_MOVE_TIME_MS * 2, 6),
+    5: (ENGINE_MOVE_TIME_MS * 4, MAX_PLY),
+}
+DEFAULT_ENGINE_LEVEL = 3
+
+# Search processes start from a clean interpreter: forking the server would copy
+# the locks held by its event loop and database threads into the children
+ENGINE_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# One searcher per worker process, so its transposition table survives between requests
+_searcher = None
+
+def search_position(fen: str, time_ms: int, node_limit: int = None, max_depth: int = MAX_PLY,
+                    history=()) -> SearchResult:
+    """Run a search in the current process (the entry point for pool workers)"""
+    global _searcher
+    if _searcher is None:
+        _searcher = Searcher()
+    return _searcher.search(Board(fen), time_limit=time_ms / 1000 if time_ms else None,
+                            node_limit=node_limit or None, max_depth=max_depth, history=history)
+
+class EnginePool:
+    """
+    Runs engine searches in worker processes so search CPU never blocks the
+    event loop. The pool is started on first use.
+    """
+
+    def __init__(self, workers: int = ENGINE_WORKERS):
+        self.workers = max(1, workers)
+        self._executor = None
+        self.pending = 0
+        self.searches = 0
+        self.nodes = 0
+        self.search_time = 0.0
+
+    async def search(self, fen: str, time_ms: int = ENGINE_MOVE_TIME_MS,
+                     node_limit: int = ENGINE_MAX_NODES, max_depth: int = MAX_PLY,
+                     history=()) -> SearchResult:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context(ENGINE_START_METHOD))
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            result = await loop.run_in_executor(
+                self._executor, search_position, fen, time_ms, node_limit, max_depth, tuple(history))
+        finally:
+            self.pending -= 1
+        self.searches += 1
+        self.nodes += result.nodes
+        self.search_time += result.elapsed
+        return result
+
+    async def search_level(self, fen: str, level: int = DEFAULT_ENGINE_LEVEL, history=()) -> SearchResult:
+        """Search with the budget of a strength level from ENGINE_LEVELS"""
+        time_ms, max_depth = ENGINE_LEVELS.get(level, ENGINE_LEVELS[DEFAULT_ENGINE_LEVEL])
+        return await self.search(fen, time_ms=time_ms, max_depth=max_depth, history=history)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "searches": self.searches,
+            "nodes": self.nodes,
+            "nodes_per_second": round(self.nodes / self.search_time) if self.search_time else 0,
+        }
+
+engine_pool = EnginePool()
+register_metrics("engine", engine_pool.stats)
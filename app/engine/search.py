@@ -0,0 +1,239 @@
+import time
+from typing import NamedTuple, Optional
+from app.chess.board import Board, move_to_uci
+from app.engine.evaluate import PIECE_VALUES, evaluate
+
+MATE_SCORE = 100000
+MAX_PLY = 64
+INFINITY = 10 ** 9
+
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+# Transposition table entries kept per process before it is cleared
+MAX_TABLE_ENTRIES = 500000
+
+class SearchResult(NamedTuple):
+    move: Optional[int]
+    uci: Optional[str]
+    score: int
+    depth: int
+    nodes: int
+    elapsed: float
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time or node budget runs out"""
+
+class Searcher:
+    """
+    Iterative-deepening alpha-beta search with a transposition table,
+    quiescence search and TT-move / MVV-LVA / killer / history move ordering.
+    The table is kept between searches so consecutive moves of a game reuse it.
+    """
+
+    def __init__(self, max_table_entries: int = MAX_TABLE_ENTRIES):
+        self.table = {}
+        self.max_table_entries = max_table_entries
+        self.nodes = 0
+        self.deadline = None
+        self.node_limit = None
+        self.killers = []
+        self.history = {}
+        self.path = []
+
+    def search(self, board: Board, time_limit: float = None, node_limit: int = None,
+               max_depth: int = MAX_PLY, history=()) -> SearchResult:
+        """
+        Find the best move within the budget. `time_limit` is in seconds;
+        `history` holds Zobrist keys of earlier positions for repetition checks.
+        """
+        started = time.perf_counter()
+        board = board.copy()
+        self.nodes = 0
+        self.deadline = started + time_limit if time_limit else None
+        self.node_limit = node_limit
+        self.killers = [[0, 0] for _ in range(MAX_PLY + 1)]
+        self.history = {}
+        self.path = list(history)
+        if len(self.table) > self.max_table_entries:
+            self.table.clear()
+
+        moves = board.legal_moves()
+        if not moves:
+            return SearchResult(None, None, 0, 0, 0, time.perf_counter() - started)
+
+        best_move, best_score, completed_depth = moves[0], 0, 0
+        for depth in range(1, max(1, max_depth) + 1):
+            try:
+                score, move = self._root(board, depth, moves)
+            except SearchTimeout:
+                break
+            best_move, best_score, completed_depth = move, score, depth
+            # Search the best move first on the next iteration
+            moves.remove(move)
+            moves.insert(0, move)
+            if abs(score) >= MATE_SCORE - MAX_PLY:
+                break
+
+        return SearchResult(best_move, move_to_uci(best_move), best_score, completed_depth,
+                            self.nodes, time.perf_counter() - started)
+
+    def _check_limits(self):
+        if self.node_limit and self.nodes >= self.node_limit:
+            raise SearchTimeout()
+        if self.deadline and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+    def _root(self, board: Board, depth: int, moves: list):
+        alpha, beta = -INFINITY, INFINITY
+        best_move = moves[0]
+        self.path.append(board.key)
+        try:
+            for move in moves:
+                board.push(move)
+                score = -self._negamax(board, depth - 1, -beta, -alpha, 1)
+                board.pop()
+                if score > alpha:
+                    alpha, best_move = score, move
+        finally:
+            self.path.pop()
+        return alpha, best_move
+
+    def _negamax(self, board: Board, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self._check_limits()
+
+        if board.halfmove_clock >= 100 or board.key in self.path:
+            return 0
+        if ply >= MAX_PLY:
+            return evaluate(board)
+
+        in_check = board.is_check()
+        if in_check:
+            depth += 1
+        if depth <= 0:
+            return self._quiesce(board, alpha, beta, ply)
+
+        tt_move = 0
+        entry = self.table.get(board.key)
+        if entry is not None:
+            entry_depth, entry_score, entry_flag, tt_move = entry
+            if entry_depth >= depth:
+                entry_score = _score_from_table(entry_score, ply)
+                if entry_flag == EXACT:
+                    return entry_score
+                if entry_flag == LOWER_BOUND and entry_score >= beta:
+                    return entry_score
+                if entry_flag == UPPER_BOUND and entry_score <= alpha:
+                    return entry_score
+
+        original_alpha = alpha
+        best_score, best_move = -INFINITY, 0
+        legal_count = 0
+        us = board.turn
+        self.path.append(board.key)
+        try:
+            for move in self._ordered(board, board.pseudo_legal_moves(), tt_move, ply):
+                capture = board.is_capture(move)
+                board.push(move)
+                if board.is_attacked(board.kings[us], us ^ 1):
+                    board.pop()
+                    continue
+                legal_count += 1
+                score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1)
+                board.pop()
+
+                if score > best_score:
+                    best_score, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                if alpha >= beta:
+                    if not capture:
+                        killers = self.killers[ply]
+                        if killers[0] != move:
+                            killers[1], killers[0] = killers[0], move
+                        self.history[move] = self.history.get(move, 0) + depth * depth
+                    break
+        finally:
+            self.path.pop()
+
+        if legal_count == 0:
+            return -MATE_SCORE + ply if in_check else 0
+
+        if best_score <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.table[board.key] = (depth, _score_to_table(best_score, ply), flag, best_move)
+        return best_score
+
+    def _quiesce(self, board: Board, alpha: int, beta: int, ply: int) -> int:
+        """Search captures only, so the static evaluation isn't taken mid-exchange"""
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self._check_limits()
+
+        stand_pat = evaluate(board)
+        if stand_pat >= beta or ply >= MAX_PLY:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        us = board.turn
+        squares = board.squares
+        captures = [move for move in board.pseudo_legal_moves()
+                    if squares[(move >> 6) & 63] or move >> 12]
+        captures.sort(key=lambda move: PIECE_VALUES[squares[(move >> 6) & 63] & 7] * 10
+                      - PIECE_VALUES[squares[move & 63] & 7], reverse=True)
+        for move in captures:
+            board.push(move)
+            if board.is_attacked(board.kings[us], us ^ 1):
+                board.pop()
+                continue
+            score = -self._quiesce(board, -beta, -alpha, ply + 1)
+            board.pop()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def _ordered(self, board: Board, moves: list, tt_move: int, ply: int) -> list:
+        squares = board.squares
+        killers = self.killers[ply] if ply <= MAX_PLY else (0, 0)
+        history = self.history
+
+        def priority(move):
+            if move == tt_move:
+                return 1 << 30
+            victim = squares[(move >> 6) & 63]
+            if victim:
+                # Most valuable victim, least valuable attacker
+                return (1 << 20) + PIECE_VALUES[victim & 7] * 10 - PIECE_VALUES[squares[move & 63] & 7]
+            if move >> 12:
+                return (1 << 20) + PIECE_VALUES[move >> 12]
+            if move == killers[0]:
+                return 1 << 19
+            if move == killers[1]:
+                return (1 << 19) - 1
+            return history.get(move, 0)
+
+        moves.sort(key=priority, reverse=True)
+        return moves
+
+def _score_to_table(score: int, ply: int) -> int:
+    # Mate scores are stored relative to the node so they stay valid at other plies
+    if score >= MATE_SCORE - MAX_PLY:
+        return score + ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score - ply
+    return score
+
+def _score_from_table(score: int, ply: int) -> int:
+    if score >= MATE_SCORE - MAX_PLY:
+        return score - ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score + ply
+    return score
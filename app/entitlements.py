@@ -0,0 +1,35 @@
+import os
+from array import array
+from bisect import bisect_left, insort
+from app.database.cache import SharedCache, invalidate_keys
+
+# Users whose owned-course sets are kept in memory per worker
+ENTITLEMENT_CACHE_USERS = int(os.getenv("ENTITLEMENT_CACHE_USERS", "10000"))
+
+# user id -> sorted array('I') of owned course ids (4 bytes per course)
+entitlements_cache = SharedCache("entitlements", maxsize=ENTITLEMENT_CACHE_USERS, key_type=int)
+
+async def owned_course_ids(db, user_id: int) -> array:
+    """Sorted ids of the courses a user owns, loaded on first use"""
+    async def load():
+        cursor = await db.execute(
+            "SELECT course_id FROM purchases WHERE user_id = ? ORDER BY course_id", (user_id,))
+        return array("I", [row[0] for row in await cursor.fetchall()])
+    return await entitlements_cache.get_or_load(user_id, load)
+
+def owns(owned: array, course_id: int) -> bool:
+    """Whether a course id is in a set returned by owned_course_ids"""
+    index = bisect_left(owned, course_id)
+    return index < len(owned) and owned[index] == course_id
+
+async def grant_course(db, user_id: int, course_id: int):
+    """
+    Record a committed purchase. Other workers drop the buyer's cached set and
+    reload it lazily; this worker updates it in place. Other users' sets stay cached.
+    """
+    owned = entitlements_cache.get(user_id)
+    await invalidate_keys(db, "entitlements", user_id)
+    if owned is not None and not owns(owned, course_id):
+        owned = array("I", owned)
+        insort(owned, course_id)
+        entitlements_cache.set(user_id, owned)
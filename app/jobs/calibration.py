@@ -0,0 +1,153 @@
+import asyncio
+import os
+from datetime import datetime, timezone
+import numpy as np
+from app.database.pool import read_pool, write_pool
+from app.database.cache import invalidate
+
+# Attempts fetched from SQLite (and puzzle rows written back) per round trip
+CALIBRATION_CHUNK_SIZE = int(os.getenv("CALIBRATION_CHUNK_SIZE", "50000"))
+# Standard deviation of the prior around the admin-entered rating; smaller trusts it more
+CALIBRATION_PRIOR_SD = float(os.getenv("CALIBRATION_PRIOR_SD", "300"))
+
+DEFAULT_RATING = 1200
+MIN_RATING, MAX_RATING = 400, 3000
+# Elo scale: a 400 point gap means 10:1 odds
+ELO_SCALE = np.log(10) / 400
+MAX_ITERATIONS = 50
+# Upper rating bound of each difficulty label; anything above is "hard"
+DIFFICULTY_BANDS = ((1300, "easy"), (1700, "medium"))
+
+async def load_attempts(db, chunk_size: int = CALIBRATION_CHUNK_SIZE):
+    """
+    Load every attempt on an existing puzzle as (puzzle_id, solver_rating,
+    success, time_taken) columns, or None if there are none. The fit needs all
+    attempts at once, so they are held in memory; rows are fetched in chunks
+    and packed into arrays as they arrive, never all kept as Python tuples.
+    Attempts recorded before solver ratings were stored fall back to the
+    solver's current rating; a missing time_taken becomes -1.
+    """
+    cursor = await db.execute(f"""
+        SELECT pa.puzzle_id, COALESCE(pa.user_rating, u.rating, {DEFAULT_RATING}),
+               COALESCE(pa.success, 0), COALESCE(pa.time_taken, -1)
+        FROM puzzle_attempts pa
+        JOIN puzzles p ON p.id = pa.puzzle_id
+        LEFT JOIN users u ON u.id = pa.user_id
+    """)
+    chunks = []
+    while True:
+        rows = await cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        chunks.append(np.array([tuple(row) for row in rows], dtype=np.float64))
+    await cursor.close()
+    if not chunks:
+        return None
+    data = np.concatenate(chunks)
+    return data[:, 0].astype(np.int64), data[:, 1], data[:, 2] > 0, data[:, 3]
+
+def fit_ratings(index, count: int, solver_ratings, success, prior, prior_sd: float = CALIBRATION_PRIOR_SD):
+    """
+    Maximum a posteriori puzzle ratings under an Elo logistic model, where a
+    solver rated u solves a puzzle rated r with probability 1 / (1 + 10^((r - u) / 400)),
+    with a normal prior around `prior`. Newton steps update every puzzle at
+    once; per-puzzle sums are taken with bincount.
+    """
+    outcomes = success.astype(np.float64)
+    prior_precision = 1.0 / prior_sd ** 2
+    ratings = prior.astype(np.float64).copy()
+    for _ in range(MAX_ITERATIONS):
+        p = 1.0 / (1.0 + np.exp(-ELO_SCALE * (solver_ratings - ratings[index])))
+        gradient = (-ELO_SCALE * np.bincount(index, weights=outcomes - p, minlength=count)
+                    - (ratings - prior) * prior_precision)
+        hessian = (-ELO_SCALE ** 2 * np.bincount(index, weights=p * (1 - p), minlength=count)
+                   - prior_precision)
+        step = gradient / hessian
+        ratings -= step
+        if np.max(np.abs(step)) < 0.5:
+            break
+    return np.clip(ratings, MIN_RATING, MAX_RATING)
+
+def group_percentiles(index, count: int, values, percentiles):
+    """Nearest-rank percentiles of `values` within each group; NaN for empty groups"""
+    order = np.lexsort((values, index))
+    sorted_values = values[order]
+    sizes = np.bincount(index, minlength=count)
+    starts = np.cumsum(sizes) - sizes
+    results = []
+    for percentile in percentiles:
+        positions = starts + np.floor((sizes - 1) * percentile / 100).astype(np.int64)
+        result = np.full(count, np.nan)
+        present = sizes > 0
+        result[present] = sorted_values[positions[present]]
+        results.append(result)
+    return results
+
+def difficulty_labels(ratings) -> np.ndarray:
+    """Map ratings to the easy/medium/hard labels used by the puzzle pages"""
+    bounds = [bound for bound, _ in DIFFICULTY_BANDS]
+    labels = np.array([label for _, label in DIFFICULTY_BANDS] + ["hard"])
+    return labels[np.searchsorted(bounds, ratings, side="right")]
+
+def calibrate_arrays(puzzle_ids, solver_ratings, success, times, priors: dict) -> list:
+    """
+    Fit every attempted puzzle and return update rows of
+    (rating, difficulty, attempts, solve_rate, time_p50, time_p90, puzzle_id).
+    """
+    ids, index = np.unique(puzzle_ids, return_inverse=True)
+    count = len(ids)
+    if count == 0:
+        return []
+    prior = np.array([priors.get(int(puzzle_id), DEFAULT_RATING) for puzzle_id in ids], dtype=np.float64)
+
+    ratings = np.rint(fit_ratings(index, count, solver_ratings, success, prior))
+    labels = difficulty_labels(ratings)
+    attempts = np.bincount(index, minlength=count)
+    solve_rates = np.bincount(index, weights=success, minlength=count) / attempts
+
+    # Solve times only count successful attempts that reported a time
+    timed = success & (times >= 0)
+    time_p50, time_p90 = group_percentiles(index[timed], count, times[timed], (50, 90))
+
+    def optional_int(value):
+        return None if np.isnan(value) else int(value)
+
+    return [
+        (int(ratings[i]), str(labels[i]), int(attempts[i]), round(float(solve_rates[i]), 4),
+         optional_int(time_p50[i]), optional_int(time_p90[i]), int(ids[i]))
+        for i in range(count)
+    ]
+
+async def calibrate() -> dict:
+    """Recalibrate puzzle ratings and difficulties from all recorded attempts"""
+    async with read_pool.connection() as db:
+        attempts = await load_attempts(db)
+        cursor = await db.execute("SELECT id, COALESCE(prior_rating, rating) FROM puzzles")
+        priors = {row[0]: row[1] for row in await cursor.fetchall()}
+    if attempts is None:
+        return {"puzzles": 0, "attempts": 0}
+
+    puzzle_ids, solver_ratings, success, times = attempts
+    # Attempts on puzzles deleted since they were loaded have nothing to update
+    known = np.isin(puzzle_ids, np.fromiter(priors, dtype=np.int64, count=len(priors)))
+    if not known.any():
+        return {"puzzles": 0, "attempts": 0}
+    # The fit is CPU-bound; NumPy releases the GIL so the event loop keeps serving
+    updates = await asyncio.to_thread(
+        calibrate_arrays, puzzle_ids[known], solver_ratings[known], success[known], times[known], priors)
+
+    calibrated_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
+    for start in range(0, len(updates), CALIBRATION_CHUNK_SIZE):
+        batch = updates[start:start + CALIBRATION_CHUNK_SIZE]
+        async with write_pool.connection() as db:
+            await db.executemany(
+                """UPDATE puzzles
+                   SET rating = ?, difficulty = ?, attempts = ?, solve_rate = ?,
+                       time_p50 = ?, time_p90 = ?, calibrated_at = ?
+                   WHERE id = ?""",
+                [row[:-1] + (calibrated_at, row[-1]) for row in batch]
+            )
+            await db.commit()
+    async with write_pool.connection() as db:
+        await invalidate(db, "puzzles")
+    return {"puzzles": len(updates), "attempts": int(known.sum())}
@@ -0,0 +1,155 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from app.database.pool import read_pool, write_pool
+from app.database.cache import invalidate
+from app.chess.notation import normalize_fen, normalize_solution
+from app.jobs.scheduler import scheduler
+from app.database.backup import create_snapshot
+from app.leaderboards import archive_rating_deltas
+
+# rating_history rows older than this are deleted; 0 keeps everything
+RATING_HISTORY_RETENTION_DAYS = int(os.getenv("RATING_HISTORY_RETENTION_DAYS", "365"))
+# Sync idempotency keys older than this are forgotten; retries must come sooner
+SYNC_RECEIPT_RETENTION_DAYS = int(os.getenv("SYNC_RECEIPT_RETENTION_DAYS", "30"))
+# Users kept in each daily leaderboard snapshot
+LEADERBOARD_SNAPSHOT_SIZE = int(os.getenv("LEADERBOARD_SNAPSHOT_SIZE", "100"))
+# Rows deleted per transaction when pruning, so writers aren't blocked for long
+PRUNE_BATCH_SIZE = 5000
+
+@scheduler.job("optimize", cron="15 3 * * *", jitter=120)
+async def optimize_database():
+    """Refresh query planner statistics with ANALYZE and PRAGMA optimize"""
+    async with write_pool.connection() as db:
+        # Sample at most this many index rows per table so ANALYZE stays cheap
+        await db.execute("PRAGMA analysis_limit = 1000")
+        await db.execute("ANALYZE")
+        await db.execute("PRAGMA optimize")
+        await db.commit()
+    return {"analyzed": True}
+
+@scheduler.job("wal_checkpoint", every=900, jitter=60)
+async def checkpoint_wal():
+    """Copy the WAL into the database file and truncate it"""
+    async with write_pool.connection() as db:
+        cursor = await db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        busy, log_pages, checkpointed = await cursor.fetchone()
+    return {"busy": bool(busy), "log_pages": log_pages, "checkpointed_pages": checkpointed}
+
+@scheduler.job("stats_rollup", cron="*/15 * * * *", jitter=60)
+async def rollup_daily_stats():
+    """Recompute the daily_stats rows for yesterday and today"""
+    today = datetime.now(timezone.utc).date()
+    days = [today - timedelta(days=1), today]
+    async with write_pool.connection() as db:
+        for day in days:
+            start = day.isoformat()
+            end = (day + timedelta(days=1)).isoformat()
+            await db.execute("""
+                INSERT OR REPLACE INTO daily_stats
+                    (day, new_users, games, puzzle_attempts, puzzles_solved, purchases, revenue, updated_at)
+                SELECT ?,
+                    (SELECT COUNT(*) FROM users WHERE created_at >= ? AND created_at < ?),
+                    (SELECT COUNT(*) FROM games WHERE created_at >= ? AND created_at < ?),
+                    (SELECT COUNT(*) FROM puzzle_attempts WHERE created_at >= ? AND created_at < ?),
+                    (SELECT COUNT(*) FROM puzzle_attempts WHERE created_at >= ? AND created_at < ? AND success = 1),
+                    (SELECT COUNT(*) FROM purchases WHERE purchased_at >= ? AND purchased_at < ?),
+                    (SELECT COALESCE(SUM(amount), 0) FROM purchases WHERE purchased_at >= ? AND purchased_at < ?),
+                    CURRENT_TIMESTAMP
+            """, (start,) + (start, end) * 6)
+        await db.commit()
+    return {"days": [day.isoformat() for day in days]}
+
+@scheduler.job("leaderboard_snapshot", cron="0 0 * * *", jitter=120)
+async def snapshot_leaderboard():
+    """Store today's top players so rank changes can be shown over time"""
+    snapshot_date = datetime.now(timezone.utc).date().isoformat()
+    async with write_pool.connection() as db:
+        await db.execute("DELETE FROM leaderboard_snapshots WHERE snapshot_date = ?", (snapshot_date,))
+        cursor = await db.execute("""
+            INSERT INTO leaderboard_snapshots (snapshot_date, rank, user_id, rating)
+            SELECT ?, ROW_NUMBER() OVER (ORDER BY rating DESC, id), id, rating
+            FROM users
+            ORDER BY rating DESC, id
+            LIMIT ?
+        """, (snapshot_date, LEADERBOARD_SNAPSHOT_SIZE))
+        await db.commit()
+    return {"snapshot_date": snapshot_date, "users": cursor.rowcount}
+
+@scheduler.job("prune_rating_history", cron="45 3 * * *", jitter=120)
+async def prune_rating_history():
+    """Delete rating_history rows older than the retention period"""
+    if RATING_HISTORY_RETENTION_DAYS <= 0:
+        return {"deleted": 0}
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=RATING_HISTORY_RETENTION_DAYS))
+    cutoff = cutoff.strftime("%Y-%m-%d %H:%M:%S")
+    deleted = 0
+    while True:
+        async with write_pool.connection() as db:
+            cursor = await db.execute("""
+                DELETE FROM rating_history WHERE id IN (
+                    SELECT id FROM rating_history WHERE created_at < ? LIMIT ?
+                )
+            """, (cutoff, PRUNE_BATCH_SIZE))
+            await db.commit()
+        deleted += cursor.rowcount
+        # Release the writer between batches so requests can write in between
+        if cursor.rowcount < PRUNE_BATCH_SIZE:
+            return {"deleted": deleted, "cutoff": cutoff}
+
+@scheduler.job("prune_sync_receipts", cron="55 3 * * *", jitter=120)
+async def prune_sync_receipts():
+    """Delete sync idempotency keys older than the retention period"""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=SYNC_RECEIPT_RETENTION_DAYS))
+    cutoff = cutoff.strftime("%Y-%m-%d %H:%M:%S")
+    async with write_pool.connection() as db:
+        cursor = await db.execute("DELETE FROM sync_receipts WHERE created_at < ?", (cutoff,))
+        await db.commit()
+    return {"deleted": cursor.rowcount, "cutoff": cutoff}
+
+@scheduler.job("backup", cron="0 2 * * *", jitter=120, timeout=3600)
+async def backup_database():
+    """Snapshot the database into BACKUP_DIR with the online backup API"""
+    return await create_snapshot()
+
+@scheduler.job("archive_rating_deltas", cron="10 0 * * *", jitter=120)
+async def archive_leaderboard_windows():
+    """Move finished day/week/month leaderboard windows to the archive"""
+    async with write_pool.connection() as db:
+        return {"archived": await archive_rating_deltas(db)}
+
+def _normalized_puzzles(rows) -> tuple:
+    updates, invalid = [], []
+    for puzzle_id, fen, solution in rows:
+        try:
+            normalized = (normalize_fen(fen), normalize_solution(fen, solution))
+        except ValueError:
+            invalid.append(puzzle_id)
+            continue
+        if normalized != (fen, solution):
+            updates.append(normalized + (puzzle_id,))
+    return updates, invalid
+
+@scheduler.job("normalize_puzzles", cron="50 4 * * *", jitter=120)
+async def normalize_puzzles():
+    """Rewrite puzzles saved before validation in canonical FEN and UCI form"""
+    async with read_pool.connection() as db:
+        cursor = await db.execute("SELECT id, fen, solution FROM puzzles")
+        rows = [tuple(row) for row in await cursor.fetchall()]
+    # Parsing is CPU-bound, so it runs off the event loop
+    updates, invalid = await asyncio.to_thread(_normalized_puzzles, rows)
+    if updates:
+        async with write_pool.connection() as db:
+            await db.executemany("UPDATE puzzles SET fen = ?, solution = ? WHERE id = ?", updates)
+            await db.commit()
+            await invalidate(db, "puzzles")
+    if invalid:
+        print(f"Puzzles with an invalid FEN or solution: {invalid[:20]}")
+    return {"normalized": len(updates), "invalid": len(invalid), "invalid_ids": invalid[:20]}
+
+@scheduler.job("calibrate_puzzles", cron="30 4 * * *", jitter=120, timeout=1800)
+async def calibrate_puzzles():
+    """Fit puzzle ratings and difficulties to attempt results"""
+    # NumPy is only imported when the job runs, keeping it off the startup path
+    from app.jobs.calibration import calibrate
+    return await calibrate()
@@ -0,0 +1,323 @@
+import asyncio
+import json
+import os
+import random
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+from app.database.pool import write_pool, read_pool
+from app.metrics import register_metrics
+
+# Set to 0 to stop this worker from running scheduled jobs (manual runs still work)
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") not in ("0", "false", "False", "")
+# Run history rows kept per job
+JOB_RUNS_KEPT = int(os.getenv("JOB_RUNS_KEPT", "100"))
+# Longest a worker sleeps before re-reading a job's shared next run time
+MAX_SLEEP = 60
+
+class CronSchedule:
+    """
+    Five-field cron expression (minute hour day-of-month month day-of-week),
+    evaluated in UTC. Fields accept *, numbers, ranges (1-5), lists (1,15)
+    and steps (*/15, 0-30/10). Day-of-week runs 0-6 with 0 = Sunday.
+    """
+
+    RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse_field(field, low, high) for field, (low, high) in zip(fields, self.RANGES))
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int) -> frozenset:
+        values = set()
+        for part in field.split(","):
+            step = 1
+            stepped = "/" in part
+            if stepped:
+                part, step_text = part.split("/", 1)
+                step = int(step_text)
+            if part == "*":
+                start, end = low, high
+            elif "-" in part:
+                start, end = (int(value) for value in part.split("-", 1))
+            else:
+                # As in cron, "5/20" steps from 5 to the end of the range
+                start = int(part)
+                end = high if stepped else start
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"Invalid cron field: {field!r}")
+            values.update(range(start, end + 1, step))
+        return frozenset(values)
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        # Like cron, a restricted day-of-month and day-of-week match either one
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, timestamp: float) -> float:
+        """Epoch seconds of the first matching minute after `timestamp`"""
+        moment = datetime.fromtimestamp(timestamp, timezone.utc).replace(second=0, microsecond=0)
+        moment += timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months or not self._day_matches(moment):
+                moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+            elif moment.hour not in self.hours:
+                moment = (moment + timedelta(hours=1)).replace(minute=0)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment.timestamp()
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+class Job:
+    """A periodic task: an async callable returning an optional dict summary"""
+
+    def __init__(self, name: str, func, every: float = None, cron: str = None,
+                 jitter: float = 0, timeout: float = 600, description: str = None):
+        if (every is None) == (cron is None):
+            raise ValueError("A job needs exactly one of `every` or `cron`")
+        self.name = name
+        self.func = func
+        self.every = every
+        self.cron = CronSchedule(cron) if cron else None
+        self.jitter = jitter
+        self.timeout = timeout
+        self.description = description or (func.__doc__ or "").strip()
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+
+    def next_after(self, timestamp: float) -> float:
+        if self.cron:
+            return self.cron.next_after(timestamp)
+        return timestamp + self.every
+
+    @property
+    def schedule(self) -> str:
+        return f"cron {self.cron.expression}" if self.cron else f"every {self.every:g}s"
+
+    def stats(self) -> dict:
+        return {"runs": self.runs, "failures": self.failures, "skipped": self.skipped}
+
+class JobAlreadyRunning(Exception):
+    """Another run of the job holds its lease"""
+
+class Scheduler:
+    """
+    Runs registered jobs from the app's event loop.
+
+    Every worker keeps a timer per job, but a run only happens after claiming
+    it in the shared `job_schedule` table: the claim moves `next_run_at`
+    forward and takes a lease, so each occurrence runs in exactly one worker
+    and a job never overlaps itself. Runs are recorded in `job_runs`.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._manual_runs = set()
+
+    def job(self, name: str, **options):
+        """Decorator registering an async function as a job"""
+        def register(func):
+            self.jobs[name] = Job(name, func, **options)
+            return func
+        return register
+
+    async def run(self):
+        """Background task running every job on its schedule"""
+        try:
+            if SCHEDULER_ENABLED and self.jobs:
+                await asyncio.gather(*(self._job_loop(job) for job in self.jobs.values()))
+            else:
+                await asyncio.Event().wait()
+        finally:
+            for task in list(self._manual_runs):
+                task.cancel()
+
+    async def _job_loop(self, job: Job):
+        while True:
+            try:
+                due = await self._next_run_at(job)
+                delay = due - time.time()
+                if delay > 0:
+                    await asyncio.sleep(min(delay, MAX_SLEEP))
+                    continue
+                # Jitter spreads the workers' claims and keeps jobs from starting in lockstep
+                await asyncio.sleep(random.uniform(0, job.jitter))
+                run_id = await self._claim(job, scheduled=True)
+                if run_id is None:
+                    # Another worker claimed this run, or a manual run holds the lease
+                    job.skipped += 1
+                    await asyncio.sleep(5)
+                    continue
+                await self._execute(job, run_id)
+            except Exception as e:
+                print(f"Scheduler error for job {job.name}: {e}")
+                await asyncio.sleep(MAX_SLEEP)
+
+    async def _next_run_at(self, job: Job) -> float:
+        async with read_pool.connection() as db:
+            cursor = await db.execute(
+                "SELECT next_run_at FROM job_schedule WHERE name = ?", (job.name,))
+            row = await cursor.fetchone()
+        if row is not None:
+            return row[0]
+        async with write_pool.connection() as db:
+            await db.execute(
+                "INSERT OR IGNORE INTO job_schedule (name, next_run_at) VALUES (?, ?)",
+                (job.name, job.next_after(time.time()))
+            )
+            await db.commit()
+            cursor = await db.execute(
+                "SELECT next_run_at FROM job_schedule WHERE name = ?", (job.name,))
+            return (await cursor.fetchone())[0]
+
+    async def _claim(self, job: Job, scheduled: bool, trigger: str = "schedule"):
+        """
+        Take the job's lease and open a job_runs row. A scheduled claim also
+        requires the run to be due and advances next_run_at. Returns the run
+        id, or None if another worker got there first.
+        """
+        now = time.time()
+        async with write_pool.connection() as db:
+            if scheduled:
+                cursor = await db.execute(
+                    """UPDATE job_schedule
+                       SET next_run_at = ?, lease_owner = ?, lease_expires_at = ?
+                       WHERE name = ? AND next_run_at <= ?
+                         AND (lease_expires_at IS NULL OR lease_expires_at < ?)""",
+                    (job.next_after(now), self.owner, now + job.timeout, job.name, now, now)
+                )
+            else:
+                await db.execute(
+                    "INSERT OR IGNORE INTO job_schedule (name, next_run_at) VALUES (?, ?)",
+                    (job.name, job.next_after(now))
+                )
+                cursor = await db.execute(
+                    """UPDATE job_schedule SET lease_owner = ?, lease_expires_at = ?
+                       WHERE name = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)""",
+                    (self.owner, now + job.timeout, job.name, now)
+                )
+            if cursor.rowcount == 0:
+                await db.rollback()
+                return None
+            cursor = await db.execute(
+                "INSERT INTO job_runs (name, trigger, owner, status) VALUES (?, ?, ?, 'running')",
+                (job.name, trigger, self.owner)
+            )
+            await db.commit()
+            return cursor.lastrowid
+
+    async def _execute(self, job: Job, run_id: int):
+        started = time.perf_counter()
+        status, result, error = "success", None, None
+        try:
+            result = await asyncio.wait_for(job.func(), job.timeout)
+            job.runs += 1
+        except asyncio.CancelledError:
+            status, error = "cancelled", "Worker shut down"
+            raise
+        except Exception as e:
+            status, error = "failed", f"{type(e).__name__}: {e}"
+            job.failures += 1
+            print(f"Job {job.name} failed: {error}")
+        finally:
+            duration_ms = int((time.perf_counter() - started) * 1000)
+            await self._finish(job, run_id, status, duration_ms, result, error)
+
+    async def _finish(self, job: Job, run_id: int, status: str, duration_ms: int, result, error):
+        async with write_pool.connection() as db:
+            await db.execute(
+                """UPDATE job_runs
+                   SET status = ?, finished_at = CURRENT_TIMESTAMP, duration_ms = ?, result = ?, error = ?
+                   WHERE id = ?""",
+                (status, duration_ms, json.dumps(result) if result is not None else None, error, run_id)
+            )
+            await db.execute(
+                """UPDATE job_schedule SET lease_owner = NULL, lease_expires_at = NULL
+                   WHERE name = ? AND lease_owner = ?""",
+                (job.name, self.owner)
+            )
+            await db.execute(
+                """DELETE FROM job_runs WHERE name = ? AND id <= (
+                       SELECT id FROM job_runs WHERE name = ? ORDER BY id DESC LIMIT 1 OFFSET ?)""",
+                (job.name, job.name, JOB_RUNS_KEPT)
+            )
+            await db.commit()
+
+    async def trigger(self, name: str) -> int:
+        """
+        Start a job now, outside its schedule. Returns the run id; raises
+        KeyError for unknown jobs and JobAlreadyRunning if it holds a lease.
+        """
+        job = self.jobs[name]
+        run_id = await self._claim(job, scheduled=False, trigger="manual")
+        if run_id is None:
+            raise JobAlreadyRunning(name)
+        task = asyncio.create_task(self._execute(job, run_id))
+        self._manual_runs.add(task)
+        task.add_done_callback(self._manual_runs.discard)
+        return run_id
+
+    async def describe(self) -> list:
+        """Every job with its schedule state and latest run"""
+        async with read_pool.connection() as db:
+            cursor = await db.execute("SELECT * FROM job_schedule")
+            schedule = {row["name"]: dict(row) for row in await cursor.fetchall()}
+            cursor = await db.execute("""
+                SELECT * FROM job_runs
+                WHERE id IN (SELECT MAX(id) FROM job_runs GROUP BY name)
+            """)
+            last_runs = {row["name"]: dict(row) for row in await cursor.fetchall()}
+
+        jobs = []
+        for job in self.jobs.values():
+            state = schedule.get(job.name, {})
+            last_run = last_runs.get(job.name)
+            if last_run and last_run["result"]:
+                last_run["result"] = json.loads(last_run["result"])
+            jobs.append({
+                "name": job.name,
+                "description": job.description,
+                "schedule": job.schedule,
+                "next_run_at": _isoformat(state.get("next_run_at")),
+                "running": bool(state.get("lease_expires_at") and state["lease_expires_at"] > time.time()),
+                "lease_owner": state.get("lease_owner"),
+                "last_run": last_run,
+            })
+        return jobs
+
+    async def history(self, name: str, limit: int = 20) -> list:
+        """Most recent runs of a job"""
+        async with read_pool.connection() as db:
+            cursor = await db.execute(
+                "SELECT * FROM job_runs WHERE name = ? ORDER BY id DESC LIMIT ?", (name, limit))
+            runs = [dict(row) for row in await cursor.fetchall()]
+        for run in runs:
+            if run["result"]:
+                run["result"] = json.loads(run["result"])
+        return runs
+
+    def stats(self) -> dict:
+        return {"enabled": SCHEDULER_ENABLED, "owner": self.owner,
+                "jobs": {name: job.stats() for name, job in self.jobs.items()}}
+
+def _isoformat(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+scheduler = Scheduler()
+register_metrics("scheduler", scheduler.stats)
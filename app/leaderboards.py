@@ -0,0 +1,74 @@
+import os
+from datetime import datetime, timedelta, timezone
+from app.database.cache import SharedCache
+
+# Leaderboard windows; each rating change is added to the current bucket of every period
+PERIODS = ("day", "week", "month")
+# Seconds a worker serves a window's ranking from memory before re-reading it
+LEADERBOARD_CACHE_SECONDS = float(os.getenv("LEADERBOARD_CACHE_SECONDS", "15"))
+
+leaderboard_cache = SharedCache("leaderboards", ttl=LEADERBOARD_CACHE_SECONDS)
+
+def bucket_start(period: str, moment: datetime = None) -> str:
+    """First day (UTC) of the window containing `moment`: the day, its ISO week's Monday, or the month"""
+    day = (moment or datetime.now(timezone.utc)).date()
+    if period == "week":
+        day -= timedelta(days=day.weekday())
+    elif period == "month":
+        day = day.replace(day=1)
+    elif period != "day":
+        raise ValueError(f"Unknown leaderboard period: {period}")
+    return day.isoformat()
+
+async def record_rating_delta(db, user_id: int, change: int):
+    """Add a rating change to the user's current day, week and month buckets. The caller commits."""
+    now = datetime.now(timezone.utc)
+    await db.executemany(
+        """INSERT INTO rating_deltas (period, bucket, user_id, delta) VALUES (?, ?, ?, ?)
+           ON CONFLICT(period, bucket, user_id) DO UPDATE SET delta = delta + excluded.delta""",
+        [(period, bucket_start(period, now), user_id, change) for period in PERIODS]
+    )
+
+async def get_window_leaderboard(db, period: str, limit: int = 10, bucket: str = None) -> list:
+    """
+    Top rating gainers of a window, the current one unless `bucket` names an
+    earlier window's first day. Rankings are served from memory for
+    LEADERBOARD_CACHE_SECONDS. Past windows are read from the archive, and from
+    rating_deltas too until the archive job has moved them.
+    """
+    current = bucket_start(period)
+    bucket = bucket or current
+    if bucket >= current:
+        source = "rating_deltas"
+    else:
+        source = """(SELECT period, bucket, user_id, delta FROM rating_deltas_archive
+                    UNION ALL SELECT period, bucket, user_id, delta FROM rating_deltas)"""
+
+    async def load():
+        cursor = await db.execute(f"""
+            SELECT rd.user_id AS id, u.username, u.rating, rd.delta AS rating_change
+            FROM {source} rd
+            JOIN users u ON u.id = rd.user_id
+            WHERE rd.period = ? AND rd.bucket = ?
+            ORDER BY rd.delta DESC, rd.user_id
+            LIMIT ?
+        """, (period, bucket, limit))
+        return [dict(row) for row in await cursor.fetchall()]
+    return await leaderboard_cache.get_or_load((period, bucket, limit), load)
+
+async def archive_rating_deltas(db) -> dict:
+    """Move buckets of finished windows into rating_deltas_archive"""
+    moved = {}
+    for period in PERIODS:
+        current = bucket_start(period)
+        await db.execute(
+            """INSERT OR REPLACE INTO rating_deltas_archive (period, bucket, user_id, delta)
+               SELECT period, bucket, user_id, delta FROM rating_deltas
+               WHERE period = ? AND bucket < ?""",
+            (period, current)
+        )
+        cursor = await db.execute(
+            "DELETE FROM rating_deltas WHERE period = ? AND bucket < ?", (period, current))
+        await db.commit()
+        moved[period] = cursor.rowcount
+    return moved
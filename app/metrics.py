@@ -0,0 +1,9 @@
+_sources = {}
+
+def register_metrics(name: str, source):
+    """Register a zero-argument callable returning a dict of metrics under `name`"""
+    _sources[name] = source
+
+def collect_metrics() -> dict:
+    """Snapshot every registered metrics source"""
+    return {name: source() for name, source in _sources.items()}
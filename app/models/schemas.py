@@ -1,6 +1,12 @@
-from pydantic import BaseModel, EmailStr, field_validator
-from typing import Optional
+from pydantic import AfterValidator, BaseModel, EmailStr, Field, field_validator, model_validator
+from typing import Annotated, Any, List, Literal, Optional
 from datetime import datetime
+from app.chess.notation import check_moves, normalize_fen, normalize_solution
+
+# A legal position, stored in canonical FEN form
+FEN = Annotated[str, AfterValidator(normalize_fen)]
+# Well-formed SAN, UCI or from-to moves separated by spaces
+MoveList = Annotated[str, AfterValidator(check_moves)]
 
 class UserBase(BaseModel):
     username: str
@@ -26,6 +32,9 @@ class User(UserBase):
     class Config:
         from_attributes = True
 
+class UserAdminUpdate(BaseModel):
+    is_admin: bool
+
 class CategoryBase(BaseModel):
     name: str
     description: Optional[str] = None
@@ -59,11 +68,17 @@ class Course(CourseBase):
 
 class PuzzleBase(BaseModel):
     title: str
-    fen: str
-    solution: str
+    fen: FEN
+    solution: MoveList
     difficulty: str = "easy"
     category_id: Optional[int] = None
     rating: int = 1200
+    
+    @model_validator(mode="after")
+    def validate_solution(self):
+        """Check the solution is legal from the position and store it as UCI moves"""
+        self.solution = normalize_solution(self.fen, self.solution)
+        return self
 
 class PuzzleCreate(PuzzleBase):
     pass
@@ -97,6 +112,10 @@ class PuzzleAttemptBase(BaseModel):
     success: bool
     time_taken: Optional[int] = None
 
+class PuzzleAttemptSubmit(PuzzleAttemptBase):
+    # The moves the user entered; when given, the server decides `success`
+    answer: Optional[str] = None
+
 class PuzzleAttemptCreate(PuzzleAttemptBase):
     user_id: int
 
@@ -123,6 +142,23 @@ class Purchase(PurchaseBase):
     class Config:
         from_attributes = True
 
+class SyncItemBase(BaseModel):
+    # Client-generated idempotency key; an item is applied at most once per key
+    key: str = Field(min_length=1, max_length=64)
+    # When the event happened on the client; defaults to the time of the sync
+    occurred_at: Optional[datetime] = None
+
+class SyncAttempt(SyncItemBase, PuzzleAttemptBase):
+    type: Literal["attempt"]
+
+class SyncGame(SyncItemBase, GameBase):
+    type: Literal["game"]
+
+class SyncRequest(BaseModel):
+    # Validated one by one, so a bad item (even one that isn't an object) is
+    # reported without rejecting the batch
+    items: List[Any]
+
 class Token(BaseModel):
     access_token: str
     token_type: str
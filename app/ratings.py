@@ -0,0 +1,31 @@
+from app.leaderboards import record_rating_delta
+
+# Rating points awarded for each game result
+GAME_RATING_CHANGES = {"win": 20, "loss": -15, "draw": 5}
+PUZZLE_SOLVED_RATING_CHANGE = 10
+
+async def record_rating_change(db, user_id: int, change: int, reason: str) -> int:
+    """
+    Apply a rating change, log it in rating_history and add it to the windowed
+    leaderboard buckets. The update is done in SQL so concurrent requests
+    can't overwrite each other. The caller commits.
+    """
+    await db.execute("UPDATE users SET rating = MAX(0, rating + ?) WHERE id = ?", (change, user_id))
+    cursor = await db.execute("SELECT rating FROM users WHERE id = ?", (user_id,))
+    new_rating = (await cursor.fetchone())[0]
+    await db.execute(
+        "INSERT INTO rating_history (user_id, rating, change, reason) VALUES (?, ?, ?, ?)",
+        (user_id, new_rating, change, reason)
+    )
+    await record_rating_delta(db, user_id, change)
+    return new_rating
+
+async def fetch_rating_trend(db, user_id: int, days: int = 30) -> list:
+    """A user's rating after each change in the last `days` days, oldest first"""
+    cursor = await db.execute("""
+        SELECT rating, change, created_at
+        FROM rating_history
+        WHERE user_id = ? AND created_at >= datetime('now', ?)
+        ORDER BY created_at, id
+    """, (user_id, f"-{days} days"))
+    return [dict(row) for row in await cursor.fetchall()]
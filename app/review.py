@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta, timezone
+
+# SM-2 defaults: starting ease factor, its floor, and the first two intervals in days
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+FIRST_INTERVAL_DAYS = 1
+SECOND_INTERVAL_DAYS = 6
+
+def review_quality(success: bool, time_taken: int = None, typical_time: int = None) -> int:
+    """
+    SM-2 grade (0-5) for an attempt: failures grade 1, solves grade 4, or 5
+    when faster than the puzzle's median solve time and 3 when over twice it.
+    """
+    if not success:
+        return 1
+    if time_taken is None or not typical_time:
+        return 4
+    if time_taken <= typical_time:
+        return 5
+    if time_taken > 2 * typical_time:
+        return 3
+    return 4
+
+def sm2(repetitions: int, interval_days: float, ease: float, quality: int):
+    """Next (repetitions, interval_days, ease) after a review graded `quality`"""
+    if quality < 3:
+        repetitions, interval_days = 0, FIRST_INTERVAL_DAYS
+    else:
+        repetitions += 1
+        if repetitions == 1:
+            interval_days = FIRST_INTERVAL_DAYS
+        elif repetitions == 2:
+            interval_days = SECOND_INTERVAL_DAYS
+        else:
+            interval_days = round(interval_days * ease, 1)
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return repetitions, interval_days, ease
+
+async def schedule_review(db, user_id: int, puzzle_id: int, success: bool, time_taken: int = None):
+    """
+    Update the user's review card for a puzzle after an attempt. Failed puzzles
+    enter the queue; attempts on queued puzzles move their due date with SM-2.
+    Successes on puzzles that were never failed are ignored. The caller commits.
+    """
+    cursor = await db.execute(
+        "SELECT repetitions, interval_days, ease, lapses FROM review_queue WHERE user_id = ? AND puzzle_id = ?",
+        (user_id, puzzle_id)
+    )
+    card = await cursor.fetchone()
+    if card is None and success:
+        return None
+    repetitions, interval_days, ease, lapses = card if card else (0, 0, INITIAL_EASE, 0)
+
+    typical_time = None
+    if success and time_taken is not None:
+        cursor = await db.execute("SELECT time_p50 FROM puzzles WHERE id = ?", (puzzle_id,))
+        row = await cursor.fetchone()
+        typical_time = row[0] if row else None
+
+    quality = review_quality(success, time_taken, typical_time)
+    repetitions, interval_days, ease = sm2(repetitions, interval_days, ease, quality)
+    if not success:
+        lapses += 1
+    now = datetime.now(timezone.utc)
+    due_at = (now + timedelta(days=interval_days)).strftime("%Y-%m-%d %H:%M:%S")
+    await db.execute(
+        """INSERT INTO review_queue
+               (user_id, puzzle_id, repetitions, interval_days, ease, lapses, due_at, last_reviewed_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+           ON CONFLICT(user_id, puzzle_id) DO UPDATE SET
+               repetitions = excluded.repetitions, interval_days = excluded.interval_days,
+               ease = excluded.ease, lapses = excluded.lapses, due_at = excluded.due_at,
+               last_reviewed_at = excluded.last_reviewed_at""",
+        (user_id, puzzle_id, repetitions, interval_days, ease, lapses, due_at,
+         now.strftime("%Y-%m-%d %H:%M:%S"))
+    )
+    return due_at
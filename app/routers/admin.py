@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.models.schemas import UserAdminUpdate
 from app.routers.auth import get_current_admin_user
-from app.database.database import get_db
+from app.database.pool import get_read_db, get_write_db
+from app.database.backup import EXPORT_FORMATS, EXPORT_TABLES, export_columns, export_rows, list_snapshots
+from app.database.bulk import BULK_BATCH_SIZE, BulkItemError, apply_bulk, item_id, read_items
+from app.metrics import collect_metrics
+from app.jobs.scheduler import scheduler, JobAlreadyRunning
+from app.leaderboards import PERIODS, get_window_leaderboard
 from typing import List
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 @router.get("/users", response_model=List[dict])
-async def get_all_users(db = Depends(get_db), 
-                       current_user: dict = Depends(get_current_admin_user)):
+async def get_all_users(current_user: dict = Depends(get_current_admin_user),
+                       db = Depends(get_read_db)):
     """Get all users (admin only)"""
     cursor = await db.execute("""
         SELECT id, username, email, is_admin, rating, created_at
@@ -18,16 +25,17 @@ async def get_all_users(db = Depends(get_db),
     return [dict(user) for user in users]
 
 @router.put("/users/{user_id}/admin", response_model=dict)
-async def toggle_admin(user_id: int, is_admin: bool, db = Depends(get_db),
-                      current_user: dict = Depends(get_current_admin_user)):
+async def toggle_admin(user_id: int, is_admin: bool,
+                       current_user: dict = Depends(get_current_admin_user),
+                       db = Depends(get_write_db)):
     """Toggle admin status for a user (admin only)"""
     await db.execute("UPDATE users SET is_admin = ? WHERE id = ?", (is_admin, user_id))
     await db.commit()
     return {"message": "User admin status updated"}
 
 @router.delete("/users/{user_id}", response_model=dict)
-async def delete_user(user_id: int, db = Depends(get_db),
-                     current_user: dict = Depends(get_current_admin_user)):
+async def delete_user(user_id: int, current_user: dict = Depends(get_current_admin_user),
+                     db = Depends(get_write_db)):
     """Delete a user (admin only)"""
     if user_id == current_user["id"]:
         raise HTTPException(status_code=400, detail="Cannot delete yourself")
@@ -35,9 +43,33 @@ async def delete_user(user_id: int, db = Depends(get_db),
     await db.commit()
     return {"message": "User deleted"}
 
+@router.post("/users/bulk", response_model=dict)
+async def bulk_users(request: Request, batch_size: int = BULK_BATCH_SIZE, atomic: bool = False,
+                     current_user: dict = Depends(get_current_admin_user)):
+    """Update admin status of or delete many users from a JSON array or NDJSON (admin only)"""
+    async def update(db, item):
+        user_id = item_id(item)
+        data = UserAdminUpdate.model_validate(item.get("data"))
+        cursor = await db.execute("UPDATE users SET is_admin = ? WHERE id = ?", (data.is_admin, user_id))
+        if cursor.rowcount == 0:
+            raise BulkItemError("Not found")
+        return user_id
+
+    async def delete(db, item):
+        user_id = item_id(item)
+        if user_id == current_user["id"]:
+            raise BulkItemError("Cannot delete yourself")
+        cursor = await db.execute("DELETE FROM users WHERE id = ?", (user_id,))
+        if cursor.rowcount == 0:
+            raise BulkItemError("Not found")
+        return user_id
+
+    return await apply_bulk(read_items(request), {"update": update, "delete": delete},
+                            batch_size, atomic)
+
 @router.get("/stats", response_model=dict)
-async def get_admin_stats(db = Depends(get_db),
-                         current_user: dict = Depends(get_current_admin_user)):
+async def get_admin_stats(current_user: dict = Depends(get_current_admin_user),
+                         db = Depends(get_read_db)):
     """Get platform statistics (admin only)"""
     # Total users
     cursor = await db.execute("SELECT COUNT(*) as count FROM users")
@@ -68,9 +100,77 @@ async def get_admin_stats(db = Depends(get_db),
         "revenue": purchase_stats["revenue"] if purchase_stats and purchase_stats["revenue"] else 0
     }
 
+@router.get("/metrics", response_model=dict)
+async def get_metrics(current_user: dict = Depends(get_current_admin_user)):
+    """Get runtime metrics for this worker (admin only)"""
+    return collect_metrics()
+
+@router.get("/stats/daily", response_model=List[dict])
+async def get_daily_stats(days: int = 30, current_user: dict = Depends(get_current_admin_user),
+                          db = Depends(get_read_db)):
+    """Get the daily activity rollup, newest first (admin only)"""
+    cursor = await db.execute("SELECT * FROM daily_stats ORDER BY day DESC LIMIT ?", (days,))
+    return [dict(row) for row in await cursor.fetchall()]
+
+@router.get("/jobs", response_model=List[dict])
+async def get_jobs(current_user: dict = Depends(get_current_admin_user)):
+    """List background jobs with their schedule and latest run (admin only)"""
+    return await scheduler.describe()
+
+@router.get("/jobs/{name}/runs", response_model=List[dict])
+async def get_job_runs(name: str, limit: int = 20, current_user: dict = Depends(get_current_admin_user)):
+    """Get recent runs of a background job (admin only)"""
+    if name not in scheduler.jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return await scheduler.history(name, limit)
+
+@router.post("/jobs/{name}/run", response_model=dict, status_code=202)
+async def run_job(name: str, current_user: dict = Depends(get_current_admin_user)):
+    """Start a background job now (admin only)"""
+    if name not in scheduler.jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    try:
+        run_id = await scheduler.trigger(name)
+    except JobAlreadyRunning:
+        raise HTTPException(status_code=409, detail="Job is already running")
+    return {"message": "Job started", "run_id": run_id}
+
+@router.get("/backups", response_model=List[dict])
+async def get_backups(current_user: dict = Depends(get_current_admin_user)):
+    """List database snapshots, newest first (admin only)"""
+    return list_snapshots()
+
+@router.post("/backups", response_model=dict, status_code=202)
+async def create_backup(current_user: dict = Depends(get_current_admin_user)):
+    """Start a database snapshot now; it runs as the `backup` job (admin only)"""
+    return await run_job("backup", current_user)
+
+@router.get("/export/{table}")
+async def export_table(table: str, format: str = "ndjson",
+                       current_user: dict = Depends(get_current_admin_user)):
+    """Stream a table as NDJSON or CSV (admin only)"""
+    if table not in EXPORT_TABLES:
+        raise HTTPException(status_code=404, detail="Table can't be exported")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    columns = await export_columns(table)
+    return StreamingResponse(
+        export_rows(table, columns, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{format}"'},
+    )
+
 @router.get("/leaderboard", response_model=List[dict])
-async def get_leaderboard(limit: int = 10, db = Depends(get_db)):
-    """Get top users by rating"""
+async def get_leaderboard(limit: int = 10, period: str = None, bucket: str = None,
+                          db = Depends(get_read_db)):
+    """
+    Get top users by rating, or with period=day|week|month the top rating
+    gainers of the current window (or of the window starting on `bucket`)
+    """
+    if period is not None:
+        if period not in PERIODS:
+            raise HTTPException(status_code=400, detail=f"period must be one of: {', '.join(PERIODS)}")
+        return await get_window_leaderboard(db, period, limit, bucket)
     cursor = await db.execute("""
         SELECT id, username, rating
         FROM users
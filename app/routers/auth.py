@@ -1,38 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import sqlite3
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from app.models.schemas import User, UserCreate, Token
-from app.auth import authenticate_user, create_access_token, get_password_hash, ACCESS_TOKEN_EXPIRE_MINUTES
-from app.database.database import get_db
+from app.auth import authenticate_user, create_access_token, hash_password, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.database.pool import read_pool, write_pool
+from app.throttle import client_ip, login_ip_limiter, login_user_limiter, register_ip_limiter
 from datetime import timedelta
-from jose import JWTError, jwt
 import os
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token", auto_error=False)
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = "HS256"
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db = Depends(get_db)):
-    """Get current authenticated user"""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+async def get_user_from_token(token: str, db):
+    """Resolve a JWT to its user row, or None if the token or user is invalid"""
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
+        return None
+    username: str = payload.get("sub")
+    if username is None:
+        return None
     
     cursor = await db.execute("SELECT * FROM users WHERE username = ?", (username,))
     user = await cursor.fetchone()
+    return dict(user) if user else None
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    """
+    Get current authenticated user. The lookup's connection goes back to the
+    pool right away, so declare this before a route's own db dependency: then
+    a request never holds two pooled connections at once.
+    """
+    async with read_pool.connection() as db:
+        user = await get_user_from_token(token, db)
     if user is None:
-        raise credentials_exception
-    return dict(user)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+async def get_optional_user(token: str = Depends(optional_oauth2_scheme)):
+    """Get the authenticated user, or None for anonymous requests"""
+    if not token:
+        return None
+    async with read_pool.connection() as db:
+        return await get_user_from_token(token, db)
 
 async def get_current_admin_user(current_user: dict = Depends(get_current_user)):
     """Get current admin user"""
@@ -41,29 +60,41 @@ async def get_current_admin_user(current_user: dict = Depends(get_current_user))
     return current_user
 
 @router.post("/register", response_model=dict)
-async def register(user: UserCreate, db = Depends(get_db)):
+async def register(user: UserCreate, request: Request):
     """Register a new user"""
+    register_ip_limiter.check(client_ip(request))
+
     # Check if user exists
-    cursor = await db.execute("SELECT id FROM users WHERE username = ? OR email = ?", 
-                               (user.username, user.email))
-    existing_user = await cursor.fetchone()
+    async with read_pool.connection() as db:
+        cursor = await db.execute("SELECT id FROM users WHERE username = ? OR email = ?", 
+                                   (user.username, user.email))
+        existing_user = await cursor.fetchone()
     if existing_user:
         raise HTTPException(status_code=400, detail="Username or email already registered")
     
+    # Hash before taking the writer so other writes aren't held up by bcrypt
+    hashed_password = await hash_password(user.password)
+
     # Create user
-    hashed_password = get_password_hash(user.password)
-    cursor = await db.execute(
-        "INSERT INTO users (username, email, hashed_password) VALUES (?, ?, ?)",
-        (user.username, user.email, hashed_password)
-    )
-    await db.commit()
+    async with write_pool.connection() as db:
+        try:
+            cursor = await db.execute(
+                "INSERT INTO users (username, email, hashed_password) VALUES (?, ?, ?)",
+                (user.username, user.email, hashed_password)
+            )
+        except sqlite3.IntegrityError:
+            raise HTTPException(status_code=400, detail="Username or email already registered")
+        await db.commit()
     
     return {"message": "User created successfully", "user_id": cursor.lastrowid}
 
 @router.post("/token", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db = Depends(get_db)):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     """Login and get access token"""
-    user = await authenticate_user(db, form_data.username, form_data.password)
+    login_ip_limiter.check(client_ip(request))
+    login_user_limiter.check(form_data.username.lower())
+
+    user = await authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
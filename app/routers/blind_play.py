@@ -0,0 +1,134 @@
+import json
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from app.routers.auth import get_user_from_token
+from app.chess.sessions import SessionStore
+from app.database.pool import read_pool, write_pool
+from app.engine.pool import engine_pool, ENGINE_LEVELS, DEFAULT_ENGINE_LEVEL
+from app.ratings import GAME_RATING_CHANGES, record_rating_change
+from app.metrics import register_metrics
+
+router = APIRouter(prefix="/blind-play", tags=["blind play"])
+
+sessions = SessionStore()
+register_metrics("blind_play", sessions.stats)
+
+async def save_game(db, session):
+    """Persist a finished session as a blind_play game and update the rating"""
+    cursor = await db.execute(
+        """INSERT INTO games (user_id, game_type, result, moves, duration)
+           VALUES (?, ?, ?, ?, ?)""",
+        (session.user_id, "blind_play", session.result, session.movetext(), session.duration())
+    )
+    rating_change = GAME_RATING_CHANGES.get(session.result, 0)
+    if rating_change != 0:
+        await record_rating_change(db, session.user_id, rating_change,
+                                   f"blind_play - {session.result}")
+    return cursor.lastrowid
+
+async def finish(session):
+    """
+    Move a finished session from the active sessions into games. Returns None if
+    another message, on any worker, already ended or moved it, so each game is
+    saved exactly once.
+    """
+    async with write_pool.connection() as db:
+        if not await sessions.claim(db, session):
+            return None
+        state = session.snapshot()
+        state["saved_game_id"] = await save_game(db, session)
+        await db.commit()
+    return state
+
+async def engine_reply(session):
+    """Ask the engine pool for the opponent's move, or None to fall back to a random one"""
+    try:
+        result = await engine_pool.search_level(session.board.fen(), session.level,
+                                                history=session.recent_keys)
+    except Exception as e:
+        print(f"Engine search failed, playing a random move instead: {e}")
+        return None
+    return result.move
+
+async def handle_message(user: dict, message: dict) -> dict:
+    """Apply one client message and build the reply"""
+    kind = message.get("type")
+    if kind == "new":
+        try:
+            level = int(message.get("level", DEFAULT_ENGINE_LEVEL))
+        except (TypeError, ValueError):
+            level = None
+        if level not in ENGINE_LEVELS:
+            raise ValueError(f"Level must be between {min(ENGINE_LEVELS)} and {max(ENGINE_LEVELS)}")
+        session = await sessions.create(user["id"], level)
+        return {"type": "started", "game": session.snapshot()}
+    if kind == "list":
+        return {"type": "games", "games": [s.snapshot(include_moves=False)
+                                           for s in await sessions.for_user(user["id"])]}
+
+    game_id = message.get("game_id")
+    session = await sessions.get(game_id, user["id"]) if game_id else None
+    if session is None:
+        raise ValueError("Game not found")
+
+    if kind == "resume":
+        return {"type": "state", "game": session.snapshot()}
+    if kind == "move":
+        san = session.play(str(message.get("move", "")))
+        reply = None
+        if not session.finished:
+            move = await engine_reply(session)
+            # The search ran off the event loop, so another message may have
+            # resigned the game in the meantime
+            if session.finished:
+                return {"type": "ended", "game_id": game_id, "game": session.snapshot()}
+            reply = session.reply(move)
+        response = {"type": "moved", "game_id": game_id, "move": san, "reply": reply,
+                    "game": session.snapshot(include_moves=False)}
+        if session.finished:
+            # If another worker got there first the game is already stored
+            response["game"] = await finish(session) or response["game"]
+        else:
+            # Raises if another connection ended or moved the game meanwhile
+            await sessions.save(session)
+        return response
+    if kind == "resign":
+        session.resign()
+        state = await finish(session)
+        return {"type": "ended", "game_id": game_id, "game": state or session.snapshot()}
+    raise ValueError(f"Unknown message type: {kind}")
+
+@router.websocket("/ws")
+async def blind_play_socket(websocket: WebSocket, token: str = ""):
+    """
+    Blind-play games hosted on the server. Authenticate with ?token=<JWT>, then
+    exchange JSON messages: {"type": "new", "level": 1-5}, {"type": "list"},
+    {"type": "resume", "game_id"}, {"type": "move", "game_id", "move"} and
+    {"type": "resign", "game_id"}. Games are stored, so any worker can resume them.
+    """
+    async with read_pool.connection() as db:
+        user = await get_user_from_token(token, db)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    try:
+        while True:
+            text = await websocket.receive_text()
+            message = None
+            try:
+                try:
+                    message = json.loads(text)
+                except json.JSONDecodeError:
+                    raise ValueError("Messages must be valid JSON")
+                if not isinstance(message, dict):
+                    raise ValueError("Messages must be JSON objects")
+                response = await handle_message(user, message)
+            except ValueError as e:
+                response = {"type": "error", "detail": str(e)}
+                if isinstance(message, dict) and message.get("game_id"):
+                    response["game_id"] = message["game_id"]
+            await websocket.send_json(response)
+    except WebSocketDisconnect:
+        # Sessions outlive the connection so the client can reconnect and resume
+        pass
@@ -1,20 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from app.models.schemas import Category, CategoryCreate
 from app.routers.auth import get_current_admin_user
-from app.database.database import get_db
+from app.database.pool import get_read_db, get_write_db, write_pool
+from app.database.cache import SharedCache, invalidate
+from app.database.bulk import BULK_BATCH_SIZE, apply_bulk, read_items, table_handlers
 from typing import List
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
+categories_cache = SharedCache("categories")
+CATEGORY_BULK_HANDLERS = table_handlers("categories", CategoryCreate)
+
 @router.get("/", response_model=List[dict])
-async def get_categories(db = Depends(get_db)):
+async def get_categories(db = Depends(get_read_db)):
     """Get all categories"""
-    cursor = await db.execute("SELECT * FROM categories ORDER BY name")
-    categories = await cursor.fetchall()
-    return [dict(cat) for cat in categories]
+    async def load():
+        cursor = await db.execute("SELECT * FROM categories ORDER BY name")
+        categories = await cursor.fetchall()
+        return [dict(cat) for cat in categories]
+    return await categories_cache.get_or_load("all", load)
 
 @router.get("/{category_id}", response_model=dict)
-async def get_category(category_id: int, db = Depends(get_db)):
+async def get_category(category_id: int, db = Depends(get_read_db)):
     """Get a specific category"""
     cursor = await db.execute("SELECT * FROM categories WHERE id = ?", (category_id,))
     category = await cursor.fetchone()
@@ -23,31 +30,46 @@ async def get_category(category_id: int, db = Depends(get_db)):
     return dict(category)
 
 @router.post("/", response_model=dict)
-async def create_category(category: CategoryCreate, db = Depends(get_db),
-                         current_user: dict = Depends(get_current_admin_user)):
+async def create_category(category: CategoryCreate,
+                          current_user: dict = Depends(get_current_admin_user),
+                          db = Depends(get_write_db)):
     """Create a new category (admin only)"""
     cursor = await db.execute(
         "INSERT INTO categories (name, description) VALUES (?, ?)",
         (category.name, category.description)
     )
     await db.commit()
+    await invalidate(db, "categories", "courses")
     return {"message": "Category created", "id": cursor.lastrowid}
 
 @router.put("/{category_id}", response_model=dict)
-async def update_category(category_id: int, category: CategoryCreate, db = Depends(get_db),
-                         current_user: dict = Depends(get_current_admin_user)):
+async def update_category(category_id: int, category: CategoryCreate,
+                          current_user: dict = Depends(get_current_admin_user),
+                          db = Depends(get_write_db)):
     """Update a category (admin only)"""
     await db.execute(
         "UPDATE categories SET name = ?, description = ? WHERE id = ?",
         (category.name, category.description, category_id)
     )
     await db.commit()
+    await invalidate(db, "categories", "courses")
     return {"message": "Category updated"}
 
 @router.delete("/{category_id}", response_model=dict)
-async def delete_category(category_id: int, db = Depends(get_db),
-                         current_user: dict = Depends(get_current_admin_user)):
+async def delete_category(category_id: int, current_user: dict = Depends(get_current_admin_user),
+                         db = Depends(get_write_db)):
     """Delete a category (admin only)"""
     await db.execute("DELETE FROM categories WHERE id = ?", (category_id,))
     await db.commit()
+    await invalidate(db, "categories", "courses")
     return {"message": "Category deleted"}
+
+@router.post("/bulk", response_model=dict)
+async def bulk_categories(request: Request, batch_size: int = BULK_BATCH_SIZE, atomic: bool = False,
+                          current_user: dict = Depends(get_current_admin_user)):
+    """Create, update, upsert or delete many categories from a JSON array or NDJSON (admin only)"""
+    report = await apply_bulk(read_items(request), CATEGORY_BULK_HANDLERS, batch_size, atomic)
+    if report["succeeded"]:
+        async with write_pool.connection() as db:
+            await invalidate(db, "categories", "courses")
+    return report
@@ -1,25 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException
+import sqlite3
+from fastapi import APIRouter, Depends, HTTPException, Request
 from app.models.schemas import Course, CourseCreate, Purchase, PurchaseCreate
-from app.routers.auth import get_current_user, get_current_admin_user
-from app.database.database import get_db
+from app.routers.auth import get_current_user, get_current_admin_user, get_optional_user
+from app.entitlements import owned_course_ids, owns, grant_course
+from app.database.pool import get_read_db, get_write_db, write_pool
+from app.database.cache import SharedCache, invalidate
+from app.database.bulk import BULK_BATCH_SIZE, apply_bulk, read_items, table_handlers
 from typing import List
 
 router = APIRouter(prefix="/courses", tags=["courses"])
 
+courses_cache = SharedCache("courses")
+COURSE_BULK_HANDLERS = table_handlers("courses", CourseCreate)
+
 @router.get("/", response_model=List[dict])
-async def get_courses(db = Depends(get_db)):
-    """Get all courses"""
-    cursor = await db.execute("""
-        SELECT c.*, cat.name as category_name 
-        FROM courses c
-        LEFT JOIN categories cat ON c.category_id = cat.id
-        ORDER BY c.created_at DESC
-    """)
-    courses = await cursor.fetchall()
-    return [dict(course) for course in courses]
+async def get_courses(current_user: dict = Depends(get_optional_user), db = Depends(get_read_db)):
+    """Get all courses, marking the ones the current user owns"""
+    async def load():
+        cursor = await db.execute("""
+            SELECT c.*, cat.name as category_name 
+            FROM courses c
+            LEFT JOIN categories cat ON c.category_id = cat.id
+            ORDER BY c.created_at DESC
+        """)
+        courses = await cursor.fetchall()
+        return [dict(course) for course in courses]
+    courses = await courses_cache.get_or_load("all", load)
+    if current_user is None:
+        return courses
+    # Copy the cached rows so the owned flags don't leak into other users' responses
+    owned = await owned_course_ids(db, current_user["id"])
+    return [{**course, "owned": owns(owned, course["id"])} for course in courses]
 
 @router.get("/{course_id}", response_model=dict)
-async def get_course(course_id: int, db = Depends(get_db)):
+async def get_course(course_id: int, db = Depends(get_read_db)):
     """Get a specific course"""
     cursor = await db.execute("""
         SELECT c.*, cat.name as category_name 
@@ -33,8 +47,8 @@ async def get_course(course_id: int, db = Depends(get_db)):
     return dict(course)
 
 @router.post("/", response_model=dict)
-async def create_course(course: CourseCreate, db = Depends(get_db), 
-                        current_user: dict = Depends(get_current_admin_user)):
+async def create_course(course: CourseCreate, current_user: dict = Depends(get_current_admin_user),
+                        db = Depends(get_write_db)):
     """Create a new course (admin only)"""
     cursor = await db.execute(
         """INSERT INTO courses (title, description, price, category_id, difficulty) 
@@ -42,11 +56,13 @@ async def create_course(course: CourseCreate, db = Depends(get_db),
         (course.title, course.description, course.price, course.category_id, course.difficulty)
     )
     await db.commit()
+    await invalidate(db, "courses")
     return {"message": "Course created", "id": cursor.lastrowid}
 
 @router.put("/{course_id}", response_model=dict)
-async def update_course(course_id: int, course: CourseCreate, db = Depends(get_db),
-                        current_user: dict = Depends(get_current_admin_user)):
+async def update_course(course_id: int, course: CourseCreate,
+                        current_user: dict = Depends(get_current_admin_user),
+                        db = Depends(get_write_db)):
     """Update a course (admin only)"""
     await db.execute(
         """UPDATE courses 
@@ -56,51 +72,72 @@ async def update_course(course_id: int, course: CourseCreate, db = Depends(get_d
          course.difficulty, course_id)
     )
     await db.commit()
+    await invalidate(db, "courses")
     return {"message": "Course updated"}
 
 @router.delete("/{course_id}", response_model=dict)
-async def delete_course(course_id: int, db = Depends(get_db),
-                        current_user: dict = Depends(get_current_admin_user)):
+async def delete_course(course_id: int, current_user: dict = Depends(get_current_admin_user),
+                        db = Depends(get_write_db)):
     """Delete a course (admin only)"""
     await db.execute("DELETE FROM courses WHERE id = ?", (course_id,))
     await db.commit()
+    await invalidate(db, "courses")
     return {"message": "Course deleted"}
 
+@router.post("/bulk", response_model=dict)
+async def bulk_courses(request: Request, batch_size: int = BULK_BATCH_SIZE, atomic: bool = False,
+                       current_user: dict = Depends(get_current_admin_user)):
+    """Create, update, upsert or delete many courses from a JSON array or NDJSON (admin only)"""
+    report = await apply_bulk(read_items(request), COURSE_BULK_HANDLERS, batch_size, atomic)
+    if report["succeeded"]:
+        async with write_pool.connection() as db:
+            await invalidate(db, "courses")
+    return report
+
 @router.post("/purchase/{course_id}", response_model=dict)
-async def purchase_course(course_id: int, db = Depends(get_db),
-                         current_user: dict = Depends(get_current_user)):
+async def purchase_course(course_id: int, current_user: dict = Depends(get_current_user),
+                         db = Depends(get_write_db)):
     """Purchase a course"""
-    # Check if course exists
-    cursor = await db.execute("SELECT * FROM courses WHERE id = ?", (course_id,))
-    course = await cursor.fetchone()
-    if not course:
-        raise HTTPException(status_code=404, detail="Course not found")
-    
-    # Check if already purchased
-    cursor = await db.execute(
-        "SELECT * FROM purchases WHERE user_id = ? AND course_id = ?",
-        (current_user["id"], course_id)
-    )
-    if await cursor.fetchone():
+    owned = await owned_course_ids(db, current_user["id"])
+    if owns(owned, course_id):
         raise HTTPException(status_code=400, detail="Course already purchased")
     
-    # Create purchase
-    cursor = await db.execute(
-        "INSERT INTO purchases (user_id, course_id, amount) VALUES (?, ?, ?)",
-        (current_user["id"], course_id, course["price"])
-    )
+    # The unique index on (user_id, course_id) rejects concurrent duplicate purchases
+    try:
+        cursor = await db.execute(
+            """INSERT INTO purchases (user_id, course_id, amount)
+               SELECT ?, id, price FROM courses WHERE id = ?""",
+            (current_user["id"], course_id)
+        )
+    except sqlite3.IntegrityError:
+        raise HTTPException(status_code=400, detail="Course already purchased")
+    if cursor.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Course not found")
     await db.commit()
+    await grant_course(db, current_user["id"], course_id)
     return {"message": "Course purchased successfully", "purchase_id": cursor.lastrowid}
 
-@router.get("/my/purchases", response_model=List[dict])
-async def get_my_purchases(db = Depends(get_db), current_user: dict = Depends(get_current_user)):
-    """Get user's purchased courses"""
+@router.get("/my/owned", response_model=dict)
+async def get_my_owned_courses(current_user: dict = Depends(get_current_user), db = Depends(get_read_db)):
+    """Get the ids of the user's purchased courses"""
+    owned = await owned_course_ids(db, current_user["id"])
+    return {"course_ids": owned.tolist()}
+
+async def fetch_purchases(db, user_id: int) -> list:
+    """A user's purchased courses, newest purchase first"""
+    if not await owned_course_ids(db, user_id):
+        return []
     cursor = await db.execute("""
         SELECT c.*, p.purchased_at, p.amount
         FROM purchases p
         JOIN courses c ON p.course_id = c.id
         WHERE p.user_id = ?
         ORDER BY p.purchased_at DESC
-    """, (current_user["id"],))
+    """, (user_id,))
     purchases = await cursor.fetchall()
     return [dict(purchase) for purchase in purchases]
+
+@router.get("/my/purchases", response_model=List[dict])
+async def get_my_purchases(current_user: dict = Depends(get_current_user), db = Depends(get_read_db)):
+    """Get user's purchased courses"""
+    return await fetch_purchases(db, current_user["id"])
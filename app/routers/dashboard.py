@@ -0,0 +1,52 @@
+import asyncio
+import os
+from fastapi import APIRouter, Depends
+from app.routers.auth import get_current_user
+from app.routers.courses import fetch_purchases
+from app.routers.games import fetch_game_stats, fetch_recent_games
+from app.routers.puzzles import fetch_recent_attempts
+from app.ratings import fetch_rating_trend
+from app.database.pool import read_pool
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+# Seconds a summary section may take before it is reported as failed
+DASHBOARD_SECTION_TIMEOUT = float(os.getenv("DASHBOARD_SECTION_TIMEOUT", "2.0"))
+RECENT_ITEMS = 5
+RATING_TREND_DAYS = 30
+
+@router.get("/summary", response_model=dict)
+async def get_summary(current_user: dict = Depends(get_current_user)):
+    """
+    Everything the dashboard shows in one response. Sections are queried
+    concurrently, each on its own pooled read connection; a section that fails
+    or times out is returned as null and listed in `errors` instead of failing
+    the whole summary.
+    """
+    user_id = current_user["id"]
+    sections = {
+        "stats": lambda db: fetch_game_stats(db, user_id),
+        "recent_games": lambda db: fetch_recent_games(db, user_id, RECENT_ITEMS),
+        "recent_attempts": lambda db: fetch_recent_attempts(db, user_id, RECENT_ITEMS),
+        "purchases": lambda db: fetch_purchases(db, user_id),
+        "rating_trend": lambda db: fetch_rating_trend(db, user_id, RATING_TREND_DAYS),
+    }
+
+    async def load(loader):
+        async with read_pool.connection() as db:
+            return await loader(db)
+
+    results = await asyncio.gather(
+        *(asyncio.wait_for(load(loader), DASHBOARD_SECTION_TIMEOUT) for loader in sections.values()),
+        return_exceptions=True
+    )
+    summary = {"user": {key: current_user[key] for key in ("id", "username", "rating")}, "errors": {}}
+    for name, result in zip(sections, results):
+        if isinstance(result, Exception):
+            error = "Timed out" if isinstance(result, asyncio.TimeoutError) else "Failed to load"
+            print(f"Dashboard section {name} failed for user {user_id}: {result!r}")
+            summary[name] = None
+            summary["errors"][name] = error
+        else:
+            summary[name] = result
+    return summary
@@ -1,26 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.models.schemas import Puzzle, PuzzleCreate, PuzzleAttempt, PuzzleAttemptBase
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from app.models.schemas import Puzzle, PuzzleCreate, PuzzleAttempt, PuzzleAttemptSubmit
 from app.routers.auth import get_current_user, get_current_admin_user
-from app.database.database import get_db
+from app.ratings import PUZZLE_SOLVED_RATING_CHANGE, record_rating_change
+from app.review import schedule_review
+from app.database.pool import get_read_db, get_write_db, write_pool
+from app.database.cache import SharedCache, invalidate
+from app.chess.board import Board, WHITE, BLACK
+from app.chess.notation import solution_matches
+from app.chess.render import (DEFAULT_SIZE, MAX_SIZE, MEDIA_TYPES, MIN_SIZE, board_image,
+                              etag_matches, image_key, parse_highlight)
+from app.database.bulk import BULK_BATCH_SIZE, apply_bulk, read_items, table_handlers
 from typing import List
 
 router = APIRouter(prefix="/puzzles", tags=["puzzles"])
 
+# Holds the puzzle lists plus each puzzle's FEN for board images
+puzzles_cache = SharedCache("puzzles", maxsize=4096)
+PUZZLE_BULK_HANDLERS = table_handlers("puzzles", PuzzleCreate)
+# Board images are revalidated with their ETag after this many seconds
+BOARD_IMAGE_MAX_AGE = 300
+
 @router.get("/", response_model=List[dict])
-async def get_puzzles(difficulty: str = None, db = Depends(get_db)):
+async def get_puzzles(difficulty: str = None, db = Depends(get_read_db)):
     """Get all puzzles, optionally filtered by difficulty"""
-    if difficulty:
-        cursor = await db.execute(
-            "SELECT * FROM puzzles WHERE difficulty = ? ORDER BY rating",
-            (difficulty,)
-        )
-    else:
-        cursor = await db.execute("SELECT * FROM puzzles ORDER BY rating")
+    async def load():
+        if difficulty:
+            cursor = await db.execute(
+                "SELECT * FROM puzzles WHERE difficulty = ? ORDER BY rating",
+                (difficulty,)
+            )
+        else:
+            cursor = await db.execute("SELECT * FROM puzzles ORDER BY rating")
+        puzzles = await cursor.fetchall()
+        return [dict(puzzle) for puzzle in puzzles]
+    return await puzzles_cache.get_or_load(difficulty or "all", load)
+
+@router.get("/review", response_model=List[dict])
+async def get_review_puzzles(limit: int = 20, current_user: dict = Depends(get_current_user),
+                             db = Depends(get_read_db)):
+    """Get the user's failed puzzles that are due for review, most overdue first"""
+    cursor = await db.execute("""
+        SELECT p.*, rq.due_at, rq.repetitions, rq.interval_days, rq.lapses
+        FROM review_queue rq
+        JOIN puzzles p ON p.id = rq.puzzle_id
+        WHERE rq.user_id = ? AND rq.due_at <= CURRENT_TIMESTAMP
+        ORDER BY rq.due_at
+        LIMIT ?
+    """, (current_user["id"], limit))
     puzzles = await cursor.fetchall()
     return [dict(puzzle) for puzzle in puzzles]
 
 @router.get("/{puzzle_id}", response_model=dict)
-async def get_puzzle(puzzle_id: int, db = Depends(get_db)):
+async def get_puzzle(puzzle_id: int, db = Depends(get_read_db)):
     """Get a specific puzzle"""
     cursor = await db.execute("SELECT * FROM puzzles WHERE id = ?", (puzzle_id,))
     puzzle = await cursor.fetchone()
@@ -28,9 +59,55 @@ async def get_puzzle(puzzle_id: int, db = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Puzzle not found")
     return dict(puzzle)
 
+@router.get("/{puzzle_id}/board.{image_format}")
+async def get_puzzle_board(puzzle_id: int, image_format: str, request: Request,
+                           orientation: str = None, last_move: str = None,
+                           size: int = DEFAULT_SIZE, db = Depends(get_read_db)):
+    """
+    Render the puzzle position as SVG or PNG. The board faces the side to move
+    unless orientation is white or black; last_move (UCI) highlights two squares.
+    """
+    if image_format not in MEDIA_TYPES:
+        raise HTTPException(status_code=404, detail="Not found")
+    if orientation not in (None, "white", "black"):
+        raise HTTPException(status_code=400, detail="orientation must be white or black")
+    if not MIN_SIZE <= size <= MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"size must be between {MIN_SIZE} and {MAX_SIZE}")
+
+    async def load():
+        cursor = await db.execute("SELECT fen FROM puzzles WHERE id = ?", (puzzle_id,))
+        row = await cursor.fetchone()
+        return row["fen"] if row else None
+    fen = await puzzles_cache.get_or_load(("fen", puzzle_id), load)
+    if fen is None:
+        raise HTTPException(status_code=404, detail="Puzzle not found")
+    try:
+        board = Board(fen)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Puzzle has an invalid FEN: {e}")
+    try:
+        highlight = parse_highlight(last_move) if last_move else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if orientation is None:
+        side = board.turn
+    else:
+        side = WHITE if orientation == "white" else BLACK
+
+    # The ETag is the image's content key, so revalidation never needs the image
+    etag = f'"{image_key(board, side, highlight, size, image_format)}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={BOARD_IMAGE_MAX_AGE}"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    try:
+        image = await board_image(board, side, highlight, size, image_format)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return Response(image, media_type=MEDIA_TYPES[image_format], headers=headers)
+
 @router.post("/", response_model=dict)
-async def create_puzzle(puzzle: PuzzleCreate, db = Depends(get_db),
-                        current_user: dict = Depends(get_current_admin_user)):
+async def create_puzzle(puzzle: PuzzleCreate, current_user: dict = Depends(get_current_admin_user),
+                        db = Depends(get_write_db)):
     """Create a new puzzle (admin only)"""
     cursor = await db.execute(
         """INSERT INTO puzzles (title, fen, solution, difficulty, category_id, rating)
@@ -39,11 +116,13 @@ async def create_puzzle(puzzle: PuzzleCreate, db = Depends(get_db),
          puzzle.category_id, puzzle.rating)
     )
     await db.commit()
+    await invalidate(db, "puzzles")
     return {"message": "Puzzle created", "id": cursor.lastrowid}
 
 @router.put("/{puzzle_id}", response_model=dict)
-async def update_puzzle(puzzle_id: int, puzzle: PuzzleCreate, db = Depends(get_db),
-                        current_user: dict = Depends(get_current_admin_user)):
+async def update_puzzle(puzzle_id: int, puzzle: PuzzleCreate,
+                        current_user: dict = Depends(get_current_admin_user),
+                        db = Depends(get_write_db)):
     """Update a puzzle (admin only)"""
     await db.execute(
         """UPDATE puzzles 
@@ -53,50 +132,73 @@ async def update_puzzle(puzzle_id: int, puzzle: PuzzleCreate, db = Depends(get_d
          puzzle.category_id, puzzle.rating, puzzle_id)
     )
     await db.commit()
+    await invalidate(db, "puzzles")
     return {"message": "Puzzle updated"}
 
 @router.delete("/{puzzle_id}", response_model=dict)
-async def delete_puzzle(puzzle_id: int, db = Depends(get_db),
-                        current_user: dict = Depends(get_current_admin_user)):
+async def delete_puzzle(puzzle_id: int, current_user: dict = Depends(get_current_admin_user),
+                        db = Depends(get_write_db)):
     """Delete a puzzle (admin only)"""
     await db.execute("DELETE FROM puzzles WHERE id = ?", (puzzle_id,))
     await db.commit()
+    await invalidate(db, "puzzles")
     return {"message": "Puzzle deleted"}
 
+@router.post("/bulk", response_model=dict)
+async def bulk_puzzles(request: Request, batch_size: int = BULK_BATCH_SIZE, atomic: bool = False,
+                       current_user: dict = Depends(get_current_admin_user)):
+    """Create, update, upsert or delete many puzzles from a JSON array or NDJSON (admin only)"""
+    report = await apply_bulk(read_items(request), PUZZLE_BULK_HANDLERS, batch_size, atomic)
+    if report["succeeded"]:
+        async with write_pool.connection() as db:
+            await invalidate(db, "puzzles")
+    return report
+
 @router.post("/attempt", response_model=dict)
-async def submit_puzzle_attempt(attempt: PuzzleAttemptBase, db = Depends(get_db),
-                                current_user: dict = Depends(get_current_user)):
-    """Submit a puzzle attempt"""
+async def submit_puzzle_attempt(attempt: PuzzleAttemptSubmit,
+                                current_user: dict = Depends(get_current_user),
+                                db = Depends(get_write_db)):
+    """Submit a puzzle attempt; with `answer`, the server checks it against the full solution"""
+    success = attempt.success
+    if attempt.answer is not None:
+        cursor = await db.execute("SELECT fen, solution FROM puzzles WHERE id = ?", (attempt.puzzle_id,))
+        puzzle = await cursor.fetchone()
+        if puzzle is None:
+            raise HTTPException(status_code=404, detail="Puzzle not found")
+        success = solution_matches(puzzle["fen"], puzzle["solution"], attempt.answer)
+
     cursor = await db.execute(
-        """INSERT INTO puzzle_attempts (user_id, puzzle_id, success, time_taken)
-           VALUES (?, ?, ?, ?)""",
-        (current_user["id"], attempt.puzzle_id, attempt.success, attempt.time_taken)
+        """INSERT INTO puzzle_attempts (user_id, puzzle_id, success, time_taken, user_rating)
+           VALUES (?, ?, ?, ?, ?)""",
+        (current_user["id"], attempt.puzzle_id, success, attempt.time_taken,
+         current_user["rating"])
     )
-    await db.commit()
+    review_due_at = await schedule_review(db, current_user["id"], attempt.puzzle_id,
+                                          success, attempt.time_taken)
     
     # Update user rating if successful
-    if attempt.success:
-        new_rating = current_user["rating"] + 10
-        await db.execute("UPDATE users SET rating = ? WHERE id = ?",
-                        (new_rating, current_user["id"]))
-        await db.execute(
-            "INSERT INTO rating_history (user_id, rating, change, reason) VALUES (?, ?, ?, ?)",
-            (current_user["id"], new_rating, 10, f"Solved puzzle {attempt.puzzle_id}")
-        )
-        await db.commit()
+    if success:
+        await record_rating_change(db, current_user["id"], PUZZLE_SOLVED_RATING_CHANGE,
+                                   f"Solved puzzle {attempt.puzzle_id}")
+    await db.commit()
     
-    return {"message": "Attempt recorded", "success": attempt.success}
+    return {"message": "Attempt recorded", "success": success,
+            "review_due_at": review_due_at}
 
-@router.get("/my/attempts", response_model=List[dict])
-async def get_my_attempts(db = Depends(get_db), current_user: dict = Depends(get_current_user)):
-    """Get user's puzzle attempts"""
+async def fetch_recent_attempts(db, user_id: int, limit: int = 50) -> list:
+    """A user's most recent puzzle attempts with the puzzle title and difficulty"""
     cursor = await db.execute("""
         SELECT pa.*, p.title as puzzle_title, p.difficulty
         FROM puzzle_attempts pa
         JOIN puzzles p ON pa.puzzle_id = p.id
         WHERE pa.user_id = ?
         ORDER BY pa.created_at DESC
-        LIMIT 50
-    """, (current_user["id"],))
+        LIMIT ?
+    """, (user_id, limit))
     attempts = await cursor.fetchall()
     return [dict(attempt) for attempt in attempts]
+
+@router.get("/my/attempts", response_model=List[dict])
+async def get_my_attempts(current_user: dict = Depends(get_current_user), db = Depends(get_read_db)):
+    """Get user's puzzle attempts"""
+    return await fetch_recent_attempts(db, current_user["id"])
@@ -0,0 +1,128 @@
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import ValidationError
+from app.models.schemas import SyncAttempt, SyncGame, SyncRequest
+from app.routers.auth import get_current_user
+from app.ratings import GAME_RATING_CHANGES, PUZZLE_SOLVED_RATING_CHANGE, record_rating_change
+from app.review import schedule_review
+from app.database.pool import get_write_db
+from app.database.bulk import BulkItemError, describe_error
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+# Items accepted in one sync request
+SYNC_MAX_ITEMS = int(os.getenv("SYNC_MAX_ITEMS", "500"))
+
+SYNC_ITEM_TYPES = {"attempt": SyncAttempt, "game": SyncGame}
+
+def _timestamp(occurred_at: datetime, now: datetime) -> str:
+    """Client time as a UTC database timestamp, never later than now"""
+    if occurred_at is None:
+        moment = now
+    else:
+        if occurred_at.tzinfo is None:
+            occurred_at = occurred_at.replace(tzinfo=timezone.utc)
+        moment = min(occurred_at.astimezone(timezone.utc), now)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+async def _apply_attempt(db, user: dict, item: SyncAttempt, created_at: str, rating: int):
+    cursor = await db.execute("SELECT id FROM puzzles WHERE id = ?", (item.puzzle_id,))
+    if await cursor.fetchone() is None:
+        raise BulkItemError("Puzzle not found")
+    cursor = await db.execute(
+        """INSERT INTO puzzle_attempts (user_id, puzzle_id, success, time_taken, user_rating, created_at)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        (user["id"], item.puzzle_id, item.success, item.time_taken, rating, created_at)
+    )
+    attempt_id = cursor.lastrowid
+    review_due_at = await schedule_review(db, user["id"], item.puzzle_id, item.success, item.time_taken)
+    change = PUZZLE_SOLVED_RATING_CHANGE if item.success else 0
+    return {"id": attempt_id, "review_due_at": review_due_at}, change
+
+async def _apply_game(db, user: dict, item: SyncGame, created_at: str, rating: int):
+    cursor = await db.execute(
+        """INSERT INTO games (user_id, game_type, result, moves, duration, created_at)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        (user["id"], item.game_type, item.result, item.moves, item.duration, created_at)
+    )
+    return {"id": cursor.lastrowid}, GAME_RATING_CHANGES.get(item.result, 0)
+
+SYNC_HANDLERS = {"attempt": _apply_attempt, "game": _apply_game}
+
+@router.post("/", response_model=dict)
+async def sync_items(request: SyncRequest, current_user: dict = Depends(get_current_user),
+                     db = Depends(get_write_db)):
+    """
+    Apply puzzle attempts and games recorded offline, in order, in one
+    transaction. Each item carries an idempotency `key`: items already applied
+    are reported as duplicates with their original result, so retrying a sync
+    never counts anything twice. Rating changes are summed and applied once.
+    """
+    if len(request.items) > SYNC_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {SYNC_MAX_ITEMS} items per sync")
+    user_id = current_user["id"]
+    now = datetime.now(timezone.utc)
+    results = []
+    applied = duplicates = failed = 0
+    rating_change = 0
+    rating = current_user["rating"]
+
+    await db.execute("BEGIN IMMEDIATE")
+    try:
+        for index, raw in enumerate(request.items):
+            fields = raw if isinstance(raw, dict) else {}
+            result = {"index": index, "key": fields.get("key"), "type": fields.get("type")}
+            results.append(result)
+            try:
+                if not isinstance(raw, dict):
+                    raise BulkItemError("Each item must be a JSON object")
+                model = SYNC_ITEM_TYPES.get(raw.get("type"))
+                if model is None:
+                    raise BulkItemError(f"type must be one of: {', '.join(SYNC_ITEM_TYPES)}")
+                item = model.model_validate(raw)
+            except (BulkItemError, ValidationError) as e:
+                result.update(status="error", error=describe_error(e))
+                failed += 1
+                continue
+
+            cursor = await db.execute(
+                "SELECT result FROM sync_receipts WHERE user_id = ? AND key = ?", (user_id, item.key))
+            receipt = await cursor.fetchone()
+            if receipt is not None:
+                result.update(json.loads(receipt[0]), status="duplicate")
+                duplicates += 1
+                continue
+
+            await db.execute("SAVEPOINT sync_item")
+            try:
+                outcome, change = await SYNC_HANDLERS[item.type](
+                    db, current_user, item, _timestamp(item.occurred_at, now), rating)
+                await db.execute(
+                    "INSERT INTO sync_receipts (user_id, key, result) VALUES (?, ?, ?)",
+                    (user_id, item.key, json.dumps(outcome))
+                )
+            except (BulkItemError, sqlite3.Error) as e:
+                await db.execute("ROLLBACK TO sync_item")
+                await db.execute("RELEASE sync_item")
+                result.update(status="error", error=describe_error(e))
+                failed += 1
+                continue
+            await db.execute("RELEASE sync_item")
+            result.update(outcome, status="ok")
+            applied += 1
+            rating_change += change
+            rating = max(0, rating + change)
+
+        # One rating update for the whole batch instead of one per item
+        if rating_change:
+            rating = await record_rating_change(db, user_id, rating_change,
+                                                f"Offline sync ({applied} items)")
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+    return {"applied": applied, "duplicates": duplicates, "failed": failed,
+            "rating": rating, "rating_change": rating_change, "results": results}
@@ -0,0 +1,41 @@
+import time
+from contextlib import contextmanager
+
+class StartupReport:
+    """Collects how long each boot phase takes so slow starts can be diagnosed"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a named startup phase"""
+        phase_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - phase_start))
+
+    def mark(self, name: str, since: float):
+        """Record a phase that started at `since` and ends now"""
+        self.phases.append((name, time.perf_counter() - since))
+
+    def as_dict(self) -> dict:
+        """Phase timings in milliseconds"""
+        return {
+            "phases": {name: round(seconds * 1000, 2) for name, seconds in self.phases},
+            "total_ms": round((time.perf_counter() - self.started_at) * 1000, 2),
+        }
+
+    def render(self) -> str:
+        """Human-readable breakdown for the startup log"""
+        report = self.as_dict()
+        lines = ["Startup report:"]
+        for name, ms in report["phases"].items():
+            lines.append(f"  {name:<20} {ms:>9.2f} ms")
+        lines.append(f"  {'total':<20} {report['total_ms']:>9.2f} ms")
+        return "\n".join(lines)
+
+# Created at first import so module loading is part of the measured time
+startup_report = StartupReport()
@@ -0,0 +1,136 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from fastapi import HTTPException, Request, status
+from starlette.concurrency import run_in_threadpool
+from app.metrics import register_metrics
+
+# Allowed attempts per minute; 0 disables a limit
+LOGIN_ATTEMPTS_PER_MINUTE_IP = float(os.getenv("LOGIN_ATTEMPTS_PER_MINUTE_IP", "20"))
+LOGIN_ATTEMPTS_PER_MINUTE_USER = float(os.getenv("LOGIN_ATTEMPTS_PER_MINUTE_USER", "10"))
+REGISTRATIONS_PER_MINUTE_IP = float(os.getenv("REGISTRATIONS_PER_MINUTE_IP", "5"))
+# bcrypt calls allowed to run at once, and how long a request may queue for one
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", "2"))
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "2.0"))
+
+# Keys tracked per limiter before the least recently seen are forgotten
+MAX_TRACKED_KEYS = 10000
+
+def too_many_requests(retry_after: float, detail: str = "Too many requests, try again later"):
+    """Build a 429 error telling the client when to retry"""
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+def client_ip(request: Request) -> str:
+    """Address of the connecting client"""
+    return request.client.host if request.client else "unknown"
+
+class RateLimiter:
+    """
+    In-memory token buckets, one per key. Each bucket holds up to `burst`
+    tokens and refills at `per_minute` tokens a minute.
+    """
+
+    def __init__(self, name: str, per_minute: float, burst: int = None,
+                 max_keys: int = MAX_TRACKED_KEYS):
+        self.name = name
+        self.rate = per_minute / 60
+        self.burst = burst or max(1, int(per_minute))
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+
+    def hit(self, key: str) -> float:
+        """Take a token for `key`. Returns 0 if allowed, otherwise seconds until a token is free"""
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        retry_after = 0
+        if tokens >= 1:
+            tokens -= 1
+            self.allowed += 1
+        else:
+            retry_after = (1 - tokens) / self.rate
+            self.rejected += 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+    def check(self, key: str):
+        """Take a token for `key` or raise a 429"""
+        retry_after = self.hit(key)
+        if retry_after:
+            raise too_many_requests(retry_after)
+
+    def stats(self) -> dict:
+        return {
+            "per_minute": round(self.rate * 60, 2),
+            "burst": self.burst,
+            "tracked_keys": len(self._buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
+
+class HashingGate:
+    """
+    Caps how many password hashes run at once. Hashing runs in the threadpool
+    (bcrypt releases the GIL), and requests that can't get a slot within
+    `queue_timeout` seconds are shed with a 429 instead of piling up.
+    """
+
+    def __init__(self, concurrency: int = PASSWORD_HASH_CONCURRENCY,
+                 queue_timeout: float = PASSWORD_HASH_QUEUE_TIMEOUT):
+        self.concurrency = max(1, concurrency)
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, func, *args):
+        """Run a CPU-heavy password function once a slot is free"""
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise too_many_requests(self.queue_timeout, "Server is busy, try again later")
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            return await run_in_threadpool(func, *args)
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+login_ip_limiter = RateLimiter("login_ip", LOGIN_ATTEMPTS_PER_MINUTE_IP)
+login_user_limiter = RateLimiter("login_user", LOGIN_ATTEMPTS_PER_MINUTE_USER)
+register_ip_limiter = RateLimiter("register_ip", REGISTRATIONS_PER_MINUTE_IP)
+password_hashing = HashingGate()
+
+register_metrics("auth_throttle", lambda: {
+    "limiters": {limiter.name: limiter.stats()
+                 for limiter in (login_ip_limiter, login_user_limiter, register_ip_limiter)},
+    "password_hashing": password_hashing.stats(),
+})
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Engine benchmark for the blind-play opponent.
+Measures single-process search speed, then nodes/second and moves/second
+when many searches run concurrently through the engine process pool.
+
+Usage: python bench_engine.py [--concurrency 16] [--searches 64] [--time-ms 200]
+"""
+import argparse
+import asyncio
+import time
+from app.chess.board import Board
+from app.engine.search import Searcher
+from app.engine.pool import EnginePool, ENGINE_WORKERS
+
+POSITIONS = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP2BPPP/R2QKB1R w KQ - 0 8",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1",
+]
+
+def bench_single(time_ms: int):
+    print("Single process (in the event loop's process)")
+    searcher = Searcher()
+    total_nodes, total_time = 0, 0.0
+    for fen in POSITIONS:
+        result = searcher.search(Board(fen), time_limit=time_ms / 1000)
+        total_nodes += result.nodes
+        total_time += result.elapsed
+        print(f"  {result.uci:<6} depth {result.depth:>2}  {result.nodes:>8} nodes  "
+              f"{result.nodes / result.elapsed:>9.0f} nps")
+    print(f"  total: {total_nodes / total_time:.0f} nodes/second\n")
+
+async def bench_concurrent(concurrency: int, searches: int, time_ms: int, workers: int):
+    print(f"Engine pool: {workers} workers, {concurrency} concurrent requests, {searches} searches")
+    pool = EnginePool(workers)
+    # Warm up the worker processes so start-up isn't measured
+    await asyncio.gather(*(pool.search(POSITIONS[0], time_ms=10) for _ in range(workers)))
+    pool.nodes = pool.searches = 0
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(index: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await pool.search(POSITIONS[index % len(POSITIONS)], time_ms=time_ms)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(searches)))
+    elapsed = time.perf_counter() - started
+    pool.shutdown()
+
+    latencies.sort()
+    print(f"  wall time:      {elapsed:.2f} s")
+    print(f"  moves/second:   {searches / elapsed:.1f}")
+    print(f"  nodes/second:   {pool.nodes / elapsed:.0f} (aggregate)")
+    print(f"  latency p50:    {latencies[len(latencies) // 2] * 1000:.0f} ms")
+    print(f"  latency p95:    {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--searches", type=int, default=64)
+    parser.add_argument("--time-ms", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=ENGINE_WORKERS)
+    args = parser.parse_args()
+
+    bench_single(args.time_ms)
+    asyncio.run(bench_concurrent(args.concurrency, args.searches, args.time_ms, args.workers))
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,69 @@
+from app.startup import startup_report
 from fastapi import FastAPI, Request, Depends
 from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.exceptions import RequestValidationError
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 from app.database.database import init_db
-from app.routers import auth, courses, puzzles, games, categories, admin
+from app.database.cache import watch_invalidations
+from app.database.pool import close_pools
+from app.admission import AdmissionMiddleware
+from app.assets import AssetStaticFiles, asset_url, build_assets
+from app.routers import auth, courses, puzzles, games, categories, admin, blind_play, dashboard, sync
+from app.chess.sessions import run_eviction
+from app.engine.pool import engine_pool
+from app.jobs.scheduler import scheduler
+from app.jobs import maintenance  # registers the maintenance jobs
 from dotenv import load_dotenv
+from jinja2 import FileSystemBytecodeCache
+import asyncio
 import os
 
 load_dotenv()
 
+startup_report.mark("imports", startup_report.started_at)
+
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR", ".cache/templates")
+# Responses smaller than this many bytes are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+def precompile_templates():
+    """Compile every template up front so the first page hit doesn't pay for parsing"""
+    os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+    templates.env.bytecode_cache = FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+    for name in templates.env.list_templates():
+        templates.env.get_template(name)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize database on startup"""
-    await init_db()
+    """Initialize database and warm templates on startup"""
+    with startup_report.phase("database"):
+        await init_db()
+    with startup_report.phase("assets"):
+        build_assets()
+    with startup_report.phase("templates"):
+        precompile_templates()
+    print(startup_report.render())
     print("Application started successfully")
+    background_tasks = [
+        asyncio.create_task(watch_invalidations()),
+        asyncio.create_task(run_eviction(blind_play.sessions)),
+        asyncio.create_task(scheduler.run()),
+    ]
     yield
+    for task in background_tasks:
+        task.cancel()
+    for task in background_tasks:
+        with suppress(asyncio.CancelledError):
+            await task
+    engine_pool.shutdown()
+    await close_pools()
 
 app = FastAPI(title="Chess Training Platform", version="1.0.0", lifespan=lifespan)
+app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE, compresslevel=6)
+# Added last so it runs first: shed requests are rejected before any other work
+app.add_middleware(AdmissionMiddleware)
 
 # Custom exception handler for validation errors
 @app.exception_handler(RequestValidationError)
@@ -38,10 +83,11 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     )
 
 # Mount static files
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+app.mount("/static", AssetStaticFiles(directory="app/static"), name="static")
 
 # Templates
 templates = Jinja2Templates(directory="app/templates")
+templates.env.globals["asset_url"] = asset_url
 
 # Include routers
 app.include_router(auth.router)
@@ -50,6 +96,9 @@ app.include_router(puzzles.router)
 app.include_router(games.router)
 app.include_router(categories.router)
 app.include_router(admin.router)
+app.include_router(blind_play.router)
+app.include_router(dashboard.router)
+app.include_router(sync.router)
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
@@ -103,4 +152,10 @@ if __name__ == "__main__":
     except ValueError:
         print("Error: PORT environment variable must be a valid integer. Using default port 8000.")
         port = 8000
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    try:
+        workers = int(os.getenv("WORKERS", 1))
+    except ValueError:
+        print("Error: WORKERS environment variable must be a valid integer. Using 1 worker.")
+        workers = 1
+    # Multiple workers need an import string so each process can load the app itself
+    uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers)
@@ -0,0 +1,45 @@
+import asyncio
+import os
+import tempfile
+import pytest
+
+# Point the app at a scratch database before any app module reads its settings
+_scratch = tempfile.mkdtemp(prefix="chess_service_tests_")
+os.environ["DATABASE_URL"] = os.path.join(_scratch, "test.db")
+os.environ["BACKUP_DIR"] = os.path.join(_scratch, "backups")
+os.environ["BOARD_CACHE_DIR"] = os.path.join(_scratch, "boards")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+
+from app.database.database import DATABASE_URL, init_db, connect  # noqa: E402
+from app.database.pool import close_pools  # noqa: E402
+
+@pytest.fixture
+def run():
+    """Run a coroutine on a fresh event loop against a freshly created database"""
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await close_pools()
+        return asyncio.run(main())
+
+    asyncio.run(init_db())
+    yield run
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(DATABASE_URL + suffix):
+            os.remove(DATABASE_URL + suffix)
+
+async def create_user(username: str, rating: int = 1200, is_admin: bool = False) -> dict:
+    """Insert a user straight into the database and return it as a dict"""
+    db = await connect()
+    try:
+        cursor = await db.execute(
+            "INSERT INTO users (username, email, hashed_password, is_admin, rating) VALUES (?, ?, ?, ?, ?)",
+            (username, f"{username}@example.com", "not-a-hash", is_admin, rating)
+        )
+        await db.commit()
+        cursor = await db.execute("SELECT * FROM users WHERE id = ?", (cursor.lastrowid,))
+        return dict(await cursor.fetchone())
+    finally:
+        await db.close()
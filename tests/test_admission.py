@@ -0,0 +1,60 @@
+import asyncio
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from app import admission
+from app.admission import AdmissionMiddleware, RouteClass, classify
+
+@pytest.mark.parametrize("method, path, expected", [
+    ("GET", "/static/css/style.css", None),
+    ("GET", "/puzzles/", "read"),
+    ("GET", "/admin/leaderboard", "read"),
+    ("POST", "/puzzles/attempt", "write"),
+    ("GET", "/admin/stats", "admin"),
+    ("POST", "/puzzles/bulk", "admin"),
+    ("POST", "/courses/bulk", "admin"),
+    ("POST", "/categories/bulk/", "admin"),
+    ("POST", "/admin/users/bulk", "admin"),
+])
+def test_classify(method, path, expected):
+    route_class = classify(method, path)
+    assert (route_class.name if route_class else None) == expected
+
+class _Pool:
+    def __init__(self, waiting=0, wait=0.0):
+        self.waiting = waiting
+        self.wait = wait
+
+    def recent_wait(self):
+        return self.wait
+
+def test_admin_class_is_shed_before_writes():
+    pool = _Pool(waiting=10)
+    write = RouteClass("write", 4, (pool,))
+    admin = RouteClass("admin", 4, (pool,), pressure_share=0.25)
+    assert not write.database_congested()
+    assert admin.database_congested()
+
+def test_requests_over_the_limit_are_shed_with_retry_after(monkeypatch):
+    route_class = RouteClass("read", 1, (_Pool(),))
+    monkeypatch.setattr(admission, "classify", lambda method, path: route_class)
+    monkeypatch.setattr(admission, "ADMISSION_QUEUE_TIMEOUT_MS", 10)
+
+    async def slow(request):
+        await asyncio.sleep(0.2)
+        return PlainTextResponse("done")
+
+    app = AdmissionMiddleware(Starlette(routes=[Route("/", slow)]))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(client.get("/"), client.get("/"))
+
+    first, second = sorted(asyncio.run(scenario()), key=lambda response: response.status_code)
+    assert first.status_code == 200
+    assert second.status_code == 503
+    assert second.headers["Retry-After"] == str(admission.ADMISSION_RETRY_AFTER)
+    assert route_class.shed_busy == 1
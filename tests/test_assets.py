@@ -0,0 +1,88 @@
+import asyncio
+import gzip
+import os
+import httpx
+import pytest
+from fastapi import FastAPI
+from app import assets
+from app.assets import AssetStaticFiles, accepted_encodings, asset_url, build_assets
+
+@pytest.fixture(autouse=True)
+def reset_manifest(tmp_path):
+    """build_assets loads its manifest globally; forget it after each test"""
+    yield
+    assets.load_manifest(str(tmp_path / "missing.json"))
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+def test_build_fingerprints_and_compresses_scripts_and_styles(tmp_path):
+    source = str(tmp_path / "static")
+    build = os.path.join(source, "dist")
+    _write(os.path.join(source, "js", "app.js"), "console.log('hi');")
+    _write(os.path.join(source, "robots.txt"), "User-agent: *")
+
+    manifest = build_assets(source, build)
+    assert list(manifest) == ["js/app.js"]
+    built = manifest["js/app.js"]
+    assert built.startswith("dist/js/app.") and built.endswith(".js")
+    with gzip.open(os.path.join(source, built + ".gz")) as f:
+        assert f.read() == b"console.log('hi');"
+    assert asset_url("js/app.js") == "/static/" + built
+    assert asset_url("robots.txt") == "/static/robots.txt"
+
+    # Rebuilding does not pick up its own output, and changed content gets a new name
+    assert build_assets(source, build) == manifest
+    _write(os.path.join(source, "js", "app.js"), "console.log('bye');")
+    rebuilt = build_assets(source, build)["js/app.js"]
+    assert rebuilt != built
+
+    # Outputs of earlier builds are removed, along with directories left empty
+    os.remove(os.path.join(source, "js", "app.js"))
+    _write(os.path.join(source, "app.css"), "body {}")
+    build_assets(source, build)
+    remaining = sorted(os.path.relpath(os.path.join(root, name), build)
+                       for root, _, files in os.walk(build) for name in files)
+    assert [path for path in remaining if not path.startswith("app.")] == ["manifest.json"]
+    assert not os.path.exists(os.path.join(build, "js"))
+
+def test_fingerprinted_assets_are_immutable_and_served_precompressed(tmp_path):
+    source = str(tmp_path / "static")
+    _write(os.path.join(source, "style.css"), "body { color: black; }" * 50)
+    built = build_assets(source, os.path.join(source, "dist"))["style.css"]
+    app = FastAPI()
+    app.mount("/static", AssetStaticFiles(directory=source), name="static")
+
+    async def fetch():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            compressed = await client.get("/static/" + built, headers={"Accept-Encoding": "gzip"})
+            plain = await client.get("/static/" + built, headers={"Accept-Encoding": "identity"})
+            refused = await client.get("/static/" + built, headers={"Accept-Encoding": "gzip;q=0, xgzip"})
+            original = await client.get("/static/style.css")
+            return compressed, plain, refused, original
+
+    compressed, plain, refused, original = asyncio.run(fetch())
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["Content-Type"].startswith("text/css")
+    assert compressed.text == plain.text == original.text
+    assert "content-encoding" not in plain.headers
+    assert "content-encoding" not in refused.headers
+    assert compressed.headers["Cache-Control"] == assets.IMMUTABLE_CACHE_CONTROL
+    assert compressed.headers["Vary"] == "Accept-Encoding"
+    assert original.headers["Cache-Control"] == "no-cache"
+
+@pytest.mark.parametrize("header, expected", [
+    ("", []),
+    ("gzip, deflate, br", ["br", "gzip", "deflate"]),
+    ("br;q=0, gzip", ["gzip"]),
+    ("gzip;q=0.9, br;q=0.5", ["gzip", "br"]),
+    ("sbr, gzip", ["gzip", "sbr"]),
+    ("*", ["br", "gzip"]),
+    ("*;q=0, GZIP", ["gzip"]),
+    ("br;q=oops", []),
+])
+def test_accept_encoding_is_parsed_into_codings_and_weights(header, expected):
+    assert accepted_encodings(header) == expected
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import pytest
+from app.database import backup
+from app.database.database import DATABASE_URL
+from conftest import create_user
+
+def _keep_writing(stop: threading.Event, written: list):
+    db = sqlite3.connect(DATABASE_URL, timeout=5)
+    try:
+        while not stop.is_set():
+            db.execute("INSERT INTO categories (name) VALUES ('busy')")
+            db.commit()
+            written.append(1)
+    finally:
+        db.close()
+
+def test_snapshot_completes_under_steady_writes(run):
+    async def scenario():
+        await create_user("snapshot")
+        stop, written = threading.Event(), []
+        writer = threading.Thread(target=_keep_writing, args=(stop, written))
+        writer.start()
+        try:
+            await asyncio.sleep(0.05)
+            result = await backup.create_snapshot()
+        finally:
+            stop.set()
+            writer.join()
+        return result, len(written)
+
+    result, written = run(scenario())
+    assert written > 0
+    path = os.path.join(backup.BACKUP_DIR, result["file"])
+    snapshot = sqlite3.connect(path)
+    try:
+        assert snapshot.execute("SELECT username FROM users").fetchall() == [("snapshot",)]
+        assert snapshot.execute("PRAGMA quick_check").fetchone()[0] == "ok"
+    finally:
+        snapshot.close()
+    assert not os.path.exists(path + ".partial")
+
+def test_a_failed_snapshot_raises_its_own_error(tmp_path, monkeypatch):
+    broken = tmp_path / "broken.db"
+    broken.write_bytes(b"this is not a database" * 100)
+    monkeypatch.setattr(backup, "DATABASE_URL", str(broken))
+    real_connect = sqlite3.connect
+
+    def connect(database, *args, **kwargs):
+        # Keep the partial snapshot off disk, as when a copy fails before writing anything
+        if str(database).endswith(".partial"):
+            return real_connect(":memory:")
+        return real_connect(database, *args, **kwargs)
+
+    monkeypatch.setattr(sqlite3, "connect", connect)
+    with pytest.raises(sqlite3.DatabaseError):
+        backup._snapshot(str(tmp_path / "snapshot.db"))
+    assert list(tmp_path.iterdir()) == [broken]
+
+def test_exports_page_through_rows_without_password_hashes(run, monkeypatch):
+    monkeypatch.setattr(backup, "EXPORT_CHUNK_SIZE", 2)
+
+    async def scenario():
+        for name in ("ann", "ben", "cat"):
+            await create_user(name)
+        columns = await backup.export_columns("users")
+        ndjson = [chunk async for chunk in backup.export_rows("users", columns, "ndjson")]
+        csv = "".join([chunk async for chunk in backup.export_rows("users", columns, "csv")])
+        return columns, ndjson, csv
+
+    columns, ndjson, csv = run(scenario())
+    assert "hashed_password" not in columns
+    assert len(ndjson) == 2
+    rows = [json.loads(line) for chunk in ndjson for line in chunk.splitlines()]
+    assert [row["username"] for row in rows] == ["ann", "ben", "cat"]
+    assert csv.splitlines()[0] == ",".join(columns)
+    assert len(csv.splitlines()) == 4
@@ -0,0 +1,186 @@
+import asyncio
+import time
+import pytest
+from app.chess.sessions import BlindPlaySession, SessionStore
+from app.routers import blind_play
+from app.engine.search import SearchResult
+from app.database.database import connect
+from conftest import create_user
+
+async def _slow_engine(searching: asyncio.Event, release: asyncio.Event):
+    async def search_level(fen, level, history=()):
+        searching.set()
+        await release.wait()
+        raise RuntimeError("search abandoned")
+    return search_level
+
+async def _saved_games(user_id: int):
+    db = await connect()
+    try:
+        cursor = await db.execute("SELECT COUNT(*) FROM games WHERE user_id = ?", (user_id,))
+        games = (await cursor.fetchone())[0]
+        cursor = await db.execute("SELECT rating FROM users WHERE id = ?", (user_id,))
+        return games, (await cursor.fetchone())[0]
+    finally:
+        await db.close()
+
+def test_resign_during_engine_search_saves_the_game_once(run, monkeypatch):
+    async def scenario():
+        user = await create_user("blind")
+        searching, release = asyncio.Event(), asyncio.Event()
+        monkeypatch.setattr(blind_play.engine_pool, "search_level", await _slow_engine(searching, release))
+        started = await blind_play.handle_message(user, {"type": "new", "level": 1})
+        game_id = started["game"]["game_id"]
+
+        move = asyncio.create_task(blind_play.handle_message(
+            user, {"type": "move", "game_id": game_id, "move": "e2e4"}))
+        await searching.wait()
+        resigned = await blind_play.handle_message(user, {"type": "resign", "game_id": game_id})
+        release.set()
+        moved = await move
+
+        assert resigned["game"]["saved_game_id"]
+        assert moved["type"] == "ended"
+        assert "saved_game_id" not in moved["game"]
+        return await _saved_games(user["id"])
+
+    games, rating = run(scenario())
+    assert games == 1
+    assert rating == 1200 + blind_play.GAME_RATING_CHANGES["loss"]
+
+def test_finish_is_idempotent(run):
+    async def scenario():
+        user = await create_user("twice")
+        session = await blind_play.sessions.create(user["id"], 1)
+        session.resign()
+        first = await blind_play.finish(session)
+        second = await blind_play.finish(session)
+        return first, second, await _saved_games(user["id"])
+
+    first, second, (games, _) = run(scenario())
+    assert first["saved_game_id"]
+    assert second is None
+    assert games == 1
+
+def test_session_evicted_during_engine_search_is_not_saved(run, monkeypatch):
+    async def scenario():
+        user = await create_user("evicted")
+        searching, release = asyncio.Event(), asyncio.Event()
+        monkeypatch.setattr(blind_play.engine_pool, "search_level", await _slow_engine(searching, release))
+        started = await blind_play.handle_message(user, {"type": "new", "level": 1})
+        game_id = started["game"]["game_id"]
+
+        move = asyncio.create_task(blind_play.handle_message(
+            user, {"type": "move", "game_id": game_id, "move": "e4"}))
+        await searching.wait()
+        await blind_play.sessions.evict_idle(now=time.time() + 3600)
+        release.set()
+        error = None
+        try:
+            await move
+        except ValueError as e:
+            error = str(e)
+        missing = await blind_play.sessions.get(game_id, user["id"])
+        return error, missing, await _saved_games(user["id"])
+
+    error, missing, (games, _) = run(scenario())
+    assert error.startswith("Game not found")
+    assert missing is None
+    assert games == 0
+
+def test_another_worker_resumes_the_stored_game(run):
+    async def scenario():
+        user = await create_user("roaming")
+        first, second = SessionStore(), SessionStore()
+        session = await first.create(user["id"], 1)
+        session.play("e4")
+        session.reply(session.board.parse_move("e5"))
+        await first.save(session)
+
+        # A reconnect lands on the other worker, which has never seen the game
+        resumed = await second.get(session.game_id, user["id"])
+        assert resumed is not session and resumed.board.fen() == session.board.fen()
+        assert [s.game_id for s in await second.for_user(user["id"])] == [session.game_id]
+        resumed.play("Nf3")
+        resumed.reply(resumed.board.parse_move("Nc6"))
+        await second.save(resumed)
+
+        # The first worker's copy is stale: it is rebuilt, and saving the old copy fails
+        with pytest.raises(ValueError):
+            session.play("d4")
+            await first.save(session)
+        rebuilt = await first.get(session.game_id, user["id"])
+        assert rebuilt.board.fen() == resumed.board.fen()
+        assert rebuilt.san_moves() == ["e4", "e5", "Nf3", "Nc6"]
+        assert await first.get(session.game_id, user["id"] + 1) is None
+        return first.stats(), second.stats()
+
+    first_stats, second_stats = run(scenario())
+    assert first_stats["conflicts"] == 1 and first_stats["restored"] == 1
+    assert second_stats["restored"] == 1
+
+def test_a_game_finished_on_two_workers_is_saved_once(run):
+    async def scenario():
+        user = await create_user("racing")
+        first, second = SessionStore(), SessionStore()
+        session = await first.create(user["id"], 1)
+        other = await second.get(session.game_id, user["id"])
+        session.resign()
+        other.resign()
+        async with blind_play.write_pool.connection() as db:
+            claimed = [await first.claim(db, session), await second.claim(db, other)]
+            await db.commit()
+        return claimed
+
+    assert run(scenario()) == [True, False]
+
+def test_move_ending_a_game_finished_elsewhere_still_returns_the_game(run, monkeypatch):
+    async def scenario():
+        user = await create_user("mated")
+        started = await blind_play.handle_message(user, {"type": "new", "level": 1})
+        game_id = started["game"]["game_id"]
+        session = await blind_play.sessions.get(game_id, user["id"])
+
+        async def search_level(fen, level, history=()):
+            black = {1: "e5", 3: "Qh4"}[len(session.moves)]
+            move = session.board.parse_move(black)
+            return SearchResult(move, None, 0, 1, 1, 0.0)
+
+        async def lost_claim(db, session):
+            return False
+
+        monkeypatch.setattr(blind_play.engine_pool, "search_level", search_level)
+        await blind_play.handle_message(user, {"type": "move", "game_id": game_id, "move": "f3"})
+        monkeypatch.setattr(blind_play.sessions, "claim", lost_claim)
+        return await blind_play.handle_message(user, {"type": "move", "game_id": game_id, "move": "g4"})
+
+    moved = run(scenario())
+    assert moved["reply"] == "Qh4#"
+    assert moved["game"]["status"] == "finished" and moved["game"]["result"] == "loss"
+    assert "saved_game_id" not in moved["game"]
+
+def test_threefold_repetition_draws_the_session():
+    session = BlindPlaySession("draw", 1, 1)
+    for _ in range(2):
+        for white, black in (("Nf3", "Nf6"), ("Ng1", "Ng8")):
+            session.play(white)
+            session.reply(session.board.parse_move(black))
+    assert (session.result, session.reason) == ("draw", "threefold_repetition")
+    assert session.movetext().startswith("1. Nf3 Nf6 2. Ng1 Ng8")
+
+def test_session_store_limits_games_per_user_and_evicts_idle_ones(run):
+    async def scenario():
+        store = SessionStore(max_sessions=2, idle_timeout=10, max_per_user=2)
+        first = await store.create(1)
+        await store.create(1)
+        with pytest.raises(ValueError):
+            await store.create(1)
+        await store.create(2)
+        # Only the memory cache is bounded; the oldest game is still stored
+        assert len(store) == 2
+        assert (await store.get(first.game_id, 1)).game_id == first.game_id
+        evicted = await store.evict_idle(now=first.last_active + 3600)
+        return evicted, len(store), await store.for_user(1)
+
+    evicted, cached, remaining = run(scenario())
+    assert (evicted, cached, remaining) == (3, 0, [])
@@ -0,0 +1,49 @@
+import pytest
+from app.chess.board import Board, STARTING_FEN, move_to_uci
+
+def perft(board: Board, depth: int) -> int:
+    if depth == 0:
+        return 1
+    total = 0
+    for move in board.legal_moves():
+        board.push(move)
+        total += perft(board, depth - 1)
+        board.pop()
+    return total
+
+# Reference node counts from the chessprogramming.org perft positions
+@pytest.mark.parametrize("fen, depth, nodes", [
+    (STARTING_FEN, 3, 8902),
+    ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 2, 2039),
+    ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", 3, 2812),
+    ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", 2, 264),
+    ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", 2, 1486),
+])
+def test_perft(fen, depth, nodes):
+    assert perft(Board(fen), depth) == nodes
+
+def test_pop_restores_position_and_hash():
+    board = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    fen, key = board.fen(), board.key
+    for move in board.legal_moves():
+        board.push(move)
+        board.pop()
+        assert (board.fen(), board.key) == (fen, key)
+
+def test_san_and_uci_round_trip():
+    board = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    for move in board.legal_moves():
+        assert board.parse_move(board.san(move)) == move
+        assert board.parse_uci(move_to_uci(move)) == move
+
+def test_illegal_moves_are_rejected():
+    board = Board()
+    for text in ("e2e5", "Nf6", "O-O", "e9", ""):
+        with pytest.raises(ValueError):
+            board.parse_move(text)
+
+def test_checkmate_is_detected():
+    board = Board()
+    for text in ("f3", "e5", "g4", "Qh4#"):
+        board.push(board.parse_move(text))
+    assert board.outcome() == "checkmate"
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import sqlite3
+import httpx
+from conftest import create_user
+from app.auth import create_access_token
+from app.database.bulk import apply_bulk, table_handlers
+from app.database.database import DATABASE_URL, connect
+from app.database.pool import read_pool, write_pool
+from app.models.schemas import CategoryCreate
+
+HANDLERS = table_handlers("categories", CategoryCreate)
+
+def _items(entries, on_read=None):
+    async def items():
+        for entry in entries:
+            if on_read is not None:
+                on_read()
+            yield entry, None
+    return items()
+
+async def _category_names():
+    db = await connect()
+    try:
+        cursor = await db.execute("SELECT name FROM categories ORDER BY id")
+        return [row[0] for row in await cursor.fetchall()]
+    finally:
+        await db.close()
+
+def _can_take_write_lock() -> bool:
+    db = sqlite3.connect(DATABASE_URL, timeout=0)
+    try:
+        db.execute("BEGIN IMMEDIATE")
+        db.rollback()
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        db.close()
+
+def test_failing_items_are_reported_and_the_rest_applied(run):
+    entries = [
+        {"op": "create", "data": {"name": "Tactics"}},
+        {"op": "update", "id": 999, "data": {"name": "Missing"}},
+        {"op": "create", "data": {}},
+        "not an object",
+        {"op": "rename"},
+        {"op": "create", "data": {"name": "Endgames"}},
+    ]
+
+    async def scenario():
+        report = await apply_bulk(_items(entries), HANDLERS, batch_size=2)
+        return report, await _category_names()
+
+    report, names = run(scenario())
+    assert (report["succeeded"], report["failed"], report["rolled_back"]) == (2, 4, False)
+    assert [result["status"] for result in report["results"]] == ["ok", "error", "error", "error", "error", "ok"]
+    assert report["results"][1]["error"] == "Not found"
+    assert report["results"][2]["error"].startswith("name:")
+    assert names == ["Tactics", "Endgames"]
+
+def test_atomic_rolls_back_everything_on_the_first_error(run):
+    entries = [
+        {"op": "create", "data": {"name": "Tactics"}},
+        {"op": "delete", "id": 999},
+        {"op": "create", "data": {"name": "Endgames"}},
+    ]
+
+    async def scenario():
+        report = await apply_bulk(_items(entries), HANDLERS, atomic=True)
+        return report, await _category_names()
+
+    report, names = run(scenario())
+    assert report["rolled_back"] is True
+    assert len(report["results"]) == 2
+    assert names == []
+
+def test_write_lock_is_not_held_while_reading_the_body(run):
+    lock_free = []
+    entries = [{"op": "create", "data": {"name": f"Category {i}"}} for i in range(5)]
+
+    report = run(apply_bulk(_items(entries, on_read=lambda: lock_free.append(_can_take_write_lock())),
+                            HANDLERS, batch_size=2))
+    assert report["succeeded"] == 5
+    assert lock_free == [True] * 5
+
+def test_slow_bulk_uploads_and_single_writes_do_not_deadlock(run, monkeypatch):
+    from main import app
+    # A deadlock would otherwise only show up as the pool's 503 after ten seconds
+    monkeypatch.setattr(read_pool, "acquire_timeout", 3)
+    monkeypatch.setattr(write_pool, "acquire_timeout", 3)
+
+    async def slow_ndjson(upload: int):
+        for i in range(3):
+            await asyncio.sleep(0.05)
+            yield json.dumps({"op": "create", "data": {"name": f"Bulk {upload}.{i}"}}).encode() + b"\n"
+
+    async def scenario():
+        admin = await create_user("admin", is_admin=True)
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': admin['username']})}"}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as client:
+            uploads = [client.post("/categories/bulk", content=slow_ndjson(upload),
+                                   headers={"Content-Type": "application/x-ndjson"})
+                       for upload in range(4)]
+            single = client.post("/categories/", json={"name": "Single"})
+            responses = await asyncio.wait_for(asyncio.gather(*uploads, single), 10)
+        return responses, await _category_names()
+
+    responses, names = run(scenario())
+    assert [response.status_code for response in responses] == [200] * 5
+    assert [response.json()["succeeded"] for response in responses[:4]] == [3] * 4
+    assert len(names) == 13 and "Single" in names
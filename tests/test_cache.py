@@ -0,0 +1,74 @@
+from app.database import cache
+from app.database.cache import SharedCache, invalidate
+from app.database.database import connect
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: clock[0])
+    ttl_cache = SharedCache("test-ttl", ttl=10)
+    ttl_cache.set("a", 1)
+    clock[0] += 5
+    assert ttl_cache.get("a") == 1
+    clock[0] += 6
+    assert ttl_cache.get("a") is None
+    assert ttl_cache.stats()["entries"] == 0
+
+def test_least_recently_used_entry_is_evicted():
+    lru = SharedCache("test-lru", maxsize=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert (lru.get("a"), lru.get("c")) == (1, 3)
+
+def test_value_read_before_a_clear_is_not_stored(run):
+    stale = SharedCache("test-generation")
+
+    async def load():
+        # Another request invalidates while this one is still loading
+        stale.clear()
+        return "old rows"
+
+    assert run(stale.get_or_load("key", load)) == "old rows"
+    assert stale.get("key") is None
+
+def test_invalidation_reaches_other_workers(run, monkeypatch):
+    monkeypatch.setattr(cache, "_last_seq", 0)
+    shared = SharedCache("test-shared")
+    untouched = SharedCache("test-untouched")
+
+    async def scenario():
+        db = await connect()
+        try:
+            await cache._sync_versions(db, initial=True)
+            shared.set("key", "value")
+            untouched.set("key", "value")
+            # Bump the version as another worker would, without touching our copy
+            await cache._bump_versions(db, ["test-shared"])
+            assert shared.get("key") == "value"
+            await cache._sync_versions(db)
+        finally:
+            await db.close()
+
+    run(scenario())
+    assert shared.get("key") is None
+    assert untouched.get("key") == "value"
+
+def test_invalidate_clears_this_worker_immediately(run, monkeypatch):
+    monkeypatch.setattr(cache, "_last_seq", 0)
+    local = SharedCache("test-local")
+
+    async def scenario():
+        db = await connect()
+        try:
+            local.set("key", "value")
+            await invalidate(db, "test-local")
+            cursor = await db.execute(
+                "SELECT version FROM cache_versions WHERE namespace = 'test-local'")
+            return (await cursor.fetchone())[0]
+        finally:
+            await db.close()
+
+    assert run(scenario()) == 1
+    assert local.get("key") is None
@@ -0,0 +1,73 @@
+import numpy as np
+from app.database.database import connect
+from app.jobs.calibration import calibrate, calibrate_arrays, group_percentiles
+from conftest import create_user
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+async def _add_puzzle(db, rating: int = 1200) -> int:
+    cursor = await db.execute(
+        "INSERT INTO puzzles (title, fen, solution, rating) VALUES (?, ?, ?, ?)",
+        ("Puzzle", START_FEN, "e2e4", rating))
+    return cursor.lastrowid
+
+async def _add_attempts(db, user_id: int, puzzle_id: int, successes: int, failures: int):
+    await db.executemany(
+        "INSERT INTO puzzle_attempts (user_id, puzzle_id, success, time_taken, user_rating) VALUES (?, ?, ?, ?, ?)",
+        [(user_id, puzzle_id, True, 30 + i, 1500) for i in range(successes)]
+        + [(user_id, puzzle_id, False, None, 1500) for _ in range(failures)])
+
+def test_calibration_with_only_deleted_puzzles_is_a_no_op(run):
+    async def scenario():
+        user = await create_user("solver", rating=1500)
+        db = await connect()
+        try:
+            puzzle_id = await _add_puzzle(db)
+            await _add_attempts(db, user["id"], puzzle_id, 3, 2)
+            await db.execute("DELETE FROM puzzles WHERE id = ?", (puzzle_id,))
+            await db.commit()
+        finally:
+            await db.close()
+        return await calibrate()
+
+    assert run(scenario()) == {"puzzles": 0, "attempts": 0}
+
+def test_calibrate_arrays_handles_no_attempts():
+    empty = np.array([], dtype=np.int64)
+    assert calibrate_arrays(empty, empty.astype(np.float64), empty.astype(bool),
+                            empty.astype(np.float64), {}) == []
+
+def test_easier_puzzles_calibrate_lower(run):
+    async def scenario():
+        user = await create_user("solver", rating=1500)
+        db = await connect()
+        try:
+            easy, hard = await _add_puzzle(db), await _add_puzzle(db)
+            await _add_attempts(db, user["id"], easy, 40, 2)
+            await _add_attempts(db, user["id"], hard, 2, 40)
+            await db.commit()
+        finally:
+            await db.close()
+        summary = await calibrate()
+        db = await connect()
+        try:
+            cursor = await db.execute(
+                "SELECT id, rating, difficulty, attempts, solve_rate, time_p50 FROM puzzles ORDER BY id")
+            return summary, [tuple(row) for row in await cursor.fetchall()]
+        finally:
+            await db.close()
+
+    summary, rows = run(scenario())
+    assert summary == {"puzzles": 2, "attempts": 84}
+    (_, easy_rating, easy_label, easy_attempts, easy_rate, easy_p50), (_, hard_rating, hard_label, *_ ) = rows
+    assert easy_rating < 1200 < hard_rating
+    assert (easy_label, hard_label) == ("easy", "hard")
+    assert (easy_attempts, easy_rate) == (42, round(40 / 42, 4))
+    assert easy_p50 == 49
+
+def test_group_percentiles_use_nearest_rank_and_nan_for_empty_groups():
+    index = np.array([0, 0, 0, 0, 2])
+    values = np.array([40.0, 10.0, 30.0, 20.0, 5.0])
+    p50, p90 = group_percentiles(index, 3, values, (50, 90))
+    assert p50[0] == 20 and p90[0] == 30
+    assert np.isnan(p50[1]) and p50[2] == 5
@@ -0,0 +1,25 @@
+import asyncio
+from app.routers import dashboard
+from conftest import create_user
+
+def test_a_failing_or_slow_section_is_reported_without_failing_the_summary(run, monkeypatch):
+    async def broken(db, user_id):
+        raise RuntimeError("boom")
+
+    async def stuck(db, user_id, days):
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(dashboard, "fetch_purchases", broken)
+    monkeypatch.setattr(dashboard, "fetch_rating_trend", stuck)
+    monkeypatch.setattr(dashboard, "DASHBOARD_SECTION_TIMEOUT", 0.2)
+
+    async def scenario():
+        user = await create_user("dash")
+        return await dashboard.get_summary(current_user=user)
+
+    summary = run(scenario())
+    assert summary["errors"] == {"purchases": "Failed to load", "rating_trend": "Timed out"}
+    assert summary["purchases"] is None and summary["rating_trend"] is None
+    assert summary["recent_games"] == [] and summary["recent_attempts"] == []
+    assert summary["stats"] is not None
+    assert summary["user"]["username"] == "dash"
@@ -0,0 +1,18 @@
+import asyncio
+from app.chess.board import Board
+from app.engine.pool import ENGINE_START_METHOD, EnginePool
+
+def test_searches_run_in_processes_that_are_not_forked():
+    pool = EnginePool(workers=1)
+
+    async def search():
+        try:
+            result = await pool.search(Board().fen(), time_ms=0, node_limit=2000, max_depth=2)
+            return result, pool._executor._mp_context.get_start_method()
+        finally:
+            pool.shutdown()
+
+    result, start_method = asyncio.run(search())
+    assert start_method == ENGINE_START_METHOD != "fork"
+    assert result.move is not None and result.uci
+    assert pool.stats()["searches"] == 1
@@ -0,0 +1,54 @@
+from array import array
+from app.database import cache
+from app.database.database import connect
+from app.entitlements import entitlements_cache, grant_course, owned_course_ids
+
+async def _other_worker_sees_changes(db):
+    # What watch_invalidations does in another worker once data_version moves
+    await cache._sync_versions(db)
+
+def test_purchase_only_invalidates_the_buyer(run, monkeypatch):
+    monkeypatch.setattr(cache, "_last_seq", 0)
+    async def scenario():
+        entitlements_cache.clear()
+        db = await connect()
+        try:
+            await cache._sync_versions(db, initial=True)
+            await db.execute("INSERT INTO courses (title) VALUES ('Openings'), ('Endgames')")
+            await db.execute("INSERT INTO purchases (user_id, course_id, amount) VALUES (1, 1, 0)")
+            await db.commit()
+            assert list(await owned_course_ids(db, 1)) == [1]
+            assert list(await owned_course_ids(db, 2)) == []
+
+            await db.execute("INSERT INTO purchases (user_id, course_id, amount) VALUES (2, 2, 0)")
+            await db.commit()
+            await grant_course(db, 2, 2)
+            in_place = entitlements_cache.get(2)
+
+            # Simulate another worker: its copy of user 2 is stale, user 1 is not
+            entitlements_cache.set(2, array("I"))
+            await _other_worker_sees_changes(db)
+            return in_place, entitlements_cache.get(1), entitlements_cache.get(2)
+        finally:
+            await db.close()
+
+    in_place, buyer_one, buyer_two = run(scenario())
+    assert list(in_place) == [2]
+    assert list(buyer_one) == [1]
+    assert buyer_two is None
+
+def test_namespace_invalidation_still_clears_everything(run, monkeypatch):
+    monkeypatch.setattr(cache, "_last_seq", 0)
+    async def scenario():
+        db = await connect()
+        try:
+            await cache._sync_versions(db, initial=True)
+            entitlements_cache.set(1, array("I", [1]))
+            entitlements_cache.set(2, array("I", [2]))
+            await cache._bump_versions(db, ["entitlements"])
+            await _other_worker_sees_changes(db)
+            return entitlements_cache.get(1), entitlements_cache.get(2)
+        finally:
+            await db.close()
+
+    assert run(scenario()) == (None, None)
@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+import pytest
+from app import leaderboards
+from app.database.database import connect
+from app.leaderboards import archive_rating_deltas, bucket_start, get_window_leaderboard, record_rating_delta
+from conftest import create_user
+
+def test_bucket_start_of_each_period():
+    # A Sunday: its ISO week started on Monday the 18th
+    moment = datetime(2026, 10, 25, 23, 59, tzinfo=timezone.utc)
+    assert bucket_start("day", moment) == "2026-10-25"
+    assert bucket_start("week", moment) == "2026-10-19"
+    assert bucket_start("month", moment) == "2026-10-01"
+    assert bucket_start("week", datetime(2026, 10, 19, tzinfo=timezone.utc)) == "2026-10-19"
+    with pytest.raises(ValueError):
+        bucket_start("year", moment)
+
+async def _move_buckets_back(db, days: int):
+    # Pretend the recorded changes happened `days` ago
+    await db.execute("UPDATE rating_deltas SET bucket = date(bucket, ?)", (f"-{days} days",))
+    await db.commit()
+
+def test_window_ranks_gainers_of_the_current_bucket(run):
+    async def scenario():
+        leaderboards.leaderboard_cache.clear()
+        alice, bob = await create_user("alice"), await create_user("bob")
+        db = await connect()
+        try:
+            for user, change in ((alice, 20), (bob, 5), (alice, -15), (bob, 20)):
+                await record_rating_delta(db, user["id"], change)
+            await db.commit()
+            return [await get_window_leaderboard(db, period) for period in leaderboards.PERIODS]
+        finally:
+            await db.close()
+
+    for ranking in run(scenario()):
+        assert [(row["username"], row["rating_change"]) for row in ranking] == [("bob", 25), ("alice", 5)]
+
+def test_past_buckets_are_readable_before_and_after_archiving(run):
+    async def scenario():
+        leaderboards.leaderboard_cache.clear()
+        alice = await create_user("alice")
+        db = await connect()
+        try:
+            await record_rating_delta(db, alice["id"], 20)
+            await db.commit()
+            await _move_buckets_back(db, 40)
+            cursor = await db.execute("SELECT bucket FROM rating_deltas WHERE period = 'day'")
+            past = (await cursor.fetchone())[0]
+            before = await get_window_leaderboard(db, "day", bucket=past)
+            leaderboards.leaderboard_cache.clear()
+            moved = await archive_rating_deltas(db)
+            after = await get_window_leaderboard(db, "day", bucket=past)
+            current = await get_window_leaderboard(db, "day")
+            return before, moved, after, current
+        finally:
+            await db.close()
+
+    before, moved, after, current = run(scenario())
+    assert [row["rating_change"] for row in before] == [20]
+    assert moved == {"day": 1, "week": 1, "month": 1}
+    assert [row["rating_change"] for row in after] == [20]
+    assert current == []
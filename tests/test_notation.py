@@ -0,0 +1,52 @@
+import pytest
+from app.chess.notation import (check_moves, normalize_fen, normalize_solution, solution_matches,
+                                solution_moves)
+
+START = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+def test_fen_is_normalised():
+    assert normalize_fen("  rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR   w KQkq -  0 1 ") == START
+
+@pytest.mark.parametrize("fen", [
+    "not a fen",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP w KQkq - 0 1",
+    "8/8/8/8/8/8/8/8 w - - 0 1",
+])
+def test_invalid_fens_are_rejected(fen):
+    with pytest.raises(ValueError):
+        normalize_fen(fen)
+
+@pytest.mark.parametrize("solution", ["e4 e5 Nf3", "1. e4 e5 2. Nf3", "e2e4 e7e5 g1f3", "e2-e4, e7-e5, g1-f3"])
+def test_multi_move_solutions_become_uci(solution):
+    assert normalize_solution(START, solution) == "e2e4 e7e5 g1f3"
+
+def test_promotions_and_castling_are_written_in_uci():
+    assert normalize_solution("8/P6k/8/8/8/8/8/K7 w - - 0 1", "a8=Q+") == "a7a8q"
+    assert normalize_solution("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1", "O-O") == "e1g1"
+
+def test_illegal_moves_name_the_move_and_line():
+    with pytest.raises(ValueError, match="'Nf6' after e2e4"):
+        normalize_solution(START, "e4 Nf6 Nf6")
+
+def test_move_syntax_is_checked_without_a_position():
+    assert solution_moves("1. e4 1... e5") == ["e4", "e5"]
+    assert check_moves(" e4 ") == "e4"
+    for solution in ("", "1.", "e9", "hello"):
+        with pytest.raises(ValueError):
+            solution_moves(solution)
+
+@pytest.mark.parametrize("answer, correct", [
+    ("e4 e5 Nf3", True),
+    ("1. e2e4 e7e5 2. g1-f3", True),
+    ("e4", False),
+    ("e4 e5", False),
+    ("e4 e5 Nf3 Nc6", False),
+    ("e4 e5 Nc3", False),
+    ("Nf6", False),
+])
+def test_answers_must_play_the_whole_solution(answer, correct):
+    assert solution_matches(START, "e2e4 e7e5 g1f3", answer) is correct
+
+def test_unplayable_solutions_match_on_the_raw_text():
+    assert solution_matches(START, "Find the plan", "find the plan")
+    assert not solution_matches(START, "Find the plan", "e4")
@@ -0,0 +1,86 @@
+import asyncio
+import sqlite3
+import pytest
+from fastapi import HTTPException
+from app.database.pool import ConnectionPool, read_pool, write_pool
+
+def test_read_pool_cannot_write(run):
+    async def scenario():
+        async with read_pool.connection() as db:
+            await db.execute("INSERT INTO categories (name) VALUES ('Endgames')")
+
+    with pytest.raises(sqlite3.OperationalError, match="readonly"):
+        run(scenario())
+
+def test_release_rolls_back_an_abandoned_transaction(run):
+    async def scenario():
+        async with write_pool.connection() as db:
+            await db.execute("INSERT INTO categories (name) VALUES ('Endgames')")
+            assert db.in_transaction
+        async with write_pool.connection() as db:
+            assert not db.in_transaction
+        async with read_pool.connection() as db:
+            cursor = await db.execute("SELECT COUNT(*) FROM categories WHERE name = 'Endgames'")
+            return (await cursor.fetchone())[0]
+
+    assert run(scenario()) == 0
+
+def test_callers_queue_for_a_full_pool(run):
+    pool = ConnectionPool("test", 1)
+
+    async def hold(seconds):
+        async with pool.connection():
+            await asyncio.sleep(seconds)
+
+    async def scenario():
+        try:
+            await asyncio.gather(hold(0.05), hold(0), hold(0))
+            return pool.stats()
+        finally:
+            await pool.close()
+
+    stats = run(scenario())
+    assert stats["open"] == 1 and stats["in_use"] == 0 and stats["waiting"] == 0
+    assert stats["acquired"] == 3
+    assert stats["max_waiting"] == 2
+    assert stats["max_wait_ms"] >= 40
+
+def test_waiting_for_a_busy_pool_times_out_with_503(run):
+    pool = ConnectionPool("test", 1, acquire_timeout=0.05)
+
+    async def scenario():
+        try:
+            async with pool.connection():
+                with pytest.raises(HTTPException) as error:
+                    await pool.acquire()
+            async with pool.connection():
+                pass
+            return error.value, pool.stats()
+        finally:
+            await pool.close()
+
+    error, stats = run(scenario())
+    assert error.status_code == 503 and error.headers["Retry-After"] == "1"
+    assert stats["timeouts"] == 1 and stats["waiting"] == 0 and stats["in_use"] == 0
+
+def test_cancelled_open_gives_the_slot_back(run, monkeypatch):
+    pool = ConnectionPool("test", 1)
+    opening = ConnectionPool._open
+
+    async def stuck_open(self):
+        await asyncio.sleep(10)
+
+    async def scenario():
+        monkeypatch.setattr(ConnectionPool, "_open", stuck_open)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(pool.acquire(), 0.01)
+        assert pool.stats()["open"] == 0
+        monkeypatch.setattr(ConnectionPool, "_open", opening)
+        try:
+            async with pool.connection() as db:
+                cursor = await db.execute("SELECT 1")
+                return (await cursor.fetchone())[0]
+        finally:
+            await pool.close()
+
+    assert run(scenario()) == 1
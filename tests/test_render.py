@@ -0,0 +1,70 @@
+import httpx
+import pytest
+from app.chess.board import Board, WHITE, parse_square
+from app.chess.render import etag_matches, image_key, parse_highlight, render_svg
+from app.database.database import connect
+
+def test_parse_highlight_accepts_uci_moves_and_promotions():
+    assert parse_highlight("e2e4") == (parse_square("e2"), parse_square("e4"))
+    assert parse_highlight("e7e8q") == (parse_square("e7"), parse_square("e8"))
+
+@pytest.mark.parametrize("move", ["e2", "e2e4x", "e7e8k", "e7e8Q", "e2e2", "i2e4", "e2e4e5"])
+def test_parse_highlight_rejects_malformed_moves(move):
+    with pytest.raises(ValueError):
+        parse_highlight(move)
+
+def test_etag_matching_follows_if_none_match_rules():
+    etag = '"abc"'
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('"xyz", "abc"', etag)
+    assert etag_matches('W/"abc"', etag)
+    assert etag_matches(" * ", etag)
+    assert not etag_matches('"abcd"', etag)
+    assert not etag_matches("", etag)
+    assert not etag_matches(None, etag)
+
+def test_image_key_covers_every_option():
+    board = Board()
+    keys = {
+        image_key(board, WHITE, None, 360, "svg"),
+        image_key(board, 1 - WHITE, None, 360, "svg"),
+        image_key(board, WHITE, (12, 28), 360, "svg"),
+        image_key(board, WHITE, None, 200, "svg"),
+        image_key(board, WHITE, None, 360, "png"),
+    }
+    assert len(keys) == 5
+
+def test_svg_draws_every_piece_and_the_highlight():
+    svg = render_svg(Board(), last_move=(12, 28), size=80)
+    assert svg.startswith("<svg") and svg.endswith("</svg>")
+    assert svg.count("<text") == 32
+    assert svg.count('fill-opacity="0.75"') == 2
+
+def test_board_endpoint_revalidates_with_etags(run):
+    from main import app
+
+    async def scenario():
+        db = await connect()
+        try:
+            cursor = await db.execute(
+                "INSERT INTO puzzles (title, fen, solution) VALUES ('P', ?, 'e2e4')", (Board().fen(),))
+            await db.commit()
+            puzzle_id = cursor.lastrowid
+        finally:
+            await db.close()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            url = f"/puzzles/{puzzle_id}/board.svg?last_move=e2e4"
+            first = await client.get(url)
+            etag = first.headers["etag"]
+            listed = await client.get(url, headers={"If-None-Match": f'"other", W/{etag}'})
+            any_tag = await client.get(url, headers={"If-None-Match": "*"})
+            bad_move = await client.get(f"/puzzles/{puzzle_id}/board.svg?last_move=e7e8k")
+            return first, listed, any_tag, bad_move
+
+    first, listed, any_tag, bad_move = run(scenario())
+    assert first.status_code == 200
+    assert first.headers["content-type"] == "image/svg+xml"
+    assert listed.status_code == 304
+    assert any_tag.status_code == 304
+    assert bad_move.status_code == 400
@@ -0,0 +1,47 @@
+from app.database.database import connect
+from app.review import INITIAL_EASE, MIN_EASE, review_quality, schedule_review, sm2
+from conftest import create_user
+
+def test_review_quality_grades_by_speed():
+    assert review_quality(False, 10, 30) == 1
+    assert review_quality(True) == 4
+    assert review_quality(True, 20, 30) == 5
+    assert review_quality(True, 45, 30) == 4
+    assert review_quality(True, 61, 30) == 3
+
+def test_sm2_intervals_grow_and_lapses_reset():
+    card = (0, 0, INITIAL_EASE)
+    intervals = []
+    for _ in range(4):
+        card = sm2(*card, quality=4)
+        intervals.append(card[1])
+    assert intervals == [1, 6, 15.0, 37.5]
+    assert sm2(*card, quality=1)[:2] == (0, 1)
+
+def test_ease_never_drops_below_the_floor():
+    card = (0, 0, INITIAL_EASE)
+    for _ in range(20):
+        card = sm2(*card, quality=0)
+    assert card[2] == MIN_EASE
+
+def test_only_failed_puzzles_enter_the_queue(run):
+    async def scenario():
+        user = await create_user("reviewer")
+        db = await connect()
+        try:
+            cursor = await db.execute(
+                "INSERT INTO puzzles (title, fen, solution) VALUES ('P', '8/8/8/8/8/8/8/K1k5 w - - 0 1', 'a1a2')")
+            puzzle_id = cursor.lastrowid
+            solved_first = await schedule_review(db, user["id"], puzzle_id, True, 10)
+            failed = await schedule_review(db, user["id"], puzzle_id, False)
+            solved_later = await schedule_review(db, user["id"], puzzle_id, True, 10)
+            cursor = await db.execute(
+                "SELECT repetitions, lapses FROM review_queue WHERE user_id = ?", (user["id"],))
+            return solved_first, failed, solved_later, tuple(await cursor.fetchone())
+        finally:
+            await db.close()
+
+    solved_first, failed, solved_later, card = run(scenario())
+    assert solved_first is None
+    assert failed is not None and solved_later is not None
+    assert card == (1, 1)
@@ -0,0 +1,80 @@
+from datetime import datetime, timezone
+import httpx
+import pytest
+from conftest import create_user
+from app.auth import create_access_token
+from app.database.pool import read_pool
+from app.jobs.scheduler import CronSchedule, Job, scheduler
+
+def _at(*args) -> float:
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+def _next(expression: str, *args) -> datetime:
+    return datetime.fromtimestamp(CronSchedule(expression).next_after(_at(*args)), timezone.utc)
+
+def test_fields_parse_lists_ranges_and_steps():
+    schedule = CronSchedule("*/15 0-6/3 1,15 * 1-5")
+    assert schedule.minutes == {0, 15, 30, 45}
+    assert schedule.hours == {0, 3, 6}
+    assert schedule.days == {1, 15}
+    assert schedule.months == set(range(1, 13))
+    assert schedule.weekdays == {1, 2, 3, 4, 5}
+
+def test_a_stepped_start_value_runs_to_the_end_of_the_range():
+    assert CronSchedule("5/20 * * * *").minutes == {5, 25, 45}
+
+@pytest.mark.parametrize("expression", [
+    "* * * *", "60 * * * *", "* 24 * * *", "* * 0 * *", "* * * 13 *", "* * * * 7",
+    "5-1 * * * *", "*/0 * * * *", "a * * * *",
+])
+def test_invalid_expressions_are_rejected(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+def test_next_run_is_strictly_after_the_given_time():
+    assert _next("30 2 * * *", 2026, 3, 1, 2, 30) == datetime(2026, 3, 2, 2, 30, tzinfo=timezone.utc)
+    assert _next("30 2 * * *", 2026, 3, 1, 2, 29, 59) == datetime(2026, 3, 1, 2, 30, tzinfo=timezone.utc)
+
+def test_next_run_rolls_over_hours_days_months_and_years():
+    assert _next("0 * * * *", 2026, 3, 1, 23, 15) == datetime(2026, 3, 2, 0, 0, tzinfo=timezone.utc)
+    assert _next("0 0 1 * *", 2026, 12, 31, 12, 0) == datetime(2027, 1, 1, 0, 0, tzinfo=timezone.utc)
+    assert _next("0 0 29 2 *", 2026, 3, 1) == datetime(2028, 2, 29, 0, 0, tzinfo=timezone.utc)
+
+def test_weekday_zero_is_sunday():
+    # 2026-10-19 is a Monday
+    assert _next("0 9 * * 0", 2026, 10, 19) == datetime(2026, 10, 25, 9, 0, tzinfo=timezone.utc)
+
+def test_restricted_day_and_weekday_match_either():
+    # The 15th or any Monday, whichever comes first
+    assert _next("0 0 15 * 1", 2026, 10, 13) == datetime(2026, 10, 15, 0, 0, tzinfo=timezone.utc)
+    assert _next("0 0 15 * 1", 2026, 10, 16) == datetime(2026, 10, 19, 0, 0, tzinfo=timezone.utc)
+
+def test_a_job_needs_exactly_one_schedule():
+    async def task():
+        return None
+    with pytest.raises(ValueError):
+        Job("both", task, every=60, cron="* * * * *")
+    with pytest.raises(ValueError):
+        Job("neither", task)
+    assert Job("interval", task, every=90).next_after(1000.0) == 1090.0
+
+def test_manual_runs_claim_the_writer_without_holding_a_reader(run, monkeypatch):
+    from main import app
+    held_readers = []
+
+    async def claim(job, scheduled, trigger="schedule"):
+        held_readers.append(read_pool.in_use)
+        return None
+
+    monkeypatch.setattr(scheduler, "_claim", claim)
+
+    async def scenario():
+        admin = await create_user("admin", is_admin=True)
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': admin['username']})}"}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as client:
+            return [await client.post("/admin/jobs/optimize/run"), await client.post("/admin/backups")]
+
+    responses = run(scenario())
+    assert [response.status_code for response in responses] == [409, 409]
+    assert held_readers == [0, 0]
@@ -0,0 +1,41 @@
+import asyncio
+from app.database.database import (MIGRATIONS, SCHEMA, SCHEMA_VERSION, _schema_statements,
+                                    connect, init_db)
+
+async def _user_version_and_columns(table: str):
+    db = await connect()
+    try:
+        cursor = await db.execute("PRAGMA user_version")
+        version = (await cursor.fetchone())[0]
+        cursor = await db.execute(f"PRAGMA table_info({table})")
+        return version, [row[1] for row in await cursor.fetchall()]
+    finally:
+        await db.close()
+
+def test_current_schema_skips_ddl(run):
+    assert max(MIGRATIONS) == SCHEMA_VERSION
+    assert _schema_statements(SCHEMA_VERSION) == SCHEMA
+    assert run(init_db()) is False
+
+def test_older_schema_gets_the_missing_migrations(run):
+    async def downgrade():
+        db = await connect()
+        try:
+            # Back to version 9, before cache_versions.seq and blind_play_sessions
+            await db.execute("DROP TABLE blind_play_sessions")
+            await db.execute("DROP INDEX idx_cache_versions_seq")
+            await db.execute("ALTER TABLE cache_versions DROP COLUMN seq")
+            await db.execute("PRAGMA user_version = 9")
+            await db.commit()
+        finally:
+            await db.close()
+
+    asyncio.run(downgrade())
+    version, columns = asyncio.run(_user_version_and_columns("cache_versions"))
+    assert version == 9 and "seq" not in columns
+
+    assert run(init_db()) is True
+    version, columns = asyncio.run(_user_version_and_columns("cache_versions"))
+    assert version == SCHEMA_VERSION and "seq" in columns
+    assert asyncio.run(_user_version_and_columns("blind_play_sessions"))[1]
+    assert asyncio.run(init_db()) is False
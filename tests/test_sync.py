@@ -0,0 +1,90 @@
+import pytest
+from fastapi import HTTPException
+from app.database.database import connect
+from app.database.pool import write_pool
+from app.models.schemas import SyncRequest
+from app.ratings import GAME_RATING_CHANGES, PUZZLE_SOLVED_RATING_CHANGE
+from app.routers import sync
+from conftest import create_user
+
+async def _sync(user: dict, items: list) -> dict:
+    async with write_pool.connection() as db:
+        return await sync.sync_items(SyncRequest(items=items), db=db, current_user=user)
+
+async def _user_state(user_id: int):
+    db = await connect()
+    try:
+        counts = []
+        for table in ("puzzle_attempts", "games", "rating_history"):
+            cursor = await db.execute(f"SELECT COUNT(*) FROM {table} WHERE user_id = ?", (user_id,))
+            counts.append((await cursor.fetchone())[0])
+        cursor = await db.execute("SELECT rating FROM users WHERE id = ?", (user_id,))
+        return counts, (await cursor.fetchone())[0]
+    finally:
+        await db.close()
+
+async def _add_puzzle() -> int:
+    db = await connect()
+    try:
+        cursor = await db.execute(
+            "INSERT INTO puzzles (title, fen, solution) VALUES ('P', '8/8/8/8/8/8/8/K1k5 w - - 0 1', 'a1a2')")
+        await db.commit()
+        return cursor.lastrowid
+    finally:
+        await db.close()
+
+def test_retrying_a_sync_never_applies_an_item_twice(run):
+    async def scenario():
+        user = await create_user("offline")
+        puzzle_id = await _add_puzzle()
+        items = [
+            {"type": "attempt", "key": "a1", "puzzle_id": puzzle_id, "success": True, "time_taken": 12},
+            {"type": "game", "key": "g1", "game_type": "blitz", "result": "win"},
+            {"type": "attempt", "key": "a2", "puzzle_id": 999, "success": True},
+            {"type": "move", "key": "x1"},
+            {"type": "game", "key": "g2"},
+            "attempt",
+            ["game", "g3"],
+            None,
+        ]
+        first = await _sync(user, items)
+        retry = await _sync(user, items)
+        return first, retry, await _user_state(user["id"])
+
+    first, retry, ((attempts, games, history), rating) = run(scenario())
+    gained = PUZZLE_SOLVED_RATING_CHANGE + GAME_RATING_CHANGES["win"]
+    assert (first["applied"], first["duplicates"], first["failed"]) == (2, 0, 6)
+    assert [result["status"] for result in first["results"]] == ["ok", "ok"] + ["error"] * 6
+    assert first["results"][2]["error"] == "Puzzle not found"
+    assert first["results"][6] == {"index": 6, "key": None, "type": None, "status": "error",
+                                   "error": "Each item must be a JSON object"}
+    assert first["rating_change"] == gained and first["rating"] == 1200 + gained
+
+    assert (retry["applied"], retry["duplicates"], retry["failed"]) == (0, 2, 6)
+    assert retry["results"][0]["id"] == first["results"][0]["id"]
+    assert retry["results"][1]["id"] == first["results"][1]["id"]
+    assert retry["rating_change"] == 0
+
+    assert (attempts, games, history) == (1, 1, 1)
+    assert rating == 1200 + gained
+
+def test_keys_are_per_user(run):
+    async def scenario():
+        ann, ben = await create_user("ann"), await create_user("ben")
+        item = [{"type": "game", "key": "same", "game_type": "blitz", "result": "draw"}]
+        return await _sync(ann, item), await _sync(ben, item)
+
+    ann, ben = run(scenario())
+    assert ann["applied"] == ben["applied"] == 1
+
+def test_oversized_syncs_are_rejected(run, monkeypatch):
+    monkeypatch.setattr(sync, "SYNC_MAX_ITEMS", 2)
+
+    async def scenario():
+        user = await create_user("bulky")
+        items = [{"type": "game", "key": f"k{i}", "game_type": "blitz"} for i in range(3)]
+        with pytest.raises(HTTPException) as error:
+            await _sync(user, items)
+        return error.value.status_code
+
+    assert run(scenario()) == 400
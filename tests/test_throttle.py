@@ -0,0 +1,46 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from app.throttle import HashingGate, RateLimiter
+
+def test_bucket_allows_a_burst_then_asks_to_retry():
+    limiter = RateLimiter("login", per_minute=60, burst=3)
+    assert [limiter.hit("1.2.3.4") for _ in range(3)] == [0, 0, 0]
+    retry_after = limiter.hit("1.2.3.4")
+    assert 0 < retry_after <= 1
+    assert limiter.hit("5.6.7.8") == 0
+    with pytest.raises(HTTPException) as error:
+        limiter.check("1.2.3.4")
+    assert error.value.status_code == 429
+    assert error.value.headers["Retry-After"] == "1"
+
+def test_zero_rate_disables_the_limit():
+    limiter = RateLimiter("off", per_minute=0)
+    assert all(limiter.hit("key") == 0 for _ in range(100))
+
+def test_least_recently_seen_keys_are_forgotten():
+    limiter = RateLimiter("small", per_minute=60, max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.hit(key)
+    assert limiter.stats()["tracked_keys"] == 2
+
+def test_hashing_gate_sheds_requests_that_cannot_get_a_slot():
+    gate = HashingGate(concurrency=1, queue_timeout=0.05)
+    release = threading.Event()
+
+    async def scenario():
+        busy = asyncio.create_task(gate.run(release.wait, 5))
+        await asyncio.sleep(0.02)
+        try:
+            await gate.run(len, "x")
+        except HTTPException as e:
+            error = e
+        release.set()
+        await busy
+        return error, await gate.run(len, "abc")
+
+    error, result = asyncio.run(scenario())
+    assert error.status_code == 429
+    assert result == 3
+    assert gate.stats()["rejected"] == 1 and gate.stats()["completed"] == 2